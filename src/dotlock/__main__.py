@@ -1,24 +1,42 @@
 import argparse
 import asyncio
 import logging
+import os.path
 import sys
 from typing import NoReturn
 
 from dotlock.bundle import bundle
+from dotlock.concurrency import ConcurrencyLimits
 from dotlock.env import dump
 from dotlock.exceptions import LockEnvironmentMismatch
 from dotlock.graph import graph_resolution
 from dotlock.package_json import PackageJSON
-from dotlock.package_lock import write_package_lock, load_package_lock, check_lock_environment, get_locked_candidates
+from dotlock.package_lock import (
+    write_package_lock,
+    load_package_lock,
+    check_lock_environment,
+    get_locked_candidates,
+    get_locked_dependencies,
+)
 from dotlock.init import init
-from dotlock.install import install
+from dotlock.install import DEFAULT_INSTALL_WORKERS, install
 from dotlock.install_skip_lock import install_skip_lock
 from dotlock.run import run
+from dotlock.serve import serve
+from dotlock.wheel_installer import LinkMode
 
 
 base_parser = argparse.ArgumentParser(description='A Python package management utility.')
 base_parser.add_argument('--debug', action='store_true', default=False)
-base_parser.add_argument('command', choices=['init', 'run', 'graph', 'lock', 'install', 'bundle', 'dump-env'])
+base_parser.add_argument(
+    '--metadata-concurrency', type=int,
+    help='Maximum concurrent requests to each host for package metadata (overrides package.json).',
+)
+base_parser.add_argument(
+    '--download-concurrency', type=int,
+    help='Maximum concurrent downloads from each host (overrides package.json).',
+)
+base_parser.add_argument('command', choices=['init', 'run', 'graph', 'lock', 'install', 'bundle', 'dump-env', 'serve'])
 base_parser.add_argument('args', nargs=argparse.REMAINDER, help='(varies by command)')
 
 init_parser = argparse.ArgumentParser(
@@ -58,10 +76,27 @@ install_parser.add_argument(
     help='Install dependencies directly into system python.',
 )
 install_parser.add_argument('--extras', nargs='+', default=[])
+install_parser.add_argument(
+    '--workers', type=int, default=DEFAULT_INSTALL_WORKERS,
+    help='How many packages to install at once, when they do not depend on each other.',
+)
 install_parser.add_argument(
     '--only', nargs='+',
     help='Only install the listed packages. Useful when upgrading individual packages.',
 )
+install_parser.add_argument(
+    '--sync', action='store_true', default=False,
+    help='Skip packages that are already installed exactly as locked.',
+)
+install_parser.add_argument(
+    '--clean', action='store_true', default=False,
+    help='Like --sync, but also uninstall packages that are not locked.',
+)
+install_parser.add_argument(
+    '--link-mode', choices=[mode.name for mode in LinkMode], default=LinkMode.auto.name,
+    help='How to install files from the shared cache of unpacked wheels: '
+         'reflink (copy-on-write), hardlink, copy (bypassing the cache), or auto (the first of those that works).',
+)
 
 bundle_parser = argparse.ArgumentParser(
     prog='dotlock bundle',
@@ -74,6 +109,32 @@ dump_env_parser = argparse.ArgumentParser(
     description='Write the current environment out to env.json.',
 )
 
+serve_parser = argparse.ArgumentParser(
+    prog='dotlock serve',
+    description='Run a caching package index for the sources in package.json.',
+)
+serve_parser.add_argument('--host', default='127.0.0.1')
+serve_parser.add_argument('--port', type=int, default=8000)
+serve_parser.add_argument(
+    '--ttl', type=float, default=600,
+    help='Seconds to serve a package\'s file list before checking the sources for new files.',
+)
+
+
+def _concurrency_limits(base_args: argparse.Namespace, limits: ConcurrencyLimits) -> ConcurrencyLimits:
+    overrides = {
+        'metadata': base_args.metadata_concurrency,
+        'downloads': base_args.download_concurrency,
+    }
+    return ConcurrencyLimits.parse({**limits._asdict(), **{k: v for k, v in overrides.items() if v is not None}})
+
+
+def _package_json_concurrency_limits() -> ConcurrencyLimits:
+    # Installing only needs package.lock.json, but package.json may still be around to configure limits.
+    if os.path.exists('package.json'):
+        return PackageJSON.load('package.json').concurrency
+    return ConcurrencyLimits()
+
 
 def _main(*args) -> int:
     logging.basicConfig()
@@ -97,6 +158,8 @@ def _main(*args) -> int:
         run(run_args.command, run_args.args)
     if command == 'install':
         install_args = install_parser.parse_args(args)
+        if install_args.clean and install_args.only:
+            install_parser.error('--clean cannot be combined with --only')
 
         if install_args.skip_lock:
             package_json = PackageJSON.load('package.json')
@@ -115,7 +178,12 @@ def _main(*args) -> int:
                     e.env_key, e.env_value, e.locked_value,
                 )
             candidates = get_locked_candidates(package_lock, install_args.extras, install_args.only)
-            future = install(candidates, install_args.no_venv)
+            dependencies = get_locked_dependencies(package_lock, install_args.extras, candidates)
+            concurrency = _concurrency_limits(base_args, _package_json_concurrency_limits())
+            future = install(
+                candidates, install_args.no_venv, concurrency, dependencies, install_args.workers,
+                sync=install_args.sync, clean=install_args.clean, link_mode=LinkMode[install_args.link_mode],
+            )
             loop.run_until_complete(future)
     if command == 'bundle':
         bundle_args = bundle_parser.parse_args(args)
@@ -123,16 +191,24 @@ def _main(*args) -> int:
         package_lock = load_package_lock()
         # Don't check package lock, because we aren't installing.
         candidates = get_locked_candidates(package_lock, bundle_args.extras, None)
-        future = bundle(candidates)
+        concurrency = _concurrency_limits(base_args, _package_json_concurrency_limits())
+        future = bundle(candidates, concurrency)
         loop.run_until_complete(future)
     if command == 'dump-env':
         dump_env_parser.parse_args(args)
 
         dump()
+    if command == 'serve':
+        serve_args = serve_parser.parse_args(args)
+
+        package_json = PackageJSON.load('package.json')
+        package_json.concurrency = _concurrency_limits(base_args, package_json.concurrency)
+        serve(package_json, serve_args.host, serve_args.port, serve_args.ttl)
     if command == 'graph':
         graph_args = graph_parser.parse_args(args)
 
         package_json = PackageJSON.load('package.json')
+        package_json.concurrency = _concurrency_limits(base_args, package_json.concurrency)
         future = package_json.resolve(update=graph_args.update)
         loop.run_until_complete(future)
         graph_resolution(package_json.default)
@@ -140,6 +216,7 @@ def _main(*args) -> int:
         lock_args = lock_parser.parse_args(args)
 
         package_json = PackageJSON.load('package.json')
+        package_json.concurrency = _concurrency_limits(base_args, package_json.concurrency)
         future = package_json.resolve(update=lock_args.update)
         loop.run_until_complete(future)
         write_package_lock(package_json)
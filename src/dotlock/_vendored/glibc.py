@@ -22,7 +22,11 @@
 from __future__ import absolute_import
 
 import ctypes
+import os
 import re
+import struct
+import subprocess
+import sys
 import warnings
 
 
@@ -103,3 +107,68 @@ def libc_ver():
         return ("", "")
     else:
         return ("glibc", glibc_version)
+
+
+# NOT IN ORIGINAL: helpers for PEP 600 (manylinux_x_y) and PEP 656 (musllinux) tags,
+# based on packaging's _manylinux.py and _musllinux.py.
+def parse_libc_version(version_str):
+    """Returns (major, minor) from a glibc or musl version string, or None if it cannot be parsed."""
+    m = re.match(r"(?P<major>[0-9]+)\.(?P<minor>[0-9]+)", version_str or "")
+    if not m:
+        return None
+    return int(m.group("major")), int(m.group("minor"))
+
+
+def glibc_version():
+    "Returns the glibc version as 'major.minor', or None if not using glibc."
+    parsed = parse_libc_version(glibc_version_string())
+    return parsed and "{}.{}".format(*parsed)
+
+
+def _elf_interpreter(path):
+    "Returns the program interpreter (dynamic linker) of an ELF executable, or None."
+    try:
+        with open(path, "rb") as f:
+            ident = f.read(16)
+            if ident[:4] != b"\x7fELF":
+                return None
+            endian = "<" if ident[5] == 1 else ">"
+            if ident[4] == 2:  # 64-bit
+                header_format = endian + "HHIQQQIHHHHHH"
+                # p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align
+                program_header_format = endian + "IIQQQQQQ"
+                offset_index, size_index = 2, 5
+            else:
+                header_format = endian + "HHIIIIIHHHHHH"
+                # p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align
+                program_header_format = endian + "IIIIIIII"
+                offset_index, size_index = 1, 4
+            header = struct.unpack(header_format, f.read(struct.calcsize(header_format)))
+            phoff, phentsize, phnum = header[4], header[8], header[9]
+            for i in range(phnum):
+                f.seek(phoff + i * phentsize)
+                program_header = struct.unpack(
+                    program_header_format, f.read(struct.calcsize(program_header_format)),
+                )
+                if program_header[0] == 3:  # PT_INTERP
+                    f.seek(program_header[offset_index])
+                    return f.read(program_header[size_index]).rstrip(b"\0").decode("ascii")
+    except (OSError, struct.error, UnicodeDecodeError):
+        return None
+    return None
+
+
+def musl_version(executable=None):
+    "Returns the musl version as 'major.minor', or None if not using musl."
+    interpreter = _elf_interpreter(executable or sys.executable)
+    if interpreter is None or "musl" not in os.path.basename(interpreter):
+        return None
+    # Running the musl dynamic linker directly prints its version to stderr.
+    try:
+        process = subprocess.run([interpreter], stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError:
+        return None
+    m = re.search(r"Version (?P<major>[0-9]+)\.(?P<minor>[0-9]+)", process.stderr)
+    if not m:
+        return None
+    return "{}.{}".format(m.group("major"), m.group("minor"))
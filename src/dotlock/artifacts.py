@@ -0,0 +1,260 @@
+"""A local store of downloaded distribution files, keyed by hash."""
+import asyncio
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Optional, Tuple
+
+from aiohttp import ClientError, ClientPayloadError, ClientResponseError, ClientSession
+
+from dotlock.dist_info.dist_info import CandidateInfo
+from dotlock.exceptions import HashMismatchError
+from dotlock.single_flight import SingleFlight
+from dotlock._vendored.appdirs import user_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+_artifact_flights = SingleFlight()
+
+# Downloaded data is hashed and written in blocks of about this size, off the event loop.
+BLOCK_SIZE = 1024 * 1024
+# Attempts at each download, waiting INITIAL_BACKOFF seconds after the first failure, doubling each time.
+MAX_ATTEMPTS = 5
+INITIAL_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+_CONTENT_RANGE_START_RE = re.compile(r'bytes (\d+)-')
+# How often to check whether another download of the same file has released its partial file.
+LOCK_POLL_INTERVAL = 0.1
+
+
+def default_artifact_dir() -> Path:
+    return Path(user_cache_dir('dotlock')) / 'artifacts'
+
+
+def artifact_path(artifact_dir: Path, candidate_info: CandidateInfo) -> Path:
+    assert candidate_info.hash_alg is not None and candidate_info.hash_val is not None
+    filename = candidate_info.location.split('/')[-1]
+    return artifact_dir / candidate_info.hash_alg / candidate_info.hash_val / filename
+
+
+async def get_artifact(session: ClientSession, candidate_info: CandidateInfo, artifact_dir: Path) -> Path:
+    """
+    Returns the path to the candidate's distribution file in artifact_dir, downloading it first if necessary.
+    Files only appear in the store once their hash has been verified.
+    """
+    path = artifact_path(artifact_dir, candidate_info)
+    if path.exists():
+        logger.debug('Artifact cache HIT for %s', path.name)
+        return path
+
+    logger.debug('Artifact cache MISS for %s', path.name)
+    await _artifact_flights.run(path, download_file, session, candidate_info, path)
+    return path
+
+
+async def _download_metadata_file(session: ClientSession, candidate_info: CandidateInfo, path: Path) -> None:
+    assert candidate_info.metadata
+    async with session.get(candidate_info.location + '.metadata') as response:
+        response.raise_for_status()
+        contents = await response.read()
+
+    if candidate_info.metadata != 'true':
+        hash_alg, hash_val = candidate_info.metadata.split('=', 1)
+        digest = hashlib.new(hash_alg, contents).hexdigest()
+        if digest != hash_val:
+            raise HashMismatchError(candidate_info.name, candidate_info.version, digest, hash_val)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_name(path.name + '.part')
+    partial_path.write_bytes(contents)
+    os.replace(str(partial_path), str(path))
+
+
+async def get_metadata_artifact(session: ClientSession, candidate_info: CandidateInfo, artifact_dir: Path) -> Path:
+    """
+    Returns the path to the PEP 658 METADATA file of the candidate's distribution file in artifact_dir,
+    downloading it first if necessary. The candidate's index must provide one.
+    """
+    distribution_path = artifact_path(artifact_dir, candidate_info)
+    path = distribution_path.with_name(distribution_path.name + '.metadata')
+    if not path.exists():
+        await _artifact_flights.run(path, _download_metadata_file, session, candidate_info, path)
+    return path
+
+
+def default_staging_dir() -> Path:
+    """Where partial downloads are kept between attempts, for downloads that do not go into the artifact store."""
+    return Path(user_cache_dir('dotlock')) / 'staging'
+
+
+def staging_path(staging_dir: Path, candidate_info: CandidateInfo) -> Path:
+    return staging_dir / f'{candidate_info.hash_alg}-{candidate_info.hash_val}.part'
+
+
+def _hash_and_write(hasher, fp, block: bytearray) -> None:
+    hasher.update(block)
+    fp.write(block)
+
+
+def _hash_file(hasher, path: Path) -> None:
+    with path.open('rb') as fp:
+        for block in iter(lambda: fp.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+
+
+async def _lock(lock_path: Path) -> int:
+    """
+    Takes an exclusive lock on lock_path, waiting for any other holder, including in other processes,
+    and returns the file descriptor to close to release it. Polls, so waiting does not block the event loop.
+    Holders may remove lock_path before releasing it.
+    """
+    while True:
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+            # If the previous holder removed the file, the lock is on a file nobody else will see; use the new one.
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(str(lock_path))):
+                    return fd
+            except FileNotFoundError:
+                pass
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+def _move(source: Path, destination: Path) -> None:
+    try:
+        os.replace(str(source), str(destination))
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # The staging directory is on a different filesystem.
+        shutil.move(str(source), str(destination))
+
+
+async def _download_to(session: ClientSession, candidate_info: CandidateInfo, partial_path: Path) -> Tuple[str, bool]:
+    """
+    Downloads the candidate's file to partial_path, continuing from the end of any data already there
+    if the server supports Range requests. Returns the file's digest and whether the download was resumed.
+    """
+    assert candidate_info.hash_alg is not None
+    loop = asyncio.get_event_loop()
+    hasher = hashlib.new(candidate_info.hash_alg)
+    offset = partial_path.stat().st_size if partial_path.exists() else 0
+    if offset:
+        await loop.run_in_executor(None, _hash_file, hasher, partial_path)
+        if hasher.copy().hexdigest() == candidate_info.hash_val:
+            # An earlier attempt received the whole file, but did not get to move it into place.
+            logger.info('Already downloaded %s', candidate_info.name)
+            return candidate_info.hash_val, True
+    # Ranges of compressed responses would be ranges of the compressed data.
+    headers = {'Range': f'bytes={offset}-', 'Accept-Encoding': 'identity'} if offset else {}
+
+    async with session.get(candidate_info.location, headers=headers) as response:
+        if offset and response.status == 416:
+            # The partial file is no use, e.g. because the file changed; start again.
+            partial_path.unlink()
+            return await _download_to(session, candidate_info, partial_path)
+        response.raise_for_status()
+
+        resumed = False
+        if offset and response.status == 206:
+            match = _CONTENT_RANGE_START_RE.match(response.headers.get('Content-Range', ''))
+            if match is None or int(match.group(1)) != offset:
+                partial_path.unlink()
+                raise ClientPayloadError(f'Unexpected Content-Range for {candidate_info.location}')
+            logger.info('Resuming download of %s from byte %d', candidate_info.name, offset)
+            resumed = True
+        else:
+            hasher = hashlib.new(candidate_info.hash_alg)
+
+        with partial_path.open('ab' if resumed else 'wb') as fp:
+            block = bytearray()
+            try:
+                async for chunk in response.content.iter_any():
+                    block += chunk
+                    if len(block) >= BLOCK_SIZE:
+                        # hashlib releases the GIL for large inputs, so this runs in parallel with other downloads.
+                        await loop.run_in_executor(None, _hash_and_write, hasher, fp, block)
+                        block = bytearray()
+            except (ClientError, asyncio.TimeoutError):
+                # Keep what was received, for the next attempt to resume from.
+                fp.write(block)
+                raise
+            if block:
+                await loop.run_in_executor(None, _hash_and_write, hasher, fp, block)
+
+    return hasher.hexdigest(), resumed
+
+
+async def download_file(
+        session: ClientSession,
+        candidate_info: CandidateInfo,
+        path: Path,
+        partial_path: Optional[Path] = None,
+) -> None:
+    """
+    Streams the candidate's distribution file to path, so memory use does not depend on the file's size.
+    The file is hashed as it arrives, and only appears at path once its hash has been verified.
+
+    Failed downloads are retried with exponential backoff. The data received so far is kept at partial_path
+    (by default next to path), and later attempts, including by later runs, resume from where it ends.
+    Downloads using the same partial_path take turns, so concurrent runs cannot interleave their writes.
+    """
+    if partial_path is None:
+        partial_path = path.with_name(path.name + '.part')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path.parent.mkdir(parents=True, exist_ok=True)
+
+    lock_path = partial_path.with_name(partial_path.name + '.lock')
+    lock_fd = await _lock(lock_path)
+    try:
+        await _download_with_retries(session, candidate_info, path, partial_path)
+    finally:
+        # Remove the lock file while still holding the lock, so lock files do not build up. Closing releases the lock.
+        lock_path.unlink()
+        os.close(lock_fd)
+
+
+async def _download_with_retries(
+        session: ClientSession,
+        candidate_info: CandidateInfo,
+        path: Path,
+        partial_path: Path,
+) -> None:
+    logger.info('Downloading %s from %s', candidate_info.name, candidate_info.location)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            digest, resumed = await _download_to(session, candidate_info, partial_path)
+        except (ClientError, asyncio.TimeoutError) as e:
+            if (isinstance(e, ClientResponseError) and e.status not in _RETRY_STATUSES) or attempt >= MAX_ATTEMPTS:
+                raise
+            delay = min(INITIAL_BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF)
+            logger.warning('Downloading %s failed (%s), retrying in %.1fs', candidate_info.name, e, delay)
+            await asyncio.sleep(delay)
+            continue
+
+        if digest == candidate_info.hash_val:
+            _move(partial_path, path)
+            return
+        partial_path.unlink()
+        if not resumed or attempt >= MAX_ATTEMPTS:
+            raise HashMismatchError(candidate_info.name, candidate_info.version, digest, candidate_info.hash_val)
+        # The data from before resuming may have been from a different file; download it all again.
+        logger.warning('Resumed download of %s did not match its hash, downloading it again', candidate_info.name)
@@ -6,18 +6,20 @@ import shutil
 from pathlib import Path
 from typing import Sequence
 
+from dotlock.concurrency import ConcurrencyLimits, limited_session
 from dotlock.dist_info.dist_info import CandidateInfo
-from dotlock.install import download_all
+from dotlock.install import download
 
 logger = logging.getLogger(__name__)
 
 
-async def bundle(candidates: Sequence[CandidateInfo]):
+async def bundle(candidates: Sequence[CandidateInfo], concurrency: ConcurrencyLimits = ConcurrencyLimits()):
     os.mkdir('bundle')
     original_wd = os.getcwd()
     os.chdir('bundle')
     try:
-        await download_all(candidates)
+        async with limited_session(concurrency.downloads) as session:
+            await asyncio.gather(*[download(session, candidate) for candidate in candidates])
     finally:
         os.chdir(original_wd)
     try:
@@ -0,0 +1,187 @@
+"""
+Adaptive per-host limits on concurrent HTTP requests.
+
+Each host starts with a small number of concurrent requests, which grows additively while responses
+come back promptly and is halved on connection errors, rate limiting (429/503) or sudden latency spikes,
+i.e. AIMD as in TCP congestion control. A Retry-After header also pauses new requests to that host.
+"""
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, NamedTuple, Optional
+import asyncio
+import datetime
+import logging
+import time
+
+from aiohttp import ClientConnectionError, ClientSession, TCPConnector, TraceConfig
+
+
+logger = logging.getLogger(__name__)
+
+# Requests allowed per host before we know anything about the host.
+INITIAL_LIMIT = 4
+# A response this many times slower than the host's typical latency is treated as a sign of congestion.
+LATENCY_SPIKE_FACTOR = 4.0
+# Weight of each new sample in the smoothed latency.
+LATENCY_SMOOTHING = 0.1
+# Seconds to pause for when a host rate-limits us without saying for how long.
+DEFAULT_RETRY_AFTER = 1.0
+_BACKOFF_STATUSES = {429, 503}
+
+
+class ConcurrencyLimits(NamedTuple):
+    """
+    The maximum number of concurrent requests per host, for index pages and metadata (metadata)
+    and for downloading distributions to install (downloads). The actual limits adapt below these.
+    """
+    metadata: int = 32
+    downloads: int = 8
+
+    @classmethod
+    def parse(cls, values: Dict[str, int]) -> 'ConcurrencyLimits':
+        unknown = set(values) - set(cls._fields)
+        if unknown:
+            raise ValueError(f'Unknown concurrency limits: {", ".join(sorted(unknown))}')
+        limits = cls(**values)
+        if any(limit < 1 for limit in limits):
+            raise ValueError('Concurrency limits must be at least 1')
+        return limits
+
+
+def parse_retry_after(value: Optional[str]) -> float:
+    """Returns the number of seconds a Retry-After header (in either of its forms) asks us to wait."""
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class HostLimiter:
+    """An adaptive limit on concurrent requests to one host."""
+    def __init__(self, host: str, maximum: int) -> None:
+        self.host = host
+        self.maximum = maximum
+        self.limit = float(min(INITIAL_LIMIT, maximum))
+        self.active = 0
+        self.latency: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            delay = self._blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self.active < int(self.limit):
+                self.active += 1
+                return
+            waiter = asyncio.get_event_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # Woken waiters re-check the limit, so waking one too many is harmless.
+        for _ in range(int(self.limit) - self.active):
+            if not self._waiters:
+                break
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def record_response(self, latency: float) -> None:
+        """Records a successful response, which arrived latency seconds after the request was made."""
+        if self.latency is not None and latency > self.latency * LATENCY_SPIKE_FACTOR:
+            logger.debug('%s slowed down (%.2fs, typically %.2fs)', self.host, latency, self.latency)
+            self._decrease()
+        elif self.limit < self.maximum:
+            # Adds roughly one request per round of `limit` successful requests.
+            self.limit = min(self.limit + 1 / self.limit, float(self.maximum))
+            self._wake()
+
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += (latency - self.latency) * LATENCY_SMOOTHING
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        """Records a connection error or a request to back off, optionally for retry_after seconds."""
+        if retry_after is not None:
+            logger.info('%s asked us to back off for %.1fs', self.host, retry_after)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._decrease()
+
+    def _decrease(self) -> None:
+        # Requests already in flight when the host got overloaded tend to fail together;
+        # only count them once by waiting about a round trip between decreases.
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or DEFAULT_RETRY_AFTER):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit / 2, 1.0)
+        logger.debug('Reduced concurrency limit for %s to %d', self.host, int(self.limit))
+
+
+def _limiting_trace_config(maximum: int) -> TraceConfig:
+    limiters: Dict[str, HostLimiter] = {}
+
+    async def on_request_start(session, context, params):
+        host = params.url.host
+        if host not in limiters:
+            limiters[host] = HostLimiter(host, maximum)
+        context.limiter = limiters[host]
+        await context.limiter.acquire()
+        context.start = time.monotonic()
+
+    async def on_request_end(session, context, params):
+        limiter = context.limiter
+        response = params.response
+        if response.status in _BACKOFF_STATUSES:
+            limiter.record_failure(parse_retry_after(response.headers.get('Retry-After')))
+        elif response.status < 500:
+            limiter.record_response(time.monotonic() - context.start)
+        else:
+            limiter.record_failure()
+
+        # Hold the slot until the body has been read, so large downloads count against the limit.
+        if response.connection is not None:
+            response.connection.add_callback(limiter.release)
+        else:
+            limiter.release()
+
+    async def on_request_exception(session, context, params):
+        if not hasattr(context, 'start'):
+            return  # Cancelled while waiting for a slot.
+        if isinstance(params.exception, (ClientConnectionError, asyncio.TimeoutError)):
+            context.limiter.record_failure()
+        context.limiter.release()
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+def limited_session(maximum: int) -> ClientSession:
+    """Creates a ClientSession that adapts how many concurrent requests it makes to each host, up to maximum."""
+    connector = TCPConnector(limit_per_host=maximum)
+    return ClientSession(connector=connector, trace_configs=[_limiting_trace_config(maximum)])
@@ -6,14 +6,34 @@ CREATE TABLE candidate_infos (
     package_type VARCHAR(15) NOT NULL,
     source VARCHAR(200) NOT NULL,
     location VARCHAR(300) NOT NULL,
+    metadata VARCHAR(100),
+    requires_python VARCHAR(100),
     requirements_cached TINYINT NOT NULL
 );
+CREATE TABLE candidate_listings (
+    name VARCHAR(50) PRIMARY KEY
+);
+-- Git commits and local directories are stored as releases too, with the repository URL or path as source
+-- and the commit hash or a fingerprint of the directory as version.
+CREATE TABLE releases (
+    id INTEGER PRIMARY KEY,
+    source VARCHAR(200) NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    version VARCHAR(71) NOT NULL,
+    UNIQUE (source, name, version)
+);
+-- Requirements belong to either a single distribution (candidate_hash) or a whole release (release_id).
 CREATE TABLE requirement_infos (
     id INTEGER PRIMARY KEY,
-    candidate_hash VARCHAR(65) NOT NULL,
+    candidate_hash VARCHAR(65),
+    release_id INTEGER,
     name VARCHAR(50) NOT NULL,
+    specifier_type VARCHAR(10) NOT NULL,
     specifier VARCHAR(300),
     extras VARCHAR(50),
     marker VARCHAR(50),
-    FOREIGN KEY (candidate_hash) REFERENCES candidate_infos(hash_val)
+    FOREIGN KEY (candidate_hash) REFERENCES candidate_infos(hash_val),
+    FOREIGN KEY (release_id) REFERENCES releases(id)
 );
+CREATE INDEX requirement_infos_candidate_hash ON requirement_infos (candidate_hash);
+CREATE INDEX requirement_infos_release_id ON requirement_infos (release_id);
@@ -1,14 +1,18 @@
 import logging
 import sqlite3
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Any, Iterable, List, Optional
 
 from packaging.specifiers import SpecifierSet
 from packaging.version import Version
 
-from dotlock.dist_info.dist_info import RequirementInfo, CandidateInfo, PackageType
+from dotlock.dist_info.dist_info import (
+    RequirementInfo, CandidateInfo, PackageType, SpecifierType, release_metadata_types,
+)
 from dotlock.markers import Marker
 from dotlock._vendored.appdirs import user_cache_dir
+from dotlock._vendored.glibc import glibc_version, musl_version
 from dotlock._vendored.pep425tags import get_impl_tag, get_abi_tag, get_platform, is_manylinux1_compatible
 
 
@@ -19,21 +23,33 @@ with setup_script_path.open() as fp:
     setup_script = fp.read()
 
 
+SCHEMA_VERSION = '0.10'
+
+
 def cache_filename():
-    schema_version = '0.4'
+    schema_version = SCHEMA_VERSION
     impl = get_impl_tag()
     abi = get_abi_tag()
     platform = get_platform()
     manylinux1 = '-manylinux1' if is_manylinux1_compatible() else ''
-    return f'cache-{schema_version}-{impl}-{abi}-{platform}{manylinux1}.sqlite'
+    # Which wheels are cached as candidates depends on the C library version.
+    glibc = glibc_version()
+    musl = musl_version()
+    libc = f'-glibc{glibc}' if glibc else f'-musl{musl}' if musl else ''
+    return f'cache-{schema_version}-{impl}-{abi}-{platform}{manylinux1}{libc}.sqlite'
+
 
+def serve_cache_filename():
+    # The index server lists every file, whatever the environment, so it needs a cache of its own.
+    return f'serve-{SCHEMA_VERSION}.sqlite'
 
-def connect_to_cache():
+
+def connect_to_cache(filename: Optional[str] = None):
     cache_dir = Path(user_cache_dir('dotlock'))
     if not cache_dir.exists():
         cache_dir.mkdir()
 
-    cache_db_path = cache_dir / Path(cache_filename())
+    cache_db_path = cache_dir / Path(filename or cache_filename())
     exists = cache_db_path.exists()
     conn = sqlite3.connect(str(cache_db_path))
 
@@ -43,25 +59,47 @@ def connect_to_cache():
     return conn
 
 
+_CANDIDATE_INFO_COLUMNS = 'name, version, package_type, source, location, hash_alg, hash_val, metadata, requires_python'
+
+
+def _candidate_info_from_row(row: tuple) -> CandidateInfo:
+    name, version, package_type, source, location, hash_alg, hash_val, metadata, requires_python = row
+    return CandidateInfo(
+        name=name,
+        version=Version(version),
+        package_type=PackageType[package_type],
+        source=source,
+        location=location,
+        hash_alg=hash_alg,
+        hash_val=hash_val,
+        metadata=metadata,
+        requires_python=requires_python,
+    )
+
+
 def get_cached_candidate_infos(
         connection: sqlite3.Connection,
         name: str,
+        version: Optional[Version] = None,
 ) -> Optional[List[CandidateInfo]]:
+    """
+    Returns the cached candidates for a package, or only those with the given version.
+    Without a version, only complete listings count: candidates cached from lookups of single versions do not.
+    """
+    if version is None:
+        query = connection.execute('SELECT name FROM candidate_listings WHERE name=?', (name,))
+        if query.fetchone() is None:
+            logger.debug('Cache MISS for candidate_infos %s', name)
+            return None
+
     query = connection.execute(
-        'SELECT name, version, package_type, source, location, hash_alg, hash_val FROM candidate_infos WHERE name=?',
+        f'SELECT {_CANDIDATE_INFO_COLUMNS} FROM candidate_infos WHERE name=?',
         (name,)
     )
-    results = [
-        CandidateInfo(
-            name=name,
-            version=Version(version),
-            package_type=PackageType[package_type],
-            source=source,
-            location=location,
-            hash_alg=hash_alg,
-            hash_val=hash_val,
-        ) for name, version, package_type, source, location, hash_alg, hash_val in query.fetchall()
-    ]
+    results = [_candidate_info_from_row(row) for row in query.fetchall()]
+    if version is not None:
+        # Compare parsed versions, since e.g. 1.0 == 1.0.0.
+        results = [c for c in results if c.version == version]
 
     if results:
         logger.debug('Cache HIT for candidate_infos %s', name)
@@ -71,32 +109,153 @@ def get_cached_candidate_infos(
     return None
 
 
+def get_cached_candidate_info(
+        connection: sqlite3.Connection,
+        hash_val: str,
+) -> Optional[CandidateInfo]:
+    query = connection.execute(
+        f'SELECT {_CANDIDATE_INFO_COLUMNS} FROM candidate_infos WHERE hash_val=?',
+        (hash_val,)
+    )
+    row = query.fetchone()
+    return row and _candidate_info_from_row(row)
+
+
 def set_cached_candidate_infos(
         connection: sqlite3.Connection,
         candidate_infos: Iterable[CandidateInfo],
+        complete: bool = True,
 ):
+    """
+    Caches candidates. Set complete=False if they are not every candidate for their package,
+    e.g. if only one version was looked up.
+    """
     for c in candidate_infos:
+        _insert_candidate_info(connection, c)
+        if complete:
+            connection.execute('INSERT OR IGNORE INTO candidate_listings (name) VALUES (?)', (c.name,))
+    connection.commit()
+
+
+def replace_cached_candidate_infos(
+        connection: sqlite3.Connection,
+        name: str,
+        candidate_infos: Iterable[CandidateInfo],
+):
+    """
+    Caches the complete list of a package's candidates, removing any cached candidates it no longer includes,
+    e.g. because they were deleted from the index.
+    """
+    candidate_infos = list(candidate_infos)
+    hash_vals = [c.hash_val for c in candidate_infos]
+    placeholders = ', '.join('?' * len(hash_vals))
+    removed = f'SELECT hash_val FROM candidate_infos WHERE name=? AND hash_val NOT IN ({placeholders})'
+    connection.execute(f'DELETE FROM requirement_infos WHERE candidate_hash IN ({removed})', (name, *hash_vals))
+    connection.execute(f'DELETE FROM candidate_infos WHERE hash_val IN ({removed})', (name, *hash_vals))
+    for c in candidate_infos:
+        _insert_candidate_info(connection, c)
+    connection.execute('INSERT OR IGNORE INTO candidate_listings (name) VALUES (?)', (name,))
+    connection.commit()
+
+
+def _insert_candidate_info(connection: sqlite3.Connection, c: CandidateInfo):
+    connection.execute(
+        'INSERT INTO candidate_infos '
+        '(name, version, package_type, source, location, hash_alg, hash_val, metadata, requires_python, '
+        'requirements_cached) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            c.name,
+            str(c.version),
+            c.package_type.name,
+            c.source,
+            c.location,
+            c.hash_alg,
+            c.hash_val,
+            c.metadata,
+            c.requires_python,
+            False,
+        )
+    )
+
+
+# Each distinct specifier or marker string is parsed at most once per process, since the same few strings
+# recur across many packages. SpecifierSet and Marker instances are never mutated, so sharing them is safe.
+@lru_cache(maxsize=None)
+def _parse_specifier(text: str) -> SpecifierSet:
+    return SpecifierSet('' if text == '*' else text)
+
+
+@lru_cache(maxsize=None)
+def _parse_marker(text: str) -> Marker:
+    return Marker(text)
+
+
+def _release_id(connection: sqlite3.Connection, source: Optional[str], name: str, version: str) -> Optional[int]:
+    query = connection.execute(
+        'SELECT id FROM releases WHERE source=? AND name=? AND version=?',
+        (source, name, version),
+    )
+    result = query.fetchone()
+    return result and result[0]
+
+
+def _select_requirement_infos(connection: sqlite3.Connection, where: str, key: Any) -> List[RequirementInfo]:
+    query = connection.execute(
+        'SELECT name, specifier_type, specifier, extras, marker FROM requirement_infos '
+        f'WHERE {where}=? ORDER BY id',
+        (key,)
+    )
+    requirement_infos = []
+    for name, specifier_type, specifier, extras, marker in query.fetchall():
+        if specifier_type != SpecifierType.version.name:
+            # VCS URLs and paths are rare, so they are simply re-parsed.
+            requirement_infos.append(RequirementInfo.from_specifier_str(
+                name, specifier, extras and extras.split(','), marker,
+            ))
+            continue
+
+        requirement_infos.append(RequirementInfo(
+            name=name,
+            specifier_type=SpecifierType.version,
+            specifier=_parse_specifier(specifier),
+            extras=tuple(extras.split(',')) if extras else tuple(),
+            marker=marker and _parse_marker(marker),
+        ))
+    return requirement_infos
+
+
+def _insert_requirement_infos(
+        connection: sqlite3.Connection,
+        requirement_infos: Iterable[RequirementInfo],
+        candidate_hash: Optional[str] = None,
+        release_id: Optional[int] = None,
+):
+    for r in requirement_infos:
         connection.execute(
-            'INSERT INTO candidate_infos (name, version, package_type, source, location, hash_alg, hash_val, requirements_cached) '
-            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            'INSERT INTO requirement_infos '
+            '(candidate_hash, release_id, name, specifier_type, specifier, extras, marker) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
             (
-                c.name,
-                str(c.version),
-                c.package_type.name,
-                c.source,
-                c.location,
-                c.hash_alg,
-                c.hash_val,
-                False,
+                candidate_hash,
+                release_id,
+                r.name,
+                r.specifier_type.name,
+                str(r.specifier) if r.specifier else '*',
+                ','.join(r.extras) if r.extras else None,
+                r.marker and str(r.marker),
             )
         )
-    connection.commit()
 
 
 def get_cached_requirement_infos(
         connection: sqlite3.Connection,
         candidate_info: CandidateInfo,
 ) -> Optional[List[RequirementInfo]]:
+    """
+    Returns the candidate's own cached requirements if it has any, otherwise those cached for its release
+    (if the candidate's package type shares metadata across the release), otherwise None.
+    """
     query = connection.execute(
         'SELECT requirements_cached FROM candidate_infos WHERE hash_val=?',
         (candidate_info.hash_val,)
@@ -105,42 +264,80 @@ def get_cached_requirement_infos(
     if result is None:  # No such candidate is cached.
         return None
     requirements_cached = result[0]
-    if not requirements_cached:
-        logger.debug('Cache MISS for requirement_infos %s', candidate_info)
-        return None
+    if requirements_cached:
+        logger.debug('Cache HIT for requirement_infos %s', candidate_info)
+        return _select_requirement_infos(connection, 'candidate_hash', candidate_info.hash_val)
 
-    logger.debug('Cache HIT for requirement_infos %s', candidate_info)
-    query = connection.execute(
-        'SELECT name, specifier, extras, marker FROM requirement_infos '
-        'WHERE candidate_hash=?',
-        (candidate_info.hash_val,)
-    )
-    return [
-        RequirementInfo.from_specifier_str(
-            name, specifier, extras, marker,
-        ) for (name, specifier, extras, marker) in query.fetchall()
-    ]
+    if candidate_info.package_type in release_metadata_types:
+        release_id = _release_id(connection, candidate_info.source, candidate_info.name, str(candidate_info.version))
+        if release_id is not None:
+            logger.debug('Cache HIT for release requirement_infos %s', candidate_info)
+            return _select_requirement_infos(connection, 'release_id', release_id)
+
+    logger.debug('Cache MISS for requirement_infos %s', candidate_info)
+    return None
 
 
 def set_cached_requirement_infos(
         connection: sqlite3.Connection,
         candidate_info: CandidateInfo,
         requirement_infos: Iterable[RequirementInfo],
+        release: bool = False,
 ):
-    for r in requirement_infos:
-        connection.execute(
-            'INSERT INTO requirement_infos (candidate_hash, name, specifier, extras, marker) '
-            'VALUES (?, ?, ?, ?, ?)',
-            (
-                candidate_info.hash_val,
-                r.name,
-                str(r.specifier) if r.specifier else '*',
-                ','.join(r.extras) if r.extras else None,
-                r.marker and str(r.marker),
+    """
+    Caches the candidate's requirements. Set release=True if they are the requirements of the candidate's
+    whole release (i.e. the JSON API's requires_dist), so that its other distributions can use them too.
+    """
+    if release:
+        assert candidate_info.package_type in release_metadata_types
+        if _release_id(connection, candidate_info.source, candidate_info.name, str(candidate_info.version)) is None:
+            cursor = connection.execute(
+                'INSERT INTO releases (source, name, version) VALUES (?, ?, ?)',
+                (candidate_info.source, candidate_info.name, str(candidate_info.version)),
             )
-        )
+            _insert_requirement_infos(connection, requirement_infos, release_id=cursor.lastrowid)
+            connection.commit()
+        return
+
+    _insert_requirement_infos(connection, requirement_infos, candidate_hash=candidate_info.hash_val)
     connection.execute(
         'UPDATE candidate_infos SET requirements_cached=1 WHERE hash_val=?',
         (candidate_info.hash_val,)
     )
     connection.commit()
+
+
+def get_cached_revision_requirement_infos(
+        connection: sqlite3.Connection,
+        name: str,
+        source: str,
+        revision: str,
+) -> Optional[List[RequirementInfo]]:
+    """
+    Returns the cached requirements of a package at one revision of a source outside any index, or None.
+    For git repositories the revision is a commit hash; for local directories, a fingerprint of their contents.
+    """
+    release_id = _release_id(connection, source, name, revision)
+    if release_id is None:
+        logger.debug('Cache MISS for requirement_infos %s@%s', source, revision)
+        return None
+    logger.debug('Cache HIT for requirement_infos %s@%s', source, revision)
+    return _select_requirement_infos(connection, 'release_id', release_id)
+
+
+def set_cached_revision_requirement_infos(
+        connection: sqlite3.Connection,
+        name: str,
+        source: str,
+        revision: str,
+        requirement_infos: Iterable[RequirementInfo],
+):
+    # Each revision is stored as a release of the source.
+    if _release_id(connection, source, name, revision) is not None:
+        return
+    cursor = connection.execute(
+        'INSERT INTO releases (source, name, version) VALUES (?, ?, ?)',
+        (source, name, revision),
+    )
+    _insert_requirement_infos(connection, requirement_infos, release_id=cursor.lastrowid)
+    connection.commit()
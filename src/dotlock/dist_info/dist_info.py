@@ -1,9 +1,10 @@
 from collections import namedtuple
 from enum import Enum, IntEnum, auto
 from sqlite3 import Connection
-from typing import List
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 import logging
+import sys
 
 from aiohttp import ClientSession
 from packaging.requirements import Requirement as PackagingRequirement
@@ -13,6 +14,7 @@ from packaging.version import Version
 
 from dotlock.exceptions import NoMatchingCandidateError
 from dotlock.markers import Marker
+from dotlock.single_flight import SingleFlight
 
 
 logger = logging.getLogger(__name__)
@@ -41,6 +43,17 @@ hash_algorithms = (
     'md5',
 )
 
+# These have no hash to cache by; their requirements are cached per git commit or local directory fingerprint instead.
+uncachable_types = (PackageType.vcs, PackageType.local)
+# The JSON API reports requires_dist for a whole release, which is taken to apply to every wheel of it.
+# Sdists' requirements come from running their setup in the target environment, so they are kept per distribution.
+# Requirements read from a wheel's own METADATA are kept for that wheel alone, since they may differ from its siblings'.
+release_metadata_types = (PackageType.bdist_wheel,)
+
+# Sibling requirements are resolved concurrently, so the same package is often requested several times at once.
+_candidate_infos_flights = SingleFlight()
+_requirement_infos_flights = SingleFlight()
+
 
 class RequirementInfo(namedtuple(
         '_RequirementInfo',
@@ -66,13 +79,23 @@ class RequirementInfo(namedtuple(
                     specifier_type = SpecifierType.path
 
         return cls(
-            name=name,
+            name=canonicalize_name(name),
             specifier_type=specifier_type,
             specifier=specifier,
             extras=tuple(extras) if extras else tuple(),
             marker=marker and Marker(marker),
         )
 
+    @property
+    def pinned_version(self) -> Optional[Version]:
+        """The version, if the specifier is a single exact '==' pin."""
+        if self.specifier_type != SpecifierType.version or len(self.specifier) != 1:
+            return None
+        specifier, = self.specifier
+        if specifier.operator != '==' or specifier.version.endswith('.*'):
+            return None
+        return Version(specifier.version)
+
     def __str__(self):
         result = self.name
         if self.extras:
@@ -92,18 +115,21 @@ class RequirementInfo(namedtuple(
             connection: Connection,
             session: ClientSession,
             update: bool,
+            source_timeouts: Optional[Dict[str, float]] = None,
     ):
-        from dotlock.dist_info.caching import get_cached_candidate_infos, set_cached_candidate_infos
-        from dotlock.dist_info.package_indices import get_candidate_infos
+        from dotlock.dist_info.caching import get_cached_candidate_infos
 
         if self.specifier_type == SpecifierType.vcs:
+            from dotlock.dist_info.vcs import pin_vcs_url
+
             candidate_infos = [
                 CandidateInfo(
                     name=self.name,
                     version=None,
                     package_type=PackageType.vcs,
                     source=None,
-                    location=self.specifier,
+                    # Git refs are pinned to a commit, so that the lock file records exactly what was resolved.
+                    location=await pin_vcs_url(self.specifier, update),
                     hash_alg=None,  # FIXME
                     hash_val=None,  # FIXME
                 )
@@ -121,13 +147,18 @@ class RequirementInfo(namedtuple(
                 )
             ]
         else:
+            # Exact pins only need that version's files, which indexes can serve without the full listing.
+            version = self.pinned_version
             cached = None
             if not update:
-                cached = get_cached_candidate_infos(connection, self.name)
+                cached = get_cached_candidate_infos(connection, self.name, version)
 
             if cached is None:
-                candidate_infos = await get_candidate_infos(package_types, sources, session, self.name)
-                set_cached_candidate_infos(connection, candidate_infos)
+                candidate_infos = await _candidate_infos_flights.run(
+                    (self.name, version, tuple(package_types), tuple(sources)),
+                    _fetch_candidate_infos,
+                    package_types, sources, connection, session, self.name, source_timeouts, version,
+                )
             else:
                 candidate_infos = cached
 
@@ -136,24 +167,39 @@ class RequirementInfo(namedtuple(
                 if self.specifier_type != SpecifierType.version or self.specifier.contains(c.version)
             ]
             if not candidate_infos:
-                # For pinned versions not found in cache, retry without the cache.
-                if cached and self.specifier_type == SpecifierType.version and str(self.specifier).startswith('=='):
+                # The cached listing may predate the release we need, so check the index before giving up.
+                if cached is not None:
                     return await self.get_candidate_infos(
                         package_types=package_types,
                         sources=sources,
                         connection=connection,
                         session=session,
                         update=True,
+                        source_timeouts=source_timeouts,
                     )
                 raise NoMatchingCandidateError(self)
 
         return candidate_infos
 
 
-class CandidateInfo(namedtuple(
-        '_CandidateInfo',
-        ('name', 'version', 'package_type', 'source', 'location', 'hash_alg', 'hash_val')
-    )):
+class CandidateInfo(NamedTuple):
+    """
+    The metadata field is the PEP 658 core metadata attribute from the index, either 'true' or
+    '[hash_alg]=[hash_val]' if a separate METADATA file is available, otherwise None.
+    requires_python is the file's Requires-Python specifier from the index, if any.
+    Neither is written to package.lock.json.
+    """
+    name: str
+    version: Optional[Version]
+    package_type: PackageType
+    source: Optional[str]
+    location: str
+    hash_alg: Optional[str]
+    hash_val: Optional[str]
+    # Most indices do not provide it.
+    metadata: Optional[str] = None
+    requires_python: Optional[str] = None
+
     @classmethod
     def from_json(cls, data):
         return cls(
@@ -178,28 +224,39 @@ class CandidateInfo(namedtuple(
         }
 
     async def get_requirement_infos(self, connection: Connection, session: ClientSession):
-        from dotlock.dist_info.wheel_handling import get_bdist_wheel_requirements
-        from dotlock.dist_info.caching import get_cached_requirement_infos, set_cached_requirement_infos
-        from dotlock.dist_info.package_indices import get_requirment_infos
-        from dotlock.dist_info.sdist_handling import get_sdist_requirements, get_local_package_requirements
-        from dotlock.dist_info.vcs import get_vcs_requirement_infos
+        from dotlock.dist_info.caching import get_cached_requirement_infos
 
-        uncachable_types = (PackageType.vcs, PackageType.local)
         if self.package_type not in uncachable_types:
             requirement_infos = get_cached_requirement_infos(connection, self)
             if requirement_infos is not None:
                 return requirement_infos
 
+        return await _requirement_infos_flights.run(self, self._fetch_requirement_infos, connection, session)
+
+    async def _fetch_requirement_infos(self, connection: Connection, session: ClientSession):
+        from dotlock.dist_info.wheel_handling import get_bdist_wheel_requirements, get_metadata_file_requirements
+        from dotlock.dist_info.caching import set_cached_requirement_infos
+        from dotlock.dist_info.package_indices import get_requirment_infos
+        from dotlock.dist_info.sdist_handling import get_sdist_requirements, get_local_requirement_infos
+        from dotlock.dist_info.vcs import get_vcs_requirement_infos
+
+        requirement_infos: Optional[List[RequirementInfo]]
+        # Whether the requirements apply to the whole release, rather than just this distribution.
+        release = False
         if self.package_type == PackageType.vcs:
-            requirement_infos = await get_vcs_requirement_infos(self)
+            requirement_infos = await get_vcs_requirement_infos(connection, self)
         elif self.package_type == PackageType.local:
-            requirement_infos = get_local_package_requirements(self.name, self.location)
+            requirement_infos = get_local_requirement_infos(connection, self)
         elif self.package_type == PackageType.sdist:
             # Indices do not list dependencies for sdists; they must be downloaded.
             requirement_infos = await get_sdist_requirements(session, self)
         elif self.package_type == PackageType.bdist_wheel:
             # PyPI MAY list dependencies for bdists if using the JSON API.
             requirement_infos = await get_requirment_infos(session, self)
+            release = requirement_infos is not None
+            if requirement_infos is None and self.metadata:
+                # Simple indexes MAY serve the wheel's METADATA file separately (PEP 658).
+                requirement_infos = await get_metadata_file_requirements(session, self)
             if requirement_infos is None:
                 # If the dependencies are null, assume the index just doesn't know about them.
                 requirement_infos = await get_bdist_wheel_requirements(session, self)
@@ -208,11 +265,57 @@ class CandidateInfo(namedtuple(
         assert requirement_infos is not None
 
         if self.package_type not in uncachable_types:
-            set_cached_requirement_infos(connection, self, requirement_infos)
+            set_cached_requirement_infos(connection, self, requirement_infos, release)
 
         return requirement_infos
 
 
+async def _fetch_candidate_infos(
+        package_types: List[PackageType],
+        sources: List[str],
+        connection: Connection,
+        session: ClientSession,
+        name: str,
+        source_timeouts: Optional[Dict[str, float]],
+        version: Optional[Version],
+) -> List[CandidateInfo]:
+    from dotlock.dist_info.caching import set_cached_candidate_infos
+    from dotlock.dist_info.package_indices import get_candidate_infos
+
+    candidate_infos = await get_candidate_infos(package_types, sources, session, name, source_timeouts, version)
+    set_cached_candidate_infos(connection, candidate_infos, complete=version is None)
+    return candidate_infos
+
+
+def _distribution_rank(candidate_info: CandidateInfo) -> Tuple[int, int, str]:
+    from dotlock.dist_info.wheel_filename_parsing import get_tag_priority
+
+    if candidate_info.package_type == PackageType.bdist_wheel:
+        tag_priority = get_tag_priority(candidate_info.location.split('/')[-1])
+        # Wheels whose filenames do not follow PEP 425 are assumed universal, so rank them below tagged wheels.
+        return 0, tag_priority if tag_priority is not None else sys.maxsize, candidate_info.location
+    if candidate_info.package_type == PackageType.sdist:
+        return 1, 0, candidate_info.location
+    return 2, -candidate_info.package_type, candidate_info.location
+
+
+def best_candidate_infos(candidate_infos: Iterable[CandidateInfo]) -> List[CandidateInfo]:
+    """
+    Reduces candidates to one distribution per version: the wheel whose tags are most specific to the environment,
+    falling back to the sdist. Candidates without a version (VCS and local packages) are kept as they are.
+    """
+    best: Dict[Version, CandidateInfo] = {}
+    unversioned = []
+    for candidate_info in candidate_infos:
+        if candidate_info.version is None:
+            unversioned.append(candidate_info)
+            continue
+        current = best.get(candidate_info.version)
+        if current is None or _distribution_rank(candidate_info) < _distribution_rank(current):
+            best[candidate_info.version] = candidate_info
+    return unversioned + list(best.values())
+
+
 def parse_requires_dist(requirement_lines: List[str]) -> List[RequirementInfo]:
     requirements = []
     for line in requirement_lines:
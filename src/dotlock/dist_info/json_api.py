@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urljoin
 import logging
 
@@ -7,11 +8,23 @@ from packaging.version import Version, InvalidVersion
 
 from dotlock.exceptions import UnsupportedHashFunctionError
 from dotlock.dist_info.dist_info import CandidateInfo, PackageType, hash_algorithms
-from dotlock.dist_info.wheel_filename_parsing import is_supported
+from dotlock.dist_info.json_stream import StreamingJSONReader
+from dotlock.dist_info.wheel_filename_parsing import is_supported, python_version_supported
+from dotlock.single_flight import SingleFlight
 
 
 logger = logging.getLogger(__name__)
 
+_metadata_flights = SingleFlight()
+# requires_dist from /pypi/<name>/<version>/json responses by (source, name, version),
+# so that looking up a pinned version's files and then its requirements takes one request.
+# Those lookups happen close together, so only the most recently used entries are kept.
+REQUIRES_DIST_CACHE_SIZE = 1024
+_requires_dist: 'OrderedDict[Tuple[str, str, Version], Optional[List[str]]]' = OrderedDict()
+
+# The only fields of each file in a release listing that we use.
+_DISTRIBUTION_FIELDS = ('filename', 'packagetype', 'url', 'digests', 'requires_python')
+
 
 async def get_json_metadata(
        source: str, session: ClientSession, name: str, version: Optional[Version]
@@ -21,6 +34,30 @@ async def get_json_metadata(
     else:
         url = f'{source}/{name}/{version}/json'
 
+    return await _metadata_flights.run(url, _get_json, session, url)
+
+
+async def get_requires_dist(
+        source: str, session: ClientSession, name: str, version: Version,
+) -> Optional[List[str]]:
+    key = (source, name, version)
+    if key in _requires_dist:
+        _requires_dist.move_to_end(key)
+        return _requires_dist[key]
+    metadata = await get_json_metadata(source, session, name, version)
+    requires_dist = metadata['info']['requires_dist'] if metadata is not None else None
+    _remember_requires_dist(key, requires_dist)
+    return requires_dist
+
+
+def _remember_requires_dist(key: Tuple[str, str, Version], requires_dist: Optional[List[str]]) -> None:
+    _requires_dist[key] = requires_dist
+    _requires_dist.move_to_end(key)
+    while len(_requires_dist) > REQUIRES_DIST_CACHE_SIZE:
+        _requires_dist.popitem(last=False)
+
+
+async def _get_json(session: ClientSession, url: str) -> Optional[Dict[str, dict]]:
     logger.debug('Making API request: %s', url)
     async with session.get(url) as response:
         if response.status == 404:
@@ -29,57 +66,121 @@ async def get_json_metadata(
         return await response.json()
 
 
+async def iter_release_files(stream) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Iterates over (version, distribution) for every file in the 'releases' of a /pypi/<name>/json document,
+    parsing it as it is downloaded instead of loading the whole (potentially very large) document.
+    """
+    reader = StreamingJSONReader(stream)
+    async for key in reader.object_keys():
+        if key != 'releases':
+            await reader.skip()
+            continue
+        async for version_str in reader.object_keys():
+            async for _ in reader.array_items():
+                distribution = await reader.value()
+                yield version_str, {field: distribution.get(field) for field in _DISTRIBUTION_FIELDS}
+
+
 async def get_candidate_infos(
         package_types: List[PackageType],
         source: str,
         session: ClientSession,
         name: str,
+        version: Optional[Version] = None,
+        supported_only: bool = True,
 ) -> Optional[List[CandidateInfo]]:
-    base_metadata = await get_json_metadata(source, session, name, version=None)
-    if base_metadata is None:
-        return None
-
+    if version is not None:
+        metadata = await get_json_metadata(source, session, name, version)
+        if metadata is not None:
+            _remember_requires_dist((source, name, version), metadata['info']['requires_dist'])
+            version_str = metadata['info']['version']
+            return [
+                candidate_info for candidate_info in (
+                    _make_candidate_info(package_types, source, name, version_str, distribution, supported_only)
+                    for distribution in metadata['urls']
+                ) if candidate_info is not None
+            ]
+        # The package may be missing, or the index may know the version by a different spelling (e.g. 1.0.0).
+        logger.debug('No release %s of %s in %s, falling back to the full listing', version, name, source)
+
+    url = f'{source}/{name}/json'
+    logger.debug('Making streaming API request: %s', url)
     candidate_infos = []
-    for version_str, distributions in base_metadata['releases'].items():
-        try:
-            version = Version(version_str)
-        except InvalidVersion:
-            logger.info('Invalid version for %r: %s', name, version_str)
-            continue  # Skip candidates without a valid version.
-
-        for distribution in distributions:
-            package_type = PackageType[distribution['packagetype']]
-
-            if package_type.name.startswith('bdist'):
-                filename = distribution['filename']
-                if not is_supported(filename):
-                    logger.debug('Skipping unsupported bdist %s', filename)
-                    continue
-
-            if package_type not in package_types:
-                logger.debug('Skipping package type %s for %s', package_type.name, name)
-                continue
+    async with session.get(url) as response:
+        if response.status == 404:
+            return None
+        response.raise_for_status()
 
-            candidate_url = urlparse(distribution['url'])
-            if candidate_url.hostname is None:
-                # Convert the relative URL to an absolute URL
-                candidate_url = urlparse(urljoin(source, candidate_url.geturl()))
-
-            for hash_alg in hash_algorithms:
-                hash_val = distribution['digests'].get(hash_alg)
-                if hash_val:
-                    break
-            else:
-                raise UnsupportedHashFunctionError(hash_alg)
-
-            candidate_infos.append(CandidateInfo(
-                name=name,
-                version=version,
-                package_type=package_type,
-                source=source,
-                location=candidate_url.geturl(),
-                hash_alg=hash_alg,
-                hash_val=hash_val,
-            ))
+        async for version_str, distribution in iter_release_files(response.content):
+            if version is not None and not _version_matches(version_str, version):
+                continue
+            candidate_info = _make_candidate_info(
+                package_types, source, name, version_str, distribution, supported_only,
+            )
+            if candidate_info is not None:
+                candidate_infos.append(candidate_info)
 
     return candidate_infos
+
+
+def _version_matches(version_str: str, version: Version) -> bool:
+    try:
+        return Version(version_str) == version
+    except InvalidVersion:
+        return False
+
+
+def _make_candidate_info(
+        package_types: List[PackageType],
+        source: str,
+        name: str,
+        version_str: str,
+        distribution: Dict[str, Any],
+        supported_only: bool,
+) -> Optional[CandidateInfo]:
+    try:
+        version = Version(version_str)
+    except InvalidVersion:
+        logger.info('Invalid version for %r: %s', name, version_str)
+        return None  # Skip candidates without a valid version.
+
+    package_type = PackageType[distribution['packagetype']]
+
+    if package_type.name.startswith('bdist'):
+        filename = distribution['filename']
+        if supported_only and not is_supported(filename):
+            logger.debug('Skipping unsupported bdist %s', filename)
+            return None
+
+    if package_type not in package_types:
+        logger.debug('Skipping package type %s for %s', package_type.name, name)
+        return None
+
+    requires_python = distribution.get('requires_python')
+    if supported_only and not python_version_supported(requires_python):
+        logger.debug('Skipping candidate for %s (requires python %s)', name, requires_python)
+        return None
+
+    candidate_url = urlparse(distribution['url'])
+    if candidate_url.hostname is None:
+        # Convert the relative URL to an absolute URL
+        candidate_url = urlparse(urljoin(source, candidate_url.geturl()))
+
+    for hash_alg in hash_algorithms:
+        hash_val = distribution['digests'].get(hash_alg)
+        if hash_val:
+            break
+    else:
+        raise UnsupportedHashFunctionError(hash_alg)
+
+    return CandidateInfo(
+        name=name,
+        version=version,
+        package_type=package_type,
+        source=source,
+        location=candidate_url.geturl(),
+        hash_alg=hash_alg,
+        hash_val=hash_val,
+        requires_python=requires_python,
+    )
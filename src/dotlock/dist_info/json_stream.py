@@ -0,0 +1,105 @@
+"""
+Incremental parsing of large JSON documents as they are downloaded.
+
+Only the structure being walked is tracked; each value the caller asks for is decoded with
+the standard (C-accelerated) decoder once its text has arrived, and then discarded from the buffer.
+"""
+from typing import Any, AsyncIterator
+import codecs
+import json
+
+
+class StreamingJSONReader:
+    """
+    Reads JSON from anything with an async readany() method, e.g. aiohttp.ClientResponse.content.
+
+    Use object_keys() and array_items() to walk into containers and value() or skip() to consume
+    everything else. Memory use is bounded by the largest value consumed with value() or skip().
+    """
+    def __init__(self, stream) -> None:
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    async def _fill(self, min_size: int = 1) -> None:
+        # Drop everything already consumed, then read at least min_size more characters.
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        target_size = len(self._buffer) + min_size
+        while len(self._buffer) < target_size and not self._eof:
+            chunk = await self._stream.readany()
+            if not chunk:
+                self._eof = True
+            self._buffer += self._decoder.decode(chunk, final=self._eof)
+
+    async def peek(self) -> str:
+        """Returns the next non-whitespace character, without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise ValueError('Unexpected end of JSON document')
+            await self._fill()
+
+    async def expect(self, char: str) -> None:
+        actual = await self.peek()
+        if actual != char:
+            raise ValueError(f'Expected {char!r} in JSON document, found {actual!r}')
+        self._pos += 1
+
+    async def value(self) -> Any:
+        """Decodes and returns the next value."""
+        await self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            # Grow the buffer geometrically so large values are not re-scanned too many times.
+            await self._fill(min_size=max(len(self._buffer) - self._pos, 1))
+
+    async def skip(self) -> None:
+        await self.value()
+
+    async def object_keys(self) -> AsyncIterator[str]:
+        """Iterates over the keys of the next object. The caller must consume each key's value."""
+        await self.expect('{')
+        if await self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = await self.value()
+            await self.expect(':')
+            yield key
+            separator = await self.peek()
+            self._pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f'Expected "," or "}}" in JSON document, found {separator!r}')
+
+    async def array_items(self) -> AsyncIterator[None]:
+        """Iterates over the next array, stopping at each item. The caller must consume each item."""
+        await self.expect('[')
+        if await self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield None
+            separator = await self.peek()
+            self._pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f'Expected "," or "]" in JSON document, found {separator!r}')
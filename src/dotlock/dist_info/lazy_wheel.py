@@ -0,0 +1,112 @@
+"""
+Reads files out of remote wheels using HTTP Range requests, so that only the
+zip central directory and the members we need are downloaded.
+"""
+from typing import List, Optional, Tuple
+import io
+import logging
+import os
+import re
+
+from aiohttp import ClientResponse, ClientSession
+
+from dotlock.exceptions import PackageIndexError
+
+
+logger = logging.getLogger(__name__)
+
+# Fetching less than this per request wastes round trips on tiny reads.
+MIN_FETCH_SIZE = 64 * 1024
+_CONTENT_RANGE_RE = re.compile(r'bytes (?P<start>\d+)-(?P<end>\d+)/(?P<length>\d+)')
+
+
+class MissingRange(Exception):
+    """Raised when reading bytes that have not been fetched yet."""
+    def __init__(self, start: int, end: int) -> None:
+        self.start = start
+        self.end = end
+        super().__init__(f'bytes {start}-{end} have not been fetched')
+
+
+class RangeRequestsUnsupported(Exception):
+    """
+    Raised when the server does not serve a requested range. If it responded with the full file instead,
+    response is that response, which the caller must release.
+    """
+    def __init__(self, response: Optional[ClientResponse] = None) -> None:
+        self.response = response
+
+
+class LazyWheel(io.RawIOBase):
+    """
+    A read-only, seekable file over a remote wheel, holding only the byte ranges fetched so far.
+    Reads of bytes that have not been fetched raise MissingRange; the caller should
+    fetch the range and retry, which is safe for the deterministic reads zipfile makes.
+    """
+    def __init__(self, session: ClientSession, url: str) -> None:
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.length = 0
+        self._chunks: List[Tuple[int, bytes]] = []
+        self._pos = 0
+
+    async def _request(self, range_header: str) -> Tuple[int, bytes]:
+        headers = {'Range': range_header, 'Accept-Encoding': 'identity'}
+        response = await self.session.get(self.url, headers=headers)
+        if response.status != 206:
+            if response.status >= 400:
+                async with response:
+                    response.raise_for_status()
+            # The caller owns the response and must release it.
+            raise RangeRequestsUnsupported(response)
+
+        async with response:
+            match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            if match is None:
+                raise PackageIndexError(f'Invalid Content-Range for {self.url}')
+            self.length = int(match.group('length'))
+            return int(match.group('start')), await response.read()
+
+    async def fetch_tail(self) -> None:
+        # The tail contains the end of central directory record and, for most wheels, the central directory.
+        logger.debug('fetching tail of %s', self.url)
+        self._chunks.append(await self._request(f'bytes=-{MIN_FETCH_SIZE}'))
+
+    async def fetch(self, start: int, end: int) -> None:
+        fetch_end = min(max(end, start + MIN_FETCH_SIZE), self.length)
+        logger.debug('fetching bytes %d-%d of %s', start, fetch_end, self.url)
+        chunk_start, data = await self._request(f'bytes={start}-{fetch_end - 1}')
+        if chunk_start > start or chunk_start + len(data) < end:
+            # Servers may send less than was asked for. Reading would then miss the same range again.
+            logger.debug('got bytes %d-%d of %s instead', chunk_start, chunk_start + len(data), self.url)
+            raise RangeRequestsUnsupported()
+        self._chunks.append((chunk_start, data))
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.length
+        if offset < 0:
+            raise OSError(f'Invalid seek position {offset}')
+        self._pos = offset
+        return self._pos
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        start = self._pos
+        end = self.length if size is None or size < 0 else min(start + size, self.length)
+        for chunk_start, data in self._chunks:
+            if chunk_start <= start and end <= chunk_start + len(data):
+                self._pos = end
+                return data[start - chunk_start:end - chunk_start]
+        raise MissingRange(start, end)
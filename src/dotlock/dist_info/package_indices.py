@@ -1,31 +1,71 @@
 """Functions for making API requests to PyPI."""
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
 import logging
 
 from aiohttp import ClientSession
+from packaging.version import Version
 
 from dotlock.dist_info import json_api, simple_api
 from dotlock.dist_info.dist_info import CandidateInfo, RequirementInfo, PackageType, parse_requires_dist
-from dotlock.exceptions import NotFound
+from dotlock.exceptions import NotFound, PackageIndexError
 
 
 logger = logging.getLogger(__name__)
 
 
+async def _get_source_candidate_infos(
+        package_types: List[PackageType],
+        source: str,
+        session: ClientSession,
+        name: str,
+        timeout: Optional[float],
+        version: Optional[Version],
+        supported_only: bool,
+) -> Optional[List[CandidateInfo]]:
+    if source.endswith('simple'):
+        request = simple_api.get_candidate_infos(package_types, source, session, name, version, supported_only)
+    else:
+        request = json_api.get_candidate_infos(package_types, source, session, name, version, supported_only)
+
+    try:
+        return await asyncio.wait_for(request, timeout)
+    except asyncio.TimeoutError:
+        raise PackageIndexError(f'Timed out after {timeout}s looking up {name} in {source}')
+
+
 async def get_candidate_infos(
         package_types: List[PackageType],
         sources: List[str],
         session: ClientSession,
         name: str,
+        source_timeouts: Optional[Dict[str, float]] = None,
+        version: Optional[Version] = None,
+        supported_only: bool = True,
 ) -> List[CandidateInfo]:
-    for source in sources:
-        if source.endswith('simple'):
-            result = await simple_api.get_candidate_infos(package_types, source, session, name)
-        else:
-            result = await json_api.get_candidate_infos(package_types, source, session, name)
-
-        if result is not None:
-            return result
+    """
+    Queries all sources concurrently, returning the result from the first source (in order) that has the package.
+    Requests to later sources are cancelled as soon as an earlier source has the package.
+    If version is given, only candidates with that version are returned. Unless supported_only is False,
+    only candidates that can be installed in the current environment are returned.
+    """
+    source_timeouts = source_timeouts or {}
+    tasks = [
+        asyncio.ensure_future(_get_source_candidate_infos(
+            package_types, source, session, name, source_timeouts.get(source), version, supported_only,
+        )) for source in sources
+    ]
+    try:
+        for task in tasks:
+            result = await task
+            if result is not None:
+                return result
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Errors from lower-priority sources are irrelevant once we have a result.
 
     raise NotFound(name, version=None)
 
@@ -34,13 +74,9 @@ async def get_requirment_infos(
         session: ClientSession,
         candidate: CandidateInfo,
 ) -> Optional[List[RequirementInfo]]:
-    if candidate.source.endswith('simple'):
+    if candidate.source is None or candidate.source.endswith('simple') or candidate.version is None:
         return None
-    metadata = await json_api.get_json_metadata(candidate.source, session, candidate.name, candidate.version)
-    if metadata is None:
-        return None
-    requires_dist = metadata['info']['requires_dist']
+    requires_dist = await json_api.get_requires_dist(candidate.source, session, candidate.name, candidate.version)
     if requires_dist is not None:
         return parse_requires_dist(requires_dist)
     return None
-
@@ -1,9 +1,12 @@
+from pathlib import Path
+from sqlite3 import Connection
+from typing import List
 import asyncio
+import distutils.core
+import hashlib
 import logging
 import os
 import sys
-import distutils.core
-from typing import List
 
 from aiohttp import ClientSession
 from packaging.utils import canonicalize_name
@@ -14,6 +17,9 @@ from dotlock.tempdir import temp_working_dir
 
 logger = logging.getLogger(__name__)
 
+# Files that can determine a local package's requirements, relative to the package directory.
+METADATA_FILE_PATTERNS = ['setup.py', 'setup.cfg', 'pyproject.toml', 'requirements*.txt', 'requirements/*.txt']
+
 
 def run_setup(*args):
     """
@@ -127,3 +133,35 @@ def get_local_package_requirements(candidate_name: str, package_dir: str) -> Lis
 
     logger.debug('%s sdist requires: %r', candidate_name, install_requires)
     return parse_requires_dist(install_requires)
+
+
+def local_package_fingerprint(package_dir: str) -> str:
+    """Returns a hash of the files in package_dir that can affect the package's requirements."""
+    root = Path(package_dir)
+    paths = sorted({path for pattern in METADATA_FILE_PATTERNS for path in root.glob(pattern) if path.is_file()})
+    hasher = hashlib.sha256()
+    for path in paths:
+        contents = path.read_bytes()
+        # Include names and lengths, so that moving content between files changes the fingerprint.
+        hasher.update(f'{path.relative_to(root).as_posix()}\0{len(contents)}\0'.encode())
+        hasher.update(contents)
+    return f'sha256:{hasher.hexdigest()}'
+
+
+def get_local_requirement_infos(connection: Connection, candidate_info: CandidateInfo) -> List[RequirementInfo]:
+    """
+    Gets the requirements of a local package, which are cached until its metadata files change.
+    Requirements computed in setup.py from other files are only picked up when a metadata file changes too.
+    """
+    from dotlock.dist_info.caching import get_cached_revision_requirement_infos, set_cached_revision_requirement_infos
+
+    assert candidate_info.package_type == PackageType.local
+    package_dir = os.path.abspath(candidate_info.location)
+    fingerprint = local_package_fingerprint(package_dir)
+    requirement_infos = get_cached_revision_requirement_infos(connection, candidate_info.name, package_dir, fingerprint)
+    if requirement_infos is None:
+        requirement_infos = get_local_package_requirements(candidate_info.name, package_dir)
+        set_cached_revision_requirement_infos(
+            connection, candidate_info.name, package_dir, fingerprint, requirement_infos,
+        )
+    return requirement_infos
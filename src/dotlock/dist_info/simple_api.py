@@ -1,48 +1,130 @@
 """
-For interfacing with the Simple Repository API specified in PEP 503.
+For interfacing with the Simple Repository API specified in PEP 503,
+including the JSON form of it specified in PEP 691.
 """
-from html.parser import HTMLParser
-from typing import List, Optional
-from urllib.parse import urlparse, urldefrag, ParseResult, urljoin
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse, urljoin, unquote
+import html
 import logging
 import re
 
 from aiohttp import ClientSession
 from packaging.version import Version, InvalidVersion
-from packaging.specifiers import SpecifierSet
 
-from dotlock.env import pep425tags
 from dotlock.exceptions import UnsupportedHashFunctionError
 from dotlock.dist_info.dist_info import CandidateInfo, PackageType, hash_algorithms
-from dotlock.dist_info.wheel_filename_parsing import is_supported, get_wheel_version
+from dotlock.dist_info.wheel_filename_parsing import is_supported, get_wheel_version, python_version_supported
 
 
 logger = logging.getLogger(__name__)
 
+JSON_CONTENT_TYPE = 'application/vnd.pypi.simple.v1+json'
+# Prefer the PEP 691 JSON form, but accept any of the HTML forms as a fallback.
+ACCEPT_HEADER = ', '.join([
+    JSON_CONTENT_TYPE,
+    'application/vnd.pypi.simple.v1+html;q=0.2',
+    'text/html;q=0.01',
+])
+
+# A link to a distribution file, as (url, filename, package_type, {hash_alg: hash_val}, metadata, requires_python).
+# The metadata is the PEP 658 attribute value, see CandidateInfo.
+Link = Tuple[str, str, PackageType, Dict[str, str], Optional[str], Optional[str]]
+
+# Matches <a ...> tags, allowing for unescaped '>' within quoted attribute values.
+_ANCHOR_RE = re.compile(r'''<a\s((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+
+
+def file_package_type(
+        filename: str, package_types: List[PackageType], supported_only: bool = True,
+) -> Optional[PackageType]:
+    """Returns the PackageType of a distribution file, or None if it should be skipped."""
+    if filename.endswith('.whl'):
+        package_type = PackageType.bdist_wheel
+        if supported_only and package_type in package_types and not is_supported(filename):
+            logger.debug('Skipping unsupported bdist %s', filename)
+            return None
+    else:
+        package_type = PackageType.sdist
 
-class PackagePageHTMLParser(HTMLParser):
-    def __init__(self, name):
-        super().__init__()
-        self.name = name
-        self.urls: List[ParseResult] = []
+    if package_type not in package_types:
+        logger.debug('Skipping package type %s for %s', package_type.name, filename)
+        return None
+    return package_type
 
-    def handle_starttag(self, tag, attrs):
-        if tag != 'a':
-            return
 
-        attrs = dict(attrs)
-        url = urlparse(attrs['href'])
+def _accept_file(
+        name: str,
+        filename: str,
+        requires_python: Optional[str],
+        package_types: List[PackageType],
+        supported_only: bool,
+) -> Optional[PackageType]:
+    package_type = file_package_type(filename, package_types, supported_only)
+    if package_type is None:
+        return None
+    if supported_only and not python_version_supported(requires_python):
+        logger.debug('Skipping candidate for %s (requires python %s)', name, requires_python)
+        return None
+    return package_type
+
+
+def parse_html_page(
+        name: str, content: str, package_types: List[PackageType], supported_only: bool = True,
+) -> List[Link]:
+    links = []
+    for anchor_match in _ANCHOR_RE.finditer(content):
+        attrs = {}
+        for attr_name, double_quoted, single_quoted, unquoted in _ATTRIBUTE_RE.findall(anchor_match.group(1)):
+            value = double_quoted or single_quoted or unquoted
+            attrs[attr_name.lower()] = html.unescape(value) if '&' in value else value
+
+        href = attrs.get('href')
+        if not href:
+            continue
+        url, _, fragment = href.partition('#')
+        filename = unquote(url.split('?', 1)[0].rsplit('/', 1)[-1])
 
         requires_python = attrs.get('data-requires-python')
-        if requires_python:
-            requires_python = requires_python.replace('&gt;', '>').replace('&lt;', '<')
-            python_specifier = SpecifierSet(requires_python)
-            python_version = Version(pep425tags['version'])
-            if not python_specifier.contains(python_version):
-                logger.debug('Skipping candidate for %s (requires python %s)', self.name, requires_python)
-                return
+        package_type = _accept_file(name, filename, requires_python, package_types, supported_only)
+        if package_type is None:
+            continue
+
+        hashes = {}
+        if fragment:
+            hash_alg, hash_val = fragment.split('=')
+            hashes[hash_alg] = hash_val
+        # PEP 714 renamed data-dist-info-metadata to data-core-metadata.
+        metadata = attrs.get('data-core-metadata') or attrs.get('data-dist-info-metadata')
+        links.append((url, filename, package_type, hashes, metadata, requires_python))
+    return links
+
+
+def _json_metadata_attr(value: Union[bool, Dict[str, str], None]) -> Optional[str]:
+    """Converts a PEP 691 core-metadata value into the equivalent PEP 658 attribute value."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        for hash_alg in hash_algorithms:
+            if hash_alg in value:
+                return f'{hash_alg}={value[hash_alg]}'
+    return 'true'
+
+
+def parse_json_page(name: str, data: dict, package_types: List[PackageType], supported_only: bool = True) -> List[Link]:
+    links = []
+    for file_data in data['files']:
+        filename = file_data['filename']
+        requires_python = file_data.get('requires-python')
+        package_type = _accept_file(name, filename, requires_python, package_types, supported_only)
+        if package_type is None:
+            continue
 
-        self.urls.append(url)
+        # PEP 714 renamed dist-info-metadata to core-metadata.
+        metadata = file_data.get('core-metadata', file_data.get('dist-info-metadata'))
+        hashes = file_data['hashes']
+        links.append((file_data['url'], filename, package_type, hashes, _json_metadata_attr(metadata), requires_python))
+    return links
 
 
 _SDIST_EXTS_RE = r'(\.tar\.gz|\.tar\.bz2|\.zip)'
@@ -54,60 +136,65 @@ async def get_candidate_infos(
         source: str,
         session: ClientSession,
         name: str,
+        version: Optional[Version] = None,
+        supported_only: bool = True,
 ) -> Optional[List[CandidateInfo]]:
+    """
+    Returns the candidates listed for a package, or only those with the given version.
+    Unless supported_only is False, files that cannot be installed in the current environment are left out.
+    """
     index_url = f'{source}/{name}/'
-    async with session.get(index_url) as response:
+    async with session.get(index_url, headers={'Accept': ACCEPT_HEADER}) as response:
         if response.status == 404:
             return None
         response.raise_for_status()
-        content = await response.text()
-
-    parser = PackagePageHTMLParser(name)
-    parser.feed(content)
+        if response.content_type == JSON_CONTENT_TYPE:
+            links = parse_json_page(name, await response.json(content_type=None), package_types, supported_only)
+        else:
+            links = parse_html_page(name, await response.text(), package_types, supported_only)
 
     candidate_infos = []
-    for candidate_url in parser.urls:
+    for url, filename, package_type, hashes, metadata, requires_python in links:
+        candidate_url = urlparse(url)
         if candidate_url.hostname is None:
             # Convert the relative URL to an absolute URL
             candidate_url = urlparse(urljoin(source, candidate_url.geturl()))
 
-        if not candidate_url.fragment:
+        if not hashes:
             raise UnsupportedHashFunctionError(hash_function=None)
-        hash_alg, hash_val = candidate_url.fragment.split('=')
-        if hash_alg not in hash_algorithms:
-            raise UnsupportedHashFunctionError(hash_alg)
-
-        filename = candidate_url.path.split('/')[-1]
+        for hash_alg in hash_algorithms:
+            hash_val = hashes.get(hash_alg)
+            if hash_val:
+                break
+        else:
+            raise UnsupportedHashFunctionError(next(iter(hashes)))
 
         try:
-            if filename.endswith('.whl'):
-                package_type = PackageType.bdist_wheel
-                if not is_supported(filename):
-                    logger.debug('Skipping unsupported bdist %s', filename)
-                    continue
-
-                version = get_wheel_version(filename)
+            if package_type == PackageType.bdist_wheel:
+                file_version = get_wheel_version(filename)
             else:
-                package_type = PackageType.sdist
-
                 parsed_filename = _SDIST_FILENAME_RE.match(filename)
                 if not parsed_filename:
                     logging.debug(f'Skipping unrecognized filename {filename}')
                     continue
 
-                version = Version(parsed_filename.group('ver'))
+                file_version = Version(parsed_filename.group('ver'))
         except InvalidVersion:
             logger.debug('Skipping invalid version for file %s', filename)
             continue
+        if version is not None and file_version != version:
+            continue
 
         candidate_infos.append(CandidateInfo(
             name=name,
             package_type=package_type,
-            version=version,
+            version=file_version,
             source=source,
-            location=urldefrag(candidate_url.geturl()).url,  # Strip [hash_alg]= fragment.
+            location=candidate_url.geturl(),
             hash_alg=hash_alg,
             hash_val=hash_val,
+            metadata=metadata if package_type == PackageType.bdist_wheel else None,
+            requires_python=requires_python,
         ))
 
     return candidate_infos
@@ -1,16 +1,53 @@
+"""
+Fetching packages from version control.
+
+Git repositories are kept as bare mirrors in the dotlock cache, so that each lock or install only fetches
+new commits. Refs are resolved to commit hashes, which are recorded in package.lock.json, and each
+commit is checked out shallowly. Mercurial and Subversion repositories are cloned in full each time.
+"""
+from pathlib import Path
+from sqlite3 import Connection
+from typing import List, Optional, Set, Tuple
 import asyncio
-from typing import List
+import asyncio.subprocess
+import hashlib
+import logging
+import os
+import re
 
-from dotlock.dist_info.dist_info import CandidateInfo, PackageType
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType, RequirementInfo
 from dotlock.dist_info.sdist_handling import get_local_package_requirements
 from dotlock.exceptions import VCSException
+from dotlock.single_flight import SingleFlight
 from dotlock.tempdir import temp_working_dir
+from dotlock._vendored.appdirs import user_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+_COMMIT_HASH_RE = re.compile(r'[0-9a-f]{40}')
+_mirror_flights = SingleFlight()
+# Mirrors already fetched by this process.
+_fetched_mirrors: Set[Path] = set()
+
+
+def parse_vcs_url(vcs_url: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Splits a VCS URL into its type, URL and revision,
+    e.g. 'git+https://github.com/pypa/pip.git@10.0.1' into ('git', 'https://github.com/pypa/pip.git', '10.0.1').
+    """
+    vcs_type, url = vcs_url.split('+', 1)
+    revision = None
+    # Only look for a revision in the path, since the netloc may contain a user, e.g. git+ssh://git@github.com/...
+    path_start = url.find('/', url.find('://') + len('://'))
+    if path_start != -1 and '@' in url[path_start:]:
+        url, revision = url.rsplit('@', 1)
+    return vcs_type, url, revision
 
 
 def clone_command(vcs_url: str) -> List[str]:
-    vcs_type, url = vcs_url.split('+')
-    if '@' in url:
-        url, revision = url.split('@')
+    vcs_type, url, revision = parse_vcs_url(vcs_url)
+    if revision is not None:
         return {
             'git': ['git', 'clone', '--branch', revision, url],
             'hg': ['hg', 'clone', '-r', revision, url],
@@ -36,8 +73,106 @@ async def clone(vcs_url: str):
     return clone_dir_name
 
 
-async def get_vcs_requirement_infos(candidate_info: CandidateInfo):
+async def _git(*args: str) -> str:
+    process = await asyncio.create_subprocess_exec(
+        'git', *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise VCSException(f'git {args[0]} failed: {stderr.decode(errors="replace").strip()}')
+    return stdout.decode().strip()
+
+
+def mirror_path(url: str) -> Path:
+    name = url.rstrip('/').split('/')[-1]
+    if not name.endswith('.git'):
+        name += '.git'
+    url_hash = hashlib.sha256(url.encode()).hexdigest()[:16]
+    return Path(user_cache_dir('dotlock')) / 'vcs' / f'{url_hash}-{name}'
+
+
+async def _update_mirror(url: str, path: Path) -> None:
+    if path.exists():
+        logger.info('Fetching %s', url)
+        await _git('--git-dir', str(path), 'fetch', '--prune', '--tags', 'origin')
+    else:
+        logger.info('Mirroring %s', url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Clone next to the final path, so that an interrupted clone is not mistaken for a mirror.
+        partial_path = path.with_name(path.name + '.part')
+        await _git('clone', '--mirror', '--quiet', url, str(partial_path))
+        os.replace(str(partial_path), str(path))
+    _fetched_mirrors.add(path)
+
+
+async def _rev_parse(path: Path, revision: str) -> Optional[str]:
+    try:
+        return await _git('--git-dir', str(path), 'rev-parse', '--verify', '--quiet', f'{revision}^{{commit}}')
+    except VCSException:
+        return None
+
+
+async def resolve_git_revision(url: str, revision: Optional[str], update: bool) -> str:
+    """
+    Returns the commit hash that revision (a branch, tag or commit, or None for the default branch) refers to.
+    Unless update is set, refs already in the mirror are resolved without fetching.
+    """
+    path = mirror_path(url)
+    revision = revision or 'HEAD'
+    if path.exists() and (not update or _COMMIT_HASH_RE.fullmatch(revision) or path in _fetched_mirrors):
+        commit = await _rev_parse(path, revision)
+        if commit is not None:
+            return commit
+
+    await _mirror_flights.run(path, _update_mirror, url, path)
+    commit = await _rev_parse(path, revision)
+    if commit is None:
+        raise VCSException(f'No revision {revision} in {url}')
+    return commit
+
+
+async def pin_vcs_url(vcs_url: str, update: bool) -> str:
+    """Returns vcs_url with its revision resolved to a commit hash, if it is a git URL."""
+    vcs_type, url, revision = parse_vcs_url(vcs_url)
+    if vcs_type != 'git':
+        return vcs_url
+    commit = await resolve_git_revision(url, revision, update)
+    return f'{vcs_type}+{url}@{commit}'
+
+
+async def checkout(vcs_url: str, directory: str) -> None:
+    """Checks out vcs_url into directory, which must not exist."""
+    vcs_type, url, revision = parse_vcs_url(vcs_url)
+    if vcs_type != 'git':
+        clone_dir_name = await clone(vcs_url)
+        os.rename(clone_dir_name, directory)
+        return
+
+    commit = await resolve_git_revision(url, revision, update=False)
+    # Fetch just the one commit from the mirror, rather than cloning its whole history.
+    await _git('init', '--quiet', directory)
+    await _git('-C', directory, 'fetch', '--quiet', '--depth', '1', mirror_path(url).as_uri(), commit)
+    await _git('-C', directory, 'checkout', '--quiet', '--detach', 'FETCH_HEAD')
+
+
+async def get_vcs_requirement_infos(connection: Connection, candidate_info: CandidateInfo) -> List[RequirementInfo]:
+    from dotlock.dist_info.caching import get_cached_revision_requirement_infos, set_cached_revision_requirement_infos
+
     assert candidate_info.package_type == PackageType.vcs
+    vcs_type, url, revision = parse_vcs_url(candidate_info.location)
+    # A commit's requirements never change, so they can be cached.
+    commit = None
+    if vcs_type == 'git' and revision is not None and _COMMIT_HASH_RE.fullmatch(revision):
+        commit = revision
+    if commit is not None:
+        requirement_infos = get_cached_revision_requirement_infos(connection, candidate_info.name, url, commit)
+        if requirement_infos is not None:
+            return requirement_infos
+
     with temp_working_dir():
-        clone_dir_name = await clone(candidate_info.location)
-        return get_local_package_requirements(candidate_info.name, clone_dir_name)
+        await checkout(candidate_info.location, candidate_info.name)
+        requirement_infos = get_local_package_requirements(candidate_info.name, candidate_info.name)
+
+    if commit is not None:
+        set_cached_revision_requirement_infos(connection, candidate_info.name, url, commit, requirement_infos)
+    return requirement_infos
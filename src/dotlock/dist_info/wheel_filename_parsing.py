@@ -1,13 +1,56 @@
-from typing import Optional, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import itertools
+import logging
 import re
 
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
 from packaging.version import Version, InvalidVersion
 
 from dotlock.env import pep425tags
+from dotlock._vendored.glibc import parse_libc_version
 from dotlock._vendored.pep425tags import _osx_arch_pat, get_darwin_arches
 
 
-def get_supported(version, platform, impl, abi, manylinux1, noarch=False):
+logger = logging.getLogger(__name__)
+
+
+# Legacy manylinux tags (PEP 513, 571 and 599) are aliases for manylinux_x_y tags (PEP 600).
+_LEGACY_MANYLINUX = {
+    (2, 17): ('manylinux2014', {'x86_64', 'i686', 'aarch64', 'armv7l', 'ppc64', 'ppc64le', 's390x'}),
+    (2, 12): ('manylinux2010', {'x86_64', 'i686'}),
+    (2, 5): ('manylinux1', {'x86_64', 'i686'}),
+}
+
+
+def get_linux_platforms(platform: str, glibc: Optional[str], musl: Optional[str]) -> List[str]:
+    """
+    Returns the platform tags supported on Linux with the given glibc or musl version ('major.minor'),
+    most specific first, i.e. the newest manylinux/musllinux tags and ending with the plain platform.
+    """
+    machine = platform[len('linux_'):]
+    platforms = []
+    glibc_version = parse_libc_version(glibc)
+    if glibc_version is not None:
+        major, minor = glibc_version
+        # The first manylinux tag for each architecture assumed at least this glibc version.
+        oldest_minor = 5 if machine in {'x86_64', 'i686'} else 17
+        for glibc_minor in range(minor, oldest_minor - 1, -1):
+            platforms.append(f'manylinux_{major}_{glibc_minor}_{machine}')
+            legacy_tag, legacy_machines = _LEGACY_MANYLINUX.get((major, glibc_minor), (None, ()))
+            if machine in legacy_machines:
+                platforms.append(f'{legacy_tag}_{machine}')
+    musl_version = parse_libc_version(musl)
+    if musl_version is not None:
+        major, minor = musl_version
+        for musl_minor in range(minor, -1, -1):
+            platforms.append(f'musllinux_{major}_{musl_minor}_{machine}')
+    platforms.append(platform)
+    return platforms
+
+
+def get_supported(version, platform, impl, abi, manylinux1, glibc=None, musl=None, noarch=False):
     """
     Based on get_supported in https://github.com/pypa/pip/blob/10.0.1/src/pip/_internal/pep425tags.py
     but differs in that it accepts full platform specification instead of using the current platform,
@@ -49,6 +92,9 @@ def get_supported(version, platform, impl, abi, manylinux1, noarch=False):
             else:
                 # arch pattern didn't match (?!)
                 arches = [arch]
+        # NOT IN ORIGINAL: support manylinux_x_y and musllinux for the target's libc.
+        elif arch.startswith('linux_') and (glibc or musl):
+            arches = get_linux_platforms(arch, glibc, musl)
         # DIFFERS FROM ORIGINAL: support manylinux1 even if platform is specified.
         elif manylinux1:
             arches = [arch.replace('linux', 'manylinux1'), arch]
@@ -85,9 +131,6 @@ def get_supported(version, platform, impl, abi, manylinux1, noarch=False):
         if i == 0:
             supported.append(('py%s' % (version[0]), 'none', 'any'))
 
-    # NOT IN ORIGINAL: support universal wheels
-    supported.append(('py2.py3', 'none', 'any'))
-
     return supported
 
 
@@ -113,10 +156,65 @@ def get_pep425_tag(filename: str) -> Optional[Tuple[str, str, str]]:
     return None
 
 
+def expand_tag(pep425_tag: Tuple[str, str, str]) -> Iterable[Tuple[str, str, str]]:
+    """Expands a compressed tag set such as ('py2.py3', 'none', 'any') into the individual tags."""
+    python_tags, abi_tags, platform_tags = (part.split('.') for part in pep425_tag)
+    return itertools.product(python_tags, abi_tags, platform_tags)
+
+
+@lru_cache(maxsize=None)
+def _get_tag_priorities(frozen_pep425tags: Tuple[Tuple[str, Any], ...]) -> Mapping[Tuple[str, str, str], int]:
+    priorities: Dict[Tuple[str, str, str], int] = {}
+    for priority, tag in enumerate(get_supported(**dict(frozen_pep425tags))):
+        priorities.setdefault(tag, priority)
+    return MappingProxyType(priorities)
+
+
+def get_tag_priorities() -> Mapping[Tuple[str, str, str], int]:
+    """
+    Maps each tag the target environment supports to its position in get_supported, lower being more
+    specific to the environment. Computed once per environment, since filtering large release listings
+    looks up every wheel's tags.
+    """
+    return _get_tag_priorities(tuple(sorted(pep425tags.items())))
+
+
+def get_tag_priority(filename: str) -> Optional[int]:
+    """
+    Returns the priority of the wheel's most specific supported tag (see get_tag_priorities),
+    or None if the wheel is unsupported or its filename does not follow PEP 425.
+    """
+    pep425_tag = get_pep425_tag(filename)
+    if pep425_tag is None:
+        return None
+    priorities = get_tag_priorities()
+    return min((priorities[tag] for tag in expand_tag(pep425_tag) if tag in priorities), default=None)
+
+
 def is_supported(filename: str) -> bool:
     # Per PEP 425, bdist filename encodes what environments the distribution supports.
     pep425_tag = get_pep425_tag(filename)
     # Some bdists don't follow PEP 425 and right now we just assume those are universal.
     if pep425_tag is None:
         return True
-    return pep425_tag in get_supported(**pep425tags)
+    priorities = get_tag_priorities()
+    return any(tag in priorities for tag in expand_tag(pep425_tag))
+
+
+@lru_cache(maxsize=None)
+def _python_version_supported(requires_python: str, python_version: str) -> bool:
+    try:
+        specifier = SpecifierSet(requires_python)
+    except InvalidSpecifier:
+        # Like pip, ignore requires-python metadata we cannot parse rather than skipping the file.
+        logger.debug('Ignoring invalid requires-python %r', requires_python)
+        return True
+    return specifier.contains(Version(python_version))
+
+
+def python_version_supported(requires_python: Optional[str]) -> bool:
+    """Whether a distribution's requires-python metadata allows the target Python version."""
+    # The same few requires-python strings appear on thousands of files, so memoize the comparison.
+    if not requires_python:
+        return True
+    return _python_version_supported(requires_python, pep425tags['version'])
@@ -1,4 +1,6 @@
-from typing import List
+from typing import Iterable, List, Optional
+import hashlib
+import io
 import logging
 import os
 import zipfile
@@ -9,6 +11,8 @@ from packaging.utils import canonicalize_name
 from pkg_resources import parse_requirements
 
 from dotlock.dist_info.dist_info import RequirementInfo, CandidateInfo, PackageType, SpecifierType
+from dotlock.dist_info.lazy_wheel import LazyWheel, MissingRange, RangeRequestsUnsupported
+from dotlock.exceptions import HashMismatchError
 from dotlock.markers import Marker
 from dotlock.tempdir import temp_working_dir
 
@@ -23,10 +27,26 @@ async def get_bdist_wheel_requirements(session: ClientSession, candidate_info: C
     url = candidate_info.location
     filename = url.split('/')[-1]
 
+    # Try to download just the parts of the wheel we need.
+    lazy_wheel = LazyWheel(session, url)
+    try:
+        await lazy_wheel.fetch_tail()
+        while True:
+            try:
+                return get_wheel_file_requirements(filename, lazy_wheel)
+            except MissingRange as e:
+                await lazy_wheel.fetch(e.start, e.end)
+    except RangeRequestsUnsupported as e:
+        logger.debug('%s does not support range requests', url)
+        response = e.response
+
     with temp_working_dir():
-        # Download the wheel.
+        # Download the wheel, re-using the response to the range request if it contains the whole file.
         logger.debug('downloading wheel %s', url)
-        async with session.get(url) as response:
+        if response is None:
+            response = await session.get(url)
+        async with response:
+            response.raise_for_status()
             with open(filename, 'wb') as fp:
                 async for chunk in response.content.iter_any():
                     fp.write(chunk)
@@ -34,20 +54,54 @@ async def get_bdist_wheel_requirements(session: ClientSession, candidate_info: C
         return get_wheel_file_requirements(filename)
 
 
-def get_wheel_file_requirements(filename: str) -> List[RequirementInfo]:
+async def get_metadata_file_requirements(session: ClientSession, candidate_info: CandidateInfo) -> List[RequirementInfo]:
+    """
+    Gets the requirements for a wheel from the METADATA file served alongside it, per PEP 658.
+    """
+    assert candidate_info.package_type == PackageType.bdist_wheel
+    assert candidate_info.metadata
+
+    url = candidate_info.location + '.metadata'
+    logger.debug('downloading metadata file %s', url)
+    async with session.get(url) as response:
+        response.raise_for_status()
+        contents = await response.read()
+
+    if candidate_info.metadata != 'true':
+        hash_alg, hash_val = candidate_info.metadata.split('=', 1)
+        digest = hashlib.new(hash_alg, contents).hexdigest()
+        if digest != hash_val:
+            raise HashMismatchError(candidate_info.name, candidate_info.version, digest, hash_val)
+
+    return parse_metadata_requirements(contents.decode('utf-8').splitlines())
+
+
+def get_wheel_file_requirements(filename: str, fileobj: Optional[io.IOBase] = None) -> List[RequirementInfo]:
+    """
+    Args:
+        filename: the wheel's filename, which must be a path to the wheel unless fileobj is given.
+        fileobj: a file-like object to read the wheel from instead.
+    """
     relative_name = os.path.split(filename)[-1]
     dist_info_dirname = '-'.join(relative_name.split('-')[:2]) + '.dist-info'
     metadata_name = os.path.join(dist_info_dirname, 'METADATA')
 
-    requirement_lines = []
-    with zipfile.ZipFile(filename) as wheel_zip:
+    with zipfile.ZipFile(fileobj if fileobj is not None else filename) as wheel_zip:
         with wheel_zip.open(metadata_name) as fp:
-            for line_bytes in fp:
-                line = line_bytes.decode('utf-8')
-                req_prefix = 'Requires-Dist:'
-                if line.startswith(req_prefix):
-                    line = line[len(req_prefix):].strip()
-                    requirement_lines.append(line)
+            metadata_lines = [line_bytes.decode('utf-8') for line_bytes in fp]
+
+    return parse_metadata_requirements(metadata_lines)
+
+
+def parse_metadata_requirements(metadata_lines: Iterable[str]) -> List[RequirementInfo]:
+    requirement_lines = []
+    for line in metadata_lines:
+        if not line.strip():
+            break  # The headers end at the first blank line; the rest is the description.
+        req_prefix = 'Requires-Dist:'
+        if line.startswith(req_prefix):
+            line = line[len(req_prefix):].strip()
+            requirement_lines.append(line)
 
     rv = []
     parsed_requirements = parse_requirements(requirement_lines)
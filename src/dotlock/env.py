@@ -1,10 +1,11 @@
 import json
 import logging
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
 
 from packaging.markers import default_environment
 
+from dotlock._vendored.glibc import glibc_version, musl_version
 from dotlock._vendored.pep425tags import (
     get_abbr_impl, get_abi_tag, get_platform, is_manylinux1_compatible, get_impl_version_info,
 )
@@ -14,7 +15,7 @@ logger = logging.getLogger(__name__)
 
 env_file = Path('env.json')
 environment: Dict[str, str] = {}
-pep425tags: Dict[str, str] = {}
+pep425tags: Dict[str, Any] = {}
 
 
 def default_pep425tags():
@@ -23,10 +24,21 @@ def default_pep425tags():
         'abi': get_abi_tag(),
         'platform': get_platform(),
         'manylinux1': is_manylinux1_compatible(),
+        # The C library version determines which manylinux or musllinux wheels are supported.
+        'glibc': glibc_version(),
+        'musl': musl_version(),
         'version': '{}.{}'.format(*get_impl_version_info()),
     }
 
 
+def upgrade_pep425tags(tags: Dict[str, Any]) -> Dict[str, Any]:
+    """Fills in keys missing from env.json or package.lock.json files written by earlier versions."""
+    if 'glibc' in tags:
+        return tags
+    # These only recorded manylinux1 support, which implies glibc 2.5 or later.
+    return {**tags, 'glibc': '2.5' if tags['manylinux1'] else None, 'musl': None}
+
+
 def load():
     environment.update(default_environment())
     pep425tags.update(default_pep425tags())
@@ -41,7 +53,7 @@ def load():
                 'Platform env values %s do not match env file. Dependency resolution for sdists may be inaccurate.',
                 ', '.join(diff_keys),
             )
-        pep425tags.update(override['pep425tags'])
+        pep425tags.update(upgrade_pep425tags(override['pep425tags']))
         platform_pep425tags = default_pep425tags()
         diff_keys = [key for key, value in pep425tags.items() if value != platform_pep425tags[key]]
         if diff_keys:
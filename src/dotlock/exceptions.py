@@ -63,3 +63,7 @@ class HashMismatchError(PackageResolutionError):
         self.actual = actual
         self.expected = expected
         super().__init__(f'Hash mismatch for {name} {version}: {actual} (actual) != {expected} (expected)')
+
+
+class InstallError(Exception):
+    pass
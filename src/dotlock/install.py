@@ -1,89 +1,195 @@
 import asyncio
 import asyncio.subprocess
-import hashlib
 import os
 import logging
 import os.path
-from typing import Sequence
+from pathlib import Path
+from typing import Collection, Dict, List, Mapping, Optional, Sequence
 
-from aiohttp import ClientSession, TCPConnector
+from aiohttp import ClientSession
 
+from dotlock.artifacts import default_staging_dir, download_file, staging_path
+from dotlock.concurrency import ConcurrencyLimits, limited_session
 from dotlock.dist_info.dist_info import PackageType, CandidateInfo
-from dotlock.dist_info.vcs import clone
-from dotlock.exceptions import HashMismatchError
+from dotlock.dist_info.vcs import checkout
+from dotlock.exceptions import InstallError
+from dotlock.sync import find_candidate_dist_info, installed_distributions, plan_sync, record_lock_entry
 from dotlock.tempdir import temp_working_dir
+from dotlock.wheel_installer import (
+    LinkMode,
+    Linker,
+    default_unpacked_wheel_dir,
+    get_install_scheme,
+    install_unpacked_wheel,
+    install_wheel,
+    is_unpacked,
+    uninstall,
+    unpack_wheel,
+    unpacked_wheel_path,
+)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_INSTALL_WORKERS = os.cpu_count() or 1
+
 
 async def download(session: ClientSession, candidate: CandidateInfo):
     if candidate.package_type == PackageType.vcs:
-        logger.info('Cloning %s from %s', candidate.name, candidate.location)
-        clone_dir_name = await clone(candidate.location)
-        # Rename the cloned directory so it is unique and easy to install from.
-        os.rename(clone_dir_name, candidate.name)
+        logger.info('Checking out %s from %s', candidate.name, candidate.location)
+        # Check out into a directory named after the package, so it is unique and easy to install from.
+        await checkout(candidate.location, candidate.name)
     elif candidate.package_type == PackageType.local:
         pass  # It's a local file.
     else:
-        logger.info('Downloading %s from %s', candidate.name, candidate.location)
+        package_filename = candidate.location.split('/')[-1]
+        # Stage partial downloads outside the working directory, so that later runs can resume them.
+        partial_path = staging_path(default_staging_dir(), candidate)
+        await download_file(session, candidate, Path(package_filename), partial_path)
 
-        async with session.get(candidate.location) as response:
-            response.raise_for_status()
-            # TODO: download in chunks to reduce memory usage
-            contents = await response.read()
 
-        hasher = hashlib.new(candidate.hash_alg)
-        hasher.update(contents)
-        digest = hasher.hexdigest()
-        if digest != candidate.hash_val:
-            raise HashMismatchError(candidate.name, candidate.version, digest, candidate.hash_val)
+def pip_install_args(python_path: str, install_dir: str, candidate: CandidateInfo) -> List[str]:
+    args = [
+        python_path, '-m',
+        'pip', 'install',
+        # Stop pip from checking PyPI (although this should be redundant).
+        '--no-index',
+        # Skip installing/verifying dependencies, since we have already installed them in previous iterations.
+        '--no-deps',
+        # Installing sdists that use build isolation with --no-index is broken,
+        # because pip will not use the installed setuptools and wheel packages to build the sdist.
+        # See https://github.com/pypa/pip/issues/5402 for discussion.
+        '--no-build-isolation',
+    ]
+    if candidate.package_type == PackageType.vcs:
+        target_name = f'./{candidate.name}'
+    elif candidate.package_type == PackageType.local:
+        target_name = candidate.location
+        if not os.path.isabs(target_name):
+            # Relative path dependencies were probably specified relative to where we're installing.
+            target_name = os.path.join(install_dir, target_name)
+    else:
+        # We can't just use candidate.name as the package name because
+        # pip won't find the file if its (potentially non-canonical) name
+        # does not match the package name.
+        target_name = candidate.location.split('/')[-1]
+    args.append(target_name)
+    return args
 
-        package_filename = candidate.location.split('/')[-1]
-        with open(package_filename, 'wb') as fp:
-            fp.write(contents)
 
+async def pip_install(python_path: str, install_dir: str, candidate: CandidateInfo):
+    args = pip_install_args(python_path, install_dir, candidate)
+    logger.debug(' '.join(args))
+    process = await asyncio.subprocess.create_subprocess_exec(*args)
+    if await process.wait() != 0:
+        raise InstallError(f'pip failed to install {candidate.name}')
 
-async def download_all(candidates: Sequence[CandidateInfo]):
-    connector = TCPConnector(limit_per_host=10)
-    async with ClientSession(connector=connector) as session:
-        return await asyncio.gather(*[
-            download(session, candidate) for candidate in candidates
-        ])
 
+async def install(
+        candidates: Sequence[CandidateInfo],
+        no_venv: bool,
+        concurrency: ConcurrencyLimits = ConcurrencyLimits(),
+        dependencies: Optional[Mapping[str, Collection[str]]] = None,
+        workers: int = DEFAULT_INSTALL_WORKERS,
+        sync: bool = False,
+        clean: bool = False,
+        link_mode: LinkMode = LinkMode.auto,
+        unpacked_wheel_dir: Optional[Path] = None,
+):
+    """
+    Installs candidates, which must be in dependency order, into the venv (or the current environment if no_venv).
+    Everything starts downloading at once, and each candidate is installed as soon as it is downloaded and
+    its dependencies are installed, with up to `workers` installs running at once.
+    Wheels are unpacked directly, in a worker thread; anything else is installed with pip.
+    Unless link_mode is copy, wheels are installed from the unpacked wheel cache,
+    and wheels already in the cache are not downloaded at all.
 
-async def install(candidates: Sequence[CandidateInfo], no_venv: bool):
+    Args:
+        dependencies: The names of each candidate's dependencies among candidates. If None,
+                      each candidate is treated as depending on all the candidates before it.
+        sync: Skip candidates that are already installed exactly as locked.
+        clean: Also uninstall packages that are not among candidates. Implies sync.
+        link_mode: How to place files from the unpacked wheel cache.
+        unpacked_wheel_dir: The unpacked wheel cache, by default in the dotlock cache directory.
+    """
     install_dir = os.getcwd()
     python_path = 'python' if no_venv else os.path.join(install_dir, 'venv', 'bin', 'python')
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(workers)
+    linker = Linker(link_mode)
+    if unpacked_wheel_dir is None:
+        unpacked_wheel_dir = default_unpacked_wheel_dir()
 
-    with temp_working_dir('install'):
-        await download_all(candidates)
-        for candidate in candidates:
-            args = [
-                python_path, '-m',
-                'pip', 'install',
-                # Stop pip from checking PyPI (although this should be redundant).
-                '--no-index',
-                # Skip installing/verifying dependencies, since we have already installed them in previous iterations.
-                '--no-deps',
-                # Installing sdists that use build isolation with --no-index is broken,
-                # because pip will not use the installed setuptools and wheel packages to build the sdist.
-                # See https://github.com/pypa/pip/issues/5402 for discussion.
-                '--no-build-isolation',
-            ]
-            if candidate.package_type == PackageType.vcs:
-                target_name = f'./{candidate.name}'
-            elif candidate.package_type == PackageType.local:
-                target_name = candidate.location
-                if not os.path.isabs(target_name):
-                    # Relative path dependencies were probably specified relative to where we're installing.
-                    target_name = os.path.join(install_dir, target_name)
+    scheme = await get_install_scheme(python_path)
+    if sync or clean:
+        candidates, unlocked = plan_sync(candidates, installed_distributions(scheme))
+        logger.info('%d packages to install', len(candidates))
+        if clean:
+            for distribution in unlocked:
+                logger.info('Uninstalling %s', distribution.name)
+                await loop.run_in_executor(None, uninstall, distribution.dist_info)
+        if not candidates:
+            return
+
+    def unpacked_path(candidate: CandidateInfo) -> Optional[Path]:
+        if link_mode == LinkMode.copy or candidate.package_type != PackageType.bdist_wheel:
+            return None
+        assert candidate.hash_alg is not None and candidate.hash_val is not None
+        return unpacked_wheel_path(unpacked_wheel_dir, candidate.hash_alg, candidate.hash_val)
+
+    async def fetch(session: ClientSession, candidate: CandidateInfo) -> None:
+        path = unpacked_path(candidate)
+        if path is not None and is_unpacked(path):
+            logger.debug('Unpacked wheel cache HIT for %s', candidate.name)
+            return
+        await download(session, candidate)
+
+    async def install_candidate(candidate: CandidateInfo) -> None:
+        path = unpacked_path(candidate)
+        dist_info: Optional[str]
+        if candidate.package_type == PackageType.bdist_wheel:
+            wheel_path = os.path.abspath(candidate.location.split('/')[-1])
+            if path is None:
+                dist_info = await loop.run_in_executor(None, install_wheel, wheel_path, scheme)
             else:
-                # We can't just use candidate.name as the package name because
-                # pip won't find the file if its (potentially non-canonical) name
-                # does not match the package name.
-                target_name = candidate.location.split('/')[-1]
-            args.append(target_name)
-            logger.debug(' '.join(args))
-            process = await asyncio.subprocess.create_subprocess_exec(*args)
-
-            await process.wait()
+                # Only wheels whose hash was verified when downloading are unpacked, so the cache can be trusted.
+                await loop.run_in_executor(None, unpack_wheel, wheel_path, path)
+                dist_info = await loop.run_in_executor(None, install_unpacked_wheel, path, scheme, linker)
+        else:
+            await pip_install(python_path, install_dir, candidate)
+            dist_info = find_candidate_dist_info(scheme, candidate)
+        # Remember what was installed, so later syncs can skip it.
+        if dist_info is not None:
+            record_lock_entry(dist_info, candidate)
+
+    with temp_working_dir('install'):
+        async with limited_session(concurrency.downloads) as session:
+            downloads = [asyncio.ensure_future(fetch(session, candidate)) for candidate in candidates]
+            installs: Dict[str, asyncio.Future] = {}
+
+            async def install_when_ready(candidate: CandidateInfo, downloaded: asyncio.Future, prerequisites):
+                await downloaded
+                await asyncio.gather(*prerequisites)
+                async with semaphore:
+                    await install_candidate(candidate)
+
+            try:
+                previous: List[asyncio.Future] = []
+                for candidate, downloaded in zip(candidates, downloads):
+                    if dependencies is None:
+                        prerequisites = previous
+                    else:
+                        # Candidates are in dependency order, so their dependencies' installs already exist.
+                        prerequisites = [
+                            installs[name] for name in dependencies.get(candidate.name, ()) if name in installs
+                        ]
+                    installs[candidate.name] = asyncio.ensure_future(
+                        install_when_ready(candidate, downloaded, prerequisites),
+                    )
+                    previous = [installs[candidate.name]]
+                await asyncio.gather(*installs.values())
+            finally:
+                # Stop any remaining work if an install failed.
+                pending = [*downloads, *installs.values()]
+                for future in pending:
+                    future.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
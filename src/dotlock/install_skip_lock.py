@@ -1,6 +1,8 @@
 import os
 import subprocess
-from typing import Iterable, Optional, Container
+from typing import Collection, Iterable, Optional
+
+from packaging.utils import canonicalize_name
 
 from dotlock.dist_info.dist_info import RequirementInfo, SpecifierType
 from dotlock.package_json import PackageJSON
@@ -19,7 +21,7 @@ def pip_format_reqs(reqs: Iterable[RequirementInfo]):
     return pip_args
 
 
-def install_skip_lock(package_json: PackageJSON, extras: Iterable[str], name_filter: Optional[Container[str]]):
+def install_skip_lock(package_json: PackageJSON, extras: Iterable[str], name_filter: Optional[Collection[str]]):
     """
     This is a minimal wrapper around pip to install the dependencies in package.json.
     While it presents a similar API as install, it is completely different because
@@ -28,6 +30,8 @@ def install_skip_lock(package_json: PackageJSON, extras: Iterable[str], name_fil
     requirements = list(package_json.default)
     for extra in extras:
         requirements.extend(package_json.extras[extra])
+    if name_filter is not None:
+        name_filter = {canonicalize_name(name) for name in name_filter}
     reqs = [
         requirement.info for requirement in requirements
         if name_filter is None or requirement.info.name in name_filter
@@ -1,11 +1,14 @@
-from typing import Dict, Iterable, Tuple, List, Union
+from typing import Dict, Iterable, Optional, Tuple, List, Union
 
 from dotlock import json
+from dotlock.concurrency import ConcurrencyLimits
 from dotlock.resolve import PackageType, RequirementInfo, Requirement, resolve_requirements_list
 
 
 # The RHS of a requirement can either be a string or a dictionary.
 RequirementValue = Union[str, Dict[str, Union[str, List[str]]]]
+# A source can either be a URL or a dictionary with the URL and options.
+SourceValue = Union[str, Dict[str, Union[str, float]]]
 
 
 def parse_requirement(name: str, value: RequirementValue):
@@ -26,14 +29,32 @@ def parse_requirements(requirement_dicts: Dict[str, RequirementValue]) -> Tuple[
     )
 
 
+def parse_sources(source_values: List[SourceValue]) -> Tuple[List[str], Dict[str, float]]:
+    sources: List[str] = []
+    source_timeouts: Dict[str, float] = {}
+    for value in source_values:
+        if isinstance(value, str):
+            sources.append(value)
+            continue
+        url = str(value['url'])
+        sources.append(url)
+        if 'timeout' in value:
+            source_timeouts[url] = float(value['timeout'])
+    return sources, source_timeouts
+
+
 class PackageJSON:
     def __init__(
             self,
             sources: List[str],
             default: Iterable[Requirement],
             extras: Dict[str, Tuple[Requirement, ...]],
+            source_timeouts: Optional[Dict[str, float]] = None,
+            concurrency: ConcurrencyLimits = ConcurrencyLimits(),
     ) -> None:
         self.sources = sources
+        self.source_timeouts = source_timeouts or {}
+        self.concurrency = concurrency
         self.default = tuple(default)
         self.extras = extras
 
@@ -45,8 +66,11 @@ class PackageJSON:
 
     @staticmethod
     def parse(contents: dict) -> 'PackageJSON':
+        sources, source_timeouts = parse_sources(contents['sources'])
         return PackageJSON(
-            sources=contents['sources'],
+            sources=sources,
+            source_timeouts=source_timeouts,
+            concurrency=ConcurrencyLimits.parse(contents.get('concurrency', {})),
             default=parse_requirements(contents['default']),
             extras={
                 key: parse_requirements(reqs)
@@ -68,4 +92,6 @@ class PackageJSON:
             sources=self.sources,
             requirements=requirements,
             update=update,
+            source_timeouts=self.source_timeouts,
+            concurrency=self.concurrency,
         )
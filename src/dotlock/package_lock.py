@@ -1,20 +1,24 @@
-from typing import Dict, Iterable, Tuple, Container, Optional
+from typing import Any, Collection, Dict, Iterable, Tuple, Optional
 import logging
 import json
 
+from packaging.utils import canonicalize_name
+
 from dotlock.dist_info.dist_info import CandidateInfo
-from dotlock.env import environment, pep425tags, default_environment, default_pep425tags
+from dotlock.env import environment, pep425tags, default_environment, default_pep425tags, upgrade_pep425tags
 from dotlock.exceptions import LockEnvironmentMismatch
-from dotlock.resolve import Requirement, candidate_topo_sort
+from dotlock._vendored.glibc import parse_libc_version
+from dotlock.resolve import Requirement, candidate_dependencies, candidate_topo_sort
 from dotlock.package_json import PackageJSON
 
 
 logger = logging.getLogger(__name__)
 
 
-def candidate_list(requirements: Tuple[Requirement, ...]) -> Tuple[Dict[str, str], ...]:
+def candidate_list(requirements: Tuple[Requirement, ...]) -> Tuple[Dict[str, Any], ...]:
+    # Record each candidate's dependencies, so that install can run independent installs in parallel.
     return tuple(
-        candidate.info.to_json()
+        dict(candidate.info.to_json(), dependencies=list(candidate_dependencies(candidate)))
         for candidate in candidate_topo_sort(requirements)
     )
 
@@ -42,10 +46,22 @@ def load_package_lock() -> dict:
         return json.load(fp)
 
 
+def _libc_compatible(value: Optional[str], lock_value: Optional[str]) -> bool:
+    # Wheels built for an older C library also work with newer versions of it.
+    if value is None or lock_value is None:
+        return value == lock_value
+    return parse_libc_version(value) >= parse_libc_version(lock_value)
+
+
 def check_lock_environment(lock_data: dict) -> None:
+    lock_pep425tags = upgrade_pep425tags(lock_data['pep425tags'])
     for key, value in default_pep425tags().items():
-        lock_value = lock_data['pep425tags'][key]
-        if value != lock_value:
+        lock_value = lock_pep425tags[key]
+        if key in ('glibc', 'musl'):
+            compatible = _libc_compatible(value, lock_value)
+        else:
+            compatible = value == lock_value
+        if not compatible:
             raise LockEnvironmentMismatch(key, lock_value, value)
     if default_environment() != lock_data['environment']:
         logger.warning(
@@ -55,14 +71,36 @@ def check_lock_environment(lock_data: dict) -> None:
 
 
 def get_locked_candidates(
-        lock_data: dict, extras: Iterable[str], name_filter: Optional[Container[str]],
+        lock_data: dict, extras: Iterable[str], name_filter: Optional[Collection[str]],
 ) -> Tuple[CandidateInfo, ...]:
+    if name_filter is not None:
+        name_filter = {canonicalize_name(name) for name in name_filter}
     candidate_lists = [lock_data['default']] + [lock_data['extras'][extra] for extra in extras]
     # Use a dictionary to remove duplicates.
     by_name = {
         c['name']: CandidateInfo.from_json(c)
         for cl in candidate_lists
         for c in cl
-        if name_filter is None or c['name'] in name_filter
+        if name_filter is None or canonicalize_name(c['name']) in name_filter
     }
     return tuple(by_name.values())
+
+
+def get_locked_dependencies(
+        lock_data: dict, extras: Iterable[str], candidates: Iterable[CandidateInfo],
+) -> Optional[Dict[str, Tuple[str, ...]]]:
+    """
+    Returns the names of each candidate's dependencies among candidates,
+    or None if package.lock.json was written before dependencies were recorded.
+    """
+    names = {c.name for c in candidates}
+    candidate_lists = [lock_data['default']] + [lock_data['extras'][extra] for extra in extras]
+    # A candidate may have more dependencies in an extra's list, if the extra needs more of its own extras.
+    dependencies: Dict[str, set] = {name: set() for name in names}
+    for cl in candidate_lists:
+        for c in cl:
+            if 'dependencies' not in c:
+                return None
+            if c['name'] in names:
+                dependencies[c['name']].update(name for name in c['dependencies'] if name in names)
+    return {name: tuple(sorted(dependency_names)) for name, dependency_names in dependencies.items()}
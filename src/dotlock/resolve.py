@@ -4,10 +4,11 @@ from typing import List, Optional, Iterable, Set, Dict, Tuple
 import logging
 import asyncio
 
-from aiohttp import ClientSession, TCPConnector
+from aiohttp import ClientSession
 
+from dotlock.concurrency import ConcurrencyLimits, limited_session
 from dotlock.dist_info.caching import connect_to_cache
-from dotlock.dist_info.dist_info import PackageType, RequirementInfo, CandidateInfo
+from dotlock.dist_info.dist_info import PackageType, RequirementInfo, CandidateInfo, best_candidate_infos
 from dotlock.exceptions import CircularDependencyError, RequirementConflictError
 
 
@@ -44,20 +45,23 @@ class Requirement:
             connection: Connection,
             session: ClientSession,
             update: bool,
+            source_timeouts: Optional[Dict[str, float]] = None,
     ) -> None:
         """
-        Populates self.candidates. Does not populate requirements for these candidates.
+        Populates self.candidates, keeping the preferred distribution of each version.
+        Does not populate requirements for these candidates.
 
         Args:
             package_types: Allowed PackageTypes for candidates.
             sources: Base URLs for PyPI-like package repositories.
             connection: Sqlite3 connection to the cache database.
             session: Async session to use for HTTP requests.
+            source_timeouts: Timeouts in seconds for requests to individual sources.
         """
         candidate_infos = await self.info.get_candidate_infos(
-            package_types, sources, connection, session, update,
+            package_types, sources, connection, session, update, source_timeouts,
         )
-        for candidate_info in candidate_infos:
+        for candidate_info in best_candidate_infos(candidate_infos):
             extras = set(self.info.extras)
             self.candidates[candidate_info] = Candidate(candidate_info, self, extras)
 
@@ -129,9 +133,10 @@ async def _resolve_requirement_list(
         base_requirements: List[Requirement],
         requirements: List[Requirement],
         update: bool,
+        source_timeouts: Optional[Dict[str, float]] = None,
 ) -> None:
     await asyncio.gather(*[
-        requirement.set_candidates(package_types, sources, connection, session, update)
+        requirement.set_candidates(package_types, sources, connection, session, update, source_timeouts)
         for requirement in requirements
     ])
 
@@ -191,6 +196,7 @@ async def _resolve_requirement_list(
                         base_requirements=base_requirements,
                         requirements=list(new_candidate.requirements.values()),
                         update=update,
+                        source_timeouts=source_timeouts,
                     )
 
         candidate = requirement.candidates[candidate_info]
@@ -205,6 +211,7 @@ async def _resolve_requirement_list(
             base_requirements=base_requirements,
             requirements=list(candidate.requirements.values()),
             update=update,
+            source_timeouts=source_timeouts,
         )
 
 
@@ -213,6 +220,8 @@ async def resolve_requirements_list(
         sources: List[str],
         requirements: List[Requirement],
         update: bool,
+        source_timeouts: Optional[Dict[str, float]] = None,
+        concurrency: ConcurrencyLimits = ConcurrencyLimits(),
 ) -> None:
     """
     Populates requirements.candidates, recursively, selecting a unique Candidate up to name.
@@ -222,11 +231,11 @@ async def resolve_requirements_list(
         sources: Base URLs for PyPI-like package repositories.
         requirements: Unpopulated list of requirements, e.g. just parsed from package.json.
         update: Whether to bypass the cache when finding candidates.
+        source_timeouts: Timeouts in seconds for requests to individual sources.
+        concurrency: Limits on concurrent requests to each host.
     """
     cache_connection = connect_to_cache()
-    # Too many connections results in '(104) Connection reset by peer' errors.
-    connector = TCPConnector(limit_per_host=10)  # 10 is arbitrary; could probably be raised.
-    async with ClientSession(connector=connector) as session:
+    async with limited_session(concurrency.metadata) as session:
         await _resolve_requirement_list(
             package_types=package_types,
             sources=sources,
@@ -235,9 +244,20 @@ async def resolve_requirements_list(
             base_requirements=requirements,
             requirements=requirements,
             update=update,
+            source_timeouts=source_timeouts,
         )
 
 
+def candidate_dependencies(candidate: Candidate) -> Tuple[str, ...]:
+    """Returns the names of the live Candidates that candidate directly depends on."""
+    return tuple(sorted({
+        dependency.info.name
+        for requirement in candidate.requirements.values()
+        for dependency in requirement.candidates.values()
+        if dependency.live
+    }))
+
+
 def _candidate_topo_sort(requirements: Iterable[Requirement], seen: Set[str]) -> Iterable[Candidate]:
     for requirement in requirements:
         for candidate in requirement.candidates.values():
@@ -0,0 +1,263 @@
+"""
+A caching package index server, so that many machines can share one set of upstream requests.
+
+Serves the Simple API (PEP 503 HTML and PEP 691 JSON) under /simple/ and the PyPI JSON API under /pypi/,
+backed by a cache of its own and the artifact store. Every file upstream lists is served, whatever the environment
+the server runs in, along with its Requires-Python and PEP 658 METADATA file.
+"""
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Dict, List, Optional, Union
+import asyncio
+import html
+import logging
+import time
+
+from aiohttp import ClientError, ClientSession, web
+from packaging.utils import canonicalize_name
+from packaging.version import Version, InvalidVersion
+
+from dotlock.artifacts import default_artifact_dir, get_artifact, get_metadata_artifact
+from dotlock.concurrency import ConcurrencyLimits, limited_session
+from dotlock.dist_info.caching import (
+    connect_to_cache, get_cached_candidate_info, get_cached_candidate_infos, replace_cached_candidate_infos,
+    serve_cache_filename,
+)
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType, RequirementInfo
+from dotlock.dist_info.package_indices import get_candidate_infos
+from dotlock.dist_info.simple_api import JSON_CONTENT_TYPE
+from dotlock.exceptions import NotFound, PackageIndexError
+from dotlock.package_json import PackageJSON
+from dotlock.single_flight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_TYPES = [PackageType.bdist_wheel, PackageType.sdist]
+
+
+def requirement_str(requirement_info: RequirementInfo) -> str:
+    """Formats a RequirementInfo as a PEP 508 string, as used in requires_dist."""
+    result = requirement_info.name
+    if requirement_info.extras:
+        result += '[{}]'.format(','.join(requirement_info.extras))
+    result += str(requirement_info.specifier)
+    if requirement_info.marker:
+        result += f'; {requirement_info.marker}'
+    return result
+
+
+def file_url(candidate_info: CandidateInfo) -> str:
+    filename = candidate_info.location.split('/')[-1]
+    return f'/files/{candidate_info.hash_alg}/{candidate_info.hash_val}/{filename}'
+
+
+def file_json(candidate_info: CandidateInfo) -> dict:
+    return {
+        'filename': candidate_info.location.split('/')[-1],
+        'packagetype': candidate_info.package_type.name,
+        'url': file_url(candidate_info),
+        'digests': {candidate_info.hash_alg: candidate_info.hash_val},
+        'requires_python': candidate_info.requires_python,
+    }
+
+
+def core_metadata_json(candidate_info: CandidateInfo) -> Union[bool, Dict[str, str]]:
+    """Converts a candidate's PEP 658 metadata attribute into the PEP 691 core-metadata value."""
+    if not candidate_info.metadata:
+        return False
+    if candidate_info.metadata == 'true':
+        return True
+    hash_alg, hash_val = candidate_info.metadata.split('=', 1)
+    return {hash_alg: hash_val}
+
+
+def link_html(candidate_info: CandidateInfo) -> str:
+    attrs = ''
+    if candidate_info.requires_python:
+        attrs += ' data-requires-python="{}"'.format(html.escape(candidate_info.requires_python))
+    if candidate_info.metadata:
+        attrs += ' data-core-metadata="{}"'.format(html.escape(candidate_info.metadata))
+    return '<a href="{url}#{hash_alg}={hash_val}"{attrs}>{filename}</a><br/>'.format(
+        url=file_url(candidate_info),
+        hash_alg=candidate_info.hash_alg,
+        hash_val=candidate_info.hash_val,
+        attrs=attrs,
+        filename=candidate_info.location.split('/')[-1],
+    )
+
+
+class IndexServer:
+    def __init__(
+            self,
+            sources: List[str],
+            connection: Connection,
+            artifact_dir: Path,
+            ttl: float,
+            source_timeouts: Optional[Dict[str, float]] = None,
+            concurrency: ConcurrencyLimits = ConcurrencyLimits(),
+    ) -> None:
+        """
+        Args:
+            sources: Base URLs for the upstream PyPI-like package repositories.
+            connection: Sqlite3 connection to the cache database.
+            artifact_dir: Where to store downloaded distribution files.
+            ttl: How long (in seconds) to serve a package's file list before checking upstream for changes.
+                Files no longer listed upstream are dropped when it is checked.
+            source_timeouts: Timeouts in seconds for requests to individual sources.
+            concurrency: Limits on concurrent requests to each upstream host.
+        """
+        self.sources = sources
+        self.source_timeouts = source_timeouts
+        self.connection = connection
+        self.artifact_dir = artifact_dir
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.refreshed: Dict[str, float] = {}
+        self._refresh_flights = SingleFlight()
+        # Sessions are created when the app starts, inside its event loop.
+        self.session: ClientSession
+        # Downloads get their own session so that they do not hold up metadata requests.
+        self.download_session: ClientSession
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/simple/{name}/', self.simple_page)
+        app.router.add_get('/pypi/{name}/json', self.json_page)
+        app.router.add_get('/pypi/{name}/{version}/json', self.version_json_page)
+        app.router.add_get('/files/{hash_alg}/{hash_val}/{filename}', self.file)
+        app.on_startup.append(self._open_session)
+        app.on_cleanup.append(self._close_session)
+        return app
+
+    async def _open_session(self, app: web.Application) -> None:
+        self.session = limited_session(self.concurrency.metadata)
+        self.download_session = limited_session(self.concurrency.downloads)
+
+    async def _close_session(self, app: web.Application) -> None:
+        await self.session.close()
+        await self.download_session.close()
+
+    async def _refresh(self, name: str) -> List[CandidateInfo]:
+        try:
+            candidate_infos = await get_candidate_infos(
+                PACKAGE_TYPES, self.sources, self.session, name, self.source_timeouts, supported_only=False,
+            )
+        except NotFound:
+            candidate_infos = []
+        replace_cached_candidate_infos(self.connection, name, candidate_infos)
+        self.refreshed[name] = time.monotonic()
+        return candidate_infos
+
+    async def get_candidate_infos(self, name: str) -> List[CandidateInfo]:
+        name = canonicalize_name(name)
+        refreshed = self.refreshed.get(name)
+        candidate_infos: Optional[List[CandidateInfo]]
+        if refreshed is None or time.monotonic() - refreshed > self.ttl:
+            try:
+                candidate_infos = await self._refresh_flights.run(name, self._refresh, name)
+            except (ClientError, PackageIndexError, asyncio.TimeoutError):
+                candidate_infos = get_cached_candidate_infos(self.connection, name)
+                if candidate_infos is None:
+                    raise
+                logger.warning('Failed to refresh %s from upstream, serving cached files', name, exc_info=True)
+        else:
+            candidate_infos = get_cached_candidate_infos(self.connection, name)
+
+        if not candidate_infos:
+            raise web.HTTPNotFound()
+        return candidate_infos
+
+    async def simple_page(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        candidate_infos = await self.get_candidate_infos(name)
+
+        if JSON_CONTENT_TYPE in request.headers.get('Accept', ''):
+            return web.json_response({
+                'meta': {'api-version': '1.0'},
+                'name': name,
+                'files': [
+                    {
+                        'filename': c.location.split('/')[-1],
+                        'url': file_url(c),
+                        'hashes': {c.hash_alg: c.hash_val},
+                        'requires-python': c.requires_python,
+                        'core-metadata': core_metadata_json(c),
+                    } for c in candidate_infos
+                ],
+            }, content_type=JSON_CONTENT_TYPE)
+
+        links = [link_html(c) for c in candidate_infos]
+        escaped_name = html.escape(name)
+        body = '\n'.join([
+            '<!DOCTYPE html>',
+            f'<html><head><title>Links for {escaped_name}</title></head><body>',
+            f'<h1>Links for {escaped_name}</h1>',
+            *links,
+            '</body></html>',
+        ])
+        return web.Response(text=body, content_type='text/html')
+
+    async def json_page(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        candidate_infos = await self.get_candidate_infos(name)
+
+        releases: Dict[str, List[dict]] = {}
+        for candidate_info in candidate_infos:
+            releases.setdefault(str(candidate_info.version), []).append(file_json(candidate_info))
+        return web.json_response({
+            'info': {'name': name},
+            'releases': releases,
+        })
+
+    async def version_json_page(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        try:
+            version = Version(request.match_info['version'])
+        except InvalidVersion:
+            raise web.HTTPNotFound()
+
+        candidate_infos = [c for c in await self.get_candidate_infos(name) if c.version == version]
+        if not candidate_infos:
+            raise web.HTTPNotFound()
+
+        # Only wheels list their requirements independently of the environment building them.
+        requires_dist = None
+        wheels = [c for c in candidate_infos if c.package_type == PackageType.bdist_wheel]
+        if wheels:
+            requirement_infos = await wheels[0].get_requirement_infos(self.connection, self.session)
+            requires_dist = [requirement_str(r) for r in requirement_infos]
+
+        return web.json_response({
+            'info': {
+                'name': name,
+                'version': str(version),
+                'requires_dist': requires_dist,
+            },
+            'urls': [file_json(c) for c in candidate_infos],
+        })
+
+    async def file(self, request: web.Request) -> web.FileResponse:
+        candidate_info = get_cached_candidate_info(self.connection, request.match_info['hash_val'])
+        if candidate_info is None or candidate_info.hash_alg != request.match_info['hash_alg']:
+            raise web.HTTPNotFound()
+
+        if request.match_info['filename'].endswith('.metadata'):
+            if not candidate_info.metadata:
+                raise web.HTTPNotFound()
+            path = await get_metadata_artifact(self.download_session, candidate_info, self.artifact_dir)
+        else:
+            path = await get_artifact(self.download_session, candidate_info, self.artifact_dir)
+        return web.FileResponse(path)
+
+
+def serve(package_json: PackageJSON, host: str, port: int, ttl: float) -> None:
+    server = IndexServer(
+        sources=package_json.sources,
+        connection=connect_to_cache(serve_cache_filename()),
+        artifact_dir=default_artifact_dir(),
+        ttl=ttl,
+        source_timeouts=package_json.source_timeouts,
+        concurrency=package_json.concurrency,
+    )
+    web.run_app(server.make_app(), host=host, port=port)
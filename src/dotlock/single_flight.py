@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, future: asyncio.Future) -> None:
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one call, whose result (or exception) all callers share.
+    Once the call finishes the key is forgotten, so later calls run again; results are not cached here.
+    The call is cancelled if every caller waiting on it is cancelled.
+    """
+    def __init__(self) -> None:
+        self._in_flight: Dict[Hashable, _Flight] = {}
+
+    def _finished(self, key: Hashable, flight: _Flight, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not future.cancelled():
+            # Retrieve the exception, so asyncio does not log it if every caller was cancelled.
+            future.exception()
+
+    async def run(self, key: Hashable, function: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(function(*args)))
+            self._in_flight[key] = flight
+            flight.future.add_done_callback(lambda future: self._finished(key, flight, future))
+        else:
+            logger.debug('Joining in-flight request for %r', key)
+
+        flight.waiters += 1
+        try:
+            # Shield the shared call so that one caller being cancelled does not cancel it for the others.
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                # Nobody wants the result any more. Forget the key now, so new callers do not join a cancelled call.
+                logger.debug('Cancelling in-flight request for %r', key)
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                flight.future.cancel()
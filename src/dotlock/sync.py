@@ -0,0 +1,111 @@
+"""
+Compares what is installed in an environment with package.lock.json,
+so that install only has to change the difference.
+
+Each candidate that dotlock installs has its package.lock.json entry recorded in a DOTLOCK file
+in its .dist-info directory.
+"""
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType
+from dotlock.wheel_installer import InstallScheme, add_installed_file, find_installed_dist_infos
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_ENTRY_FILENAME = 'DOTLOCK'
+# Installed packages that belong to the environment itself, which sync never removes.
+PROTECTED_NAMES = {'pip', 'setuptools', 'wheel', 'dotlock'}
+
+
+class InstalledDistribution(namedtuple('InstalledDistribution', ['name', 'version', 'dist_info', 'lock_entry'])):
+    """
+    A distribution installed in an environment. lock_entry is the package.lock.json entry
+    recorded when dotlock installed it, or None if something else installed it.
+    """
+
+
+def _parse_dist_info_name(dist_info: str) -> Tuple[str, Optional[Version]]:
+    name, _, version_str = os.path.basename(dist_info)[:-len('.dist-info')].partition('-')
+    try:
+        return canonicalize_name(name), Version(version_str)
+    except InvalidVersion:
+        return canonicalize_name(name), None
+
+
+def installed_distributions(scheme: InstallScheme) -> Dict[str, InstalledDistribution]:
+    """Scans the environment's .dist-info directories, returning the installed distributions by canonical name."""
+    installed = {}
+    for site_dir in sorted({scheme.purelib, scheme.platlib}):
+        if not os.path.isdir(site_dir):
+            continue
+        for entry in os.listdir(site_dir):
+            if not entry.endswith('.dist-info'):
+                continue
+            dist_info = os.path.join(site_dir, entry)
+            name, version = _parse_dist_info_name(dist_info)
+            lock_entry = None
+            try:
+                with open(os.path.join(dist_info, LOCK_ENTRY_FILENAME)) as fp:
+                    lock_entry = json.load(fp)
+            except (OSError, ValueError):
+                pass
+            installed[name] = InstalledDistribution(name, version, dist_info, lock_entry)
+    return installed
+
+
+def is_satisfied(candidate: CandidateInfo, installed: Optional[InstalledDistribution]) -> bool:
+    """Whether installed is exactly the distribution that installing candidate would produce."""
+    if installed is None or installed.lock_entry is None:
+        return False
+    if candidate.package_type == PackageType.local:
+        return False  # Local packages can change without their lock entry changing.
+    if candidate.package_type == PackageType.vcs:
+        # Git URLs are pinned to a commit, which identifies the checkout.
+        return installed.lock_entry.get('location') == candidate.location
+    return (
+        installed.version == candidate.version
+        and installed.lock_entry.get('hash_alg') == candidate.hash_alg
+        and installed.lock_entry.get('hash_val') == candidate.hash_val
+    )
+
+
+def plan_sync(
+        candidates: Sequence[CandidateInfo],
+        installed: Dict[str, InstalledDistribution],
+) -> Tuple[List[CandidateInfo], List[InstalledDistribution]]:
+    """
+    Returns the candidates that need installing, in their original order,
+    and the installed distributions that are not in candidates.
+    """
+    # Locks written by older versions of dotlock may not have canonical names.
+    to_install = [c for c in candidates if not is_satisfied(c, installed.get(canonicalize_name(c.name)))]
+    locked_names = {canonicalize_name(c.name) for c in candidates}
+    unlocked = [
+        distribution for name, distribution in sorted(installed.items())
+        if name not in locked_names and name not in PROTECTED_NAMES
+    ]
+    return to_install, unlocked
+
+
+def find_candidate_dist_info(scheme: InstallScheme, candidate: CandidateInfo) -> Optional[str]:
+    """Returns the .dist-info directory of the installed candidate, if it has one."""
+    dist_infos = [
+        dist_info
+        for site_dir in sorted({scheme.purelib, scheme.platlib})
+        for dist_info in find_installed_dist_infos(site_dir, candidate.name)
+    ]
+    if candidate.version is not None:
+        dist_infos = [d for d in dist_infos if _parse_dist_info_name(d)[1] == candidate.version]
+    return dist_infos[0] if len(dist_infos) == 1 else None
+
+
+def record_lock_entry(dist_info: str, candidate: CandidateInfo) -> None:
+    add_installed_file(dist_info, LOCK_ENTRY_FILENAME, json.dumps(candidate.to_json(), sort_keys=True).encode())
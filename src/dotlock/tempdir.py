@@ -16,6 +16,8 @@ def temp_working_dir(extra_prefix=''):
     with TemporaryDirectory(prefix=prefix) as dir_path:
         logger.debug(f'entering {dir_path}')
         os.chdir(dir_path)
-        yield
-        logger.debug(f'exiting {dir_path}')
-        os.chdir(original_wd)
+        try:
+            yield
+        finally:
+            logger.debug(f'exiting {dir_path}')
+            os.chdir(original_wd)
@@ -0,0 +1,458 @@
+"""
+Installs wheels by unpacking them directly, instead of running pip for each one.
+
+Follows the wheel spec (PEP 427 and PEP 376): files go into purelib or platlib per Root-Is-Purelib,
+the .data directory is spread over the other install scheme paths, scripts get the target Python in their shebang,
+console and GUI scripts are generated from entry_points.txt, and INSTALLER and RECORD are written.
+Files are not byte-compiled; Python compiles them the first time they are imported.
+
+Wheels can also be unpacked once into a cache keyed by their hash, and installed from there
+with reflinks or hard links, so that many environments share one copy of each file.
+"""
+from collections import namedtuple
+from configparser import ConfigParser
+from email.parser import Parser
+from enum import Enum
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import asyncio.subprocess
+import base64
+import csv
+import errno
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import tempfile
+import zipfile
+
+from packaging.utils import canonicalize_name
+
+from dotlock.exceptions import InstallError
+from dotlock._vendored.appdirs import user_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+INSTALLER = 'dotlock'
+
+# Prints the install scheme of the Python running it. Headers go where pip puts them in a venv.
+_SCHEME_SCRIPT = '''
+import json, sys, sysconfig
+paths = sysconfig.get_paths()
+print(json.dumps({
+    'purelib': paths['purelib'],
+    'platlib': paths['platlib'],
+    'scripts': paths['scripts'],
+    'data': paths['data'],
+    'headers': '{}/include/site/python{}.{}'.format(sys.prefix, *sys.version_info[:2]),
+    'executable': sys.executable,
+}))
+'''
+
+_SCRIPT_TEMPLATE = '''#!{executable}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({function}())
+'''
+
+_ENTRY_POINT_RE = re.compile(r'(?P<module>[\w.]+)\s*:\s*(?P<attrs>[\w.]+)\s*(\[.*\])?\s*$')
+
+
+class InstallScheme(namedtuple('InstallScheme', ['purelib', 'platlib', 'scripts', 'data', 'headers', 'executable'])):
+    """Where each kind of file in a wheel is installed, and the Python that scripts should run with."""
+
+
+async def get_install_scheme(python_path: str) -> InstallScheme:
+    process = await asyncio.subprocess.create_subprocess_exec(
+        python_path, '-c', _SCHEME_SCRIPT, stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        raise InstallError(f'Could not get the install paths for {python_path}')
+    return InstallScheme(**json.loads(stdout))
+
+
+def _record_hash(hasher) -> str:
+    return 'sha256=' + base64.urlsafe_b64encode(hasher.digest()).decode().rstrip('=')
+
+
+def _destination(base: str, path: str) -> str:
+    destination = os.path.normpath(os.path.join(base, path))
+    if os.path.commonpath([base, destination]) != os.path.normpath(base):
+        raise InstallError(f'Wheel file {path} would be installed outside {base}')
+    return destination
+
+
+def _write_file(source: IO[bytes], destination: str, executable: bool, shebang: Optional[bytes]) -> Tuple[str, int]:
+    """Copies source to destination, returning the RECORD hash and size of what was written."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.lexists(destination):
+        # Replace rather than overwrite, in case the existing file is linked to the unpacked wheel cache.
+        os.remove(destination)
+    hasher = hashlib.sha256()
+    size = 0
+    with open(destination, 'wb') as fp:
+        if shebang is not None:
+            first_line = source.readline()
+            if re.match(rb'#!pythonw?\s*$', first_line):
+                first_line = shebang
+            hasher.update(first_line)
+            fp.write(first_line)
+            size += len(first_line)
+        while True:
+            chunk = source.read(1024 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            fp.write(chunk)
+            size += len(chunk)
+    if executable:
+        mode = os.stat(destination).st_mode
+        os.chmod(destination, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return _record_hash(hasher), size
+
+
+def _find_dist_info(names: List[str]) -> str:
+    dist_infos = {name.split('/')[0] for name in names if re.match(r'[^/]+\.dist-info/WHEEL$', name)}
+    if len(dist_infos) != 1:
+        raise InstallError(f'Expected exactly one .dist-info directory in the wheel, found {len(dist_infos)}')
+    return dist_infos.pop()
+
+
+class _CaseSensitiveConfigParser(ConfigParser):
+    # Script names are case sensitive, but ConfigParser lower-cases option names by default.
+    def optionxform(self, optionstr: str) -> str:
+        return optionstr
+
+
+def _entry_point_scripts(entry_points: str, executable: str) -> List[Tuple[str, str]]:
+    """Returns the (name, contents) of each console or GUI script declared in an entry_points.txt."""
+    parser = _CaseSensitiveConfigParser(delimiters=('=',), interpolation=None)
+    parser.read_string(entry_points)
+    scripts = []
+    for section in ('console_scripts', 'gui_scripts'):
+        if not parser.has_section(section):
+            continue
+        for name, value in parser.items(section):
+            match = _ENTRY_POINT_RE.match(value)
+            if match is None:
+                raise InstallError(f'Invalid entry point {name} = {value}')
+            attrs = match.group('attrs')
+            scripts.append((name, _SCRIPT_TEMPLATE.format(
+                executable=executable,
+                module=match.group('module'),
+                import_name=attrs.split('.')[0],
+                function=attrs,
+            )))
+    return scripts
+
+
+def find_installed_dist_infos(site_dir: str, name: str) -> List[str]:
+    """Returns the paths of .dist-info directories in site_dir for the named project."""
+    if not os.path.isdir(site_dir):
+        return []
+    canonical_name = canonicalize_name(name)
+    return [
+        os.path.join(site_dir, entry) for entry in sorted(os.listdir(site_dir))
+        if entry.endswith('.dist-info') and canonicalize_name(entry.split('-')[0]) == canonical_name
+    ]
+
+
+def uninstall(dist_info_dir: str) -> None:
+    """Removes the files in an installed distribution's RECORD, along with its .dist-info directory."""
+    site_dir = os.path.dirname(dist_info_dir)
+    record_path = os.path.join(dist_info_dir, 'RECORD')
+    logger.debug('Uninstalling %s', dist_info_dir)
+    parents = set()
+    if os.path.exists(record_path):
+        with open(record_path, newline='') as fp:
+            for row in csv.reader(fp):
+                if not row:
+                    continue
+                path = os.path.normpath(os.path.join(site_dir, row[0]))
+                if os.path.isfile(path):
+                    os.remove(path)
+                    parents.add(os.path.dirname(path))
+                if path.endswith('.py'):
+                    # Remove the bytecode that Python wrote for it, which is not in RECORD.
+                    cache_dir = os.path.join(os.path.dirname(path), '__pycache__')
+                    stem = os.path.basename(path)[:-len('.py')]
+                    if os.path.isdir(cache_dir):
+                        for cached in os.listdir(cache_dir):
+                            if cached.startswith(stem + '.') and cached.endswith('.pyc'):
+                                os.remove(os.path.join(cache_dir, cached))
+                        parents.add(cache_dir)
+    shutil.rmtree(dist_info_dir, ignore_errors=True)
+
+    # Remove directories left empty, deepest first.
+    for parent in sorted(parents, key=len, reverse=True):
+        while parent.startswith(site_dir + os.sep) and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+# Places the wheel file at a path (relative to the wheel root) at a destination, optionally rewriting a #!python
+# shebang, and returns its RECORD hash and size.
+_PlaceFile = Callable[[str, str, bool, Optional[bytes]], Tuple[str, int]]
+
+
+def _install(
+        names: List[str],
+        executables: Set[str],
+        read: Callable[[str], bytes],
+        place: _PlaceFile,
+        scheme: InstallScheme,
+        description: str,
+) -> str:
+    dist_info = _find_dist_info(names)
+    name = dist_info.split('-')[0]
+    data_dir = dist_info[:-len('.dist-info')] + '.data'
+
+    wheel_metadata = Parser().parsestr(read(f'{dist_info}/WHEEL').decode())
+    purelib = wheel_metadata.get('Root-Is-Purelib', '').strip().lower() == 'true'
+    root = scheme.purelib if purelib else scheme.platlib
+
+    for site_dir in {scheme.purelib, scheme.platlib}:
+        for installed in find_installed_dist_infos(site_dir, name):
+            uninstall(installed)
+
+    logger.info('Installing %s', description)
+    shebang = f'#!{scheme.executable}\n'.encode()
+    data_bases = {
+        'purelib': scheme.purelib,
+        'platlib': scheme.platlib,
+        'scripts': scheme.scripts,
+        'data': scheme.data,
+        'headers': os.path.join(scheme.headers, name),
+    }
+    # Skip the wheel's own RECORD (and its signatures), which is rewritten for the installed paths.
+    skipped = {f'{dist_info}/RECORD', f'{dist_info}/RECORD.jws', f'{dist_info}/RECORD.p7s'}
+    records = []
+    for wheel_path in names:
+        if wheel_path.endswith('/') or wheel_path in skipped:
+            continue
+        path = wheel_path
+        is_script = False
+        if path.startswith(data_dir + '/'):
+            _, key, path = path.split('/', 2)
+            if key not in data_bases:
+                raise InstallError(f'Unknown .data directory {key} in {description}')
+            base = data_bases[key]
+            is_script = key == 'scripts'
+        else:
+            base = root
+        destination = _destination(base, path)
+        executable = is_script or wheel_path in executables
+        hash_val, size = place(wheel_path, destination, executable, shebang if is_script else None)
+        records.append((destination, hash_val, size))
+
+    if f'{dist_info}/entry_points.txt' in names:
+        entry_points = read(f'{dist_info}/entry_points.txt').decode()
+        for script_name, contents in _entry_point_scripts(entry_points, scheme.executable):
+            destination = _destination(scheme.scripts, script_name)
+            hash_val, size = _write_file(io.BytesIO(contents.encode()), destination, True, None)
+            records.append((destination, hash_val, size))
+
+    installed_dist_info = os.path.join(root, dist_info)
+    installer_path = os.path.join(installed_dist_info, 'INSTALLER')
+    hash_val, size = _write_file(io.BytesIO(f'{INSTALLER}\n'.encode()), installer_path, False, None)
+    records.append((installer_path, hash_val, size))
+
+    with open(os.path.join(installed_dist_info, 'RECORD'), 'w', newline='') as fp:
+        writer = csv.writer(fp, lineterminator='\n')
+        for path, hash_val, size in records:
+            writer.writerow((os.path.relpath(path, root).replace(os.sep, '/'), hash_val, size))
+        writer.writerow((f'{dist_info}/RECORD', '', ''))
+    return installed_dist_info
+
+
+def _is_executable(info: zipfile.ZipInfo) -> bool:
+    return bool((info.external_attr >> 16) & stat.S_IXUSR)
+
+
+def install_wheel(wheel_path: str, scheme: InstallScheme) -> str:
+    """
+    Installs the wheel at wheel_path, replacing any installed version of the same project.
+    Returns the path of the installed .dist-info directory.
+    """
+    with zipfile.ZipFile(wheel_path) as wheel:
+        def place(path: str, destination: str, executable: bool, shebang: Optional[bytes]) -> Tuple[str, int]:
+            with wheel.open(path) as source:
+                return _write_file(source, destination, executable, shebang)
+
+        return _install(
+            names=wheel.namelist(),
+            executables={info.filename for info in wheel.infolist() if _is_executable(info)},
+            read=wheel.read,
+            place=place,
+            scheme=scheme,
+            description=os.path.basename(wheel_path),
+        )
+
+
+class LinkMode(Enum):
+    """How files from the unpacked wheel cache are placed in an environment."""
+    # Try each of the following in turn.
+    auto = 'auto'
+    # Copy-on-write clones, which share storage with the cache until either is modified (Linux only).
+    reflink = 'reflink'
+    # Hard links to the cache's files. Modifying an installed file in place also modifies the cache.
+    hardlink = 'hardlink'
+    # Plain copies, bypassing the cache.
+    copy = 'copy'
+
+
+# The Linux ioctl that clones a file's extents (FICLONE in linux/fs.h).
+_FICLONE = 0x40049409
+
+
+def _reflink(source: str, destination: str) -> None:
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, 'Reflinks are not supported on this platform')
+    with open(source, 'rb') as source_fp, open(destination, 'wb') as destination_fp:
+        try:
+            fcntl.ioctl(destination_fp.fileno(), _FICLONE, source_fp.fileno())
+        except OSError:
+            destination_fp.close()
+            os.remove(destination)
+            raise
+    shutil.copymode(source, destination)
+
+
+_LINK_FUNCTIONS: Dict[LinkMode, Callable[[str, str], object]] = {
+    LinkMode.reflink: _reflink,
+    LinkMode.hardlink: os.link,
+    LinkMode.copy: shutil.copy,
+}
+
+
+class Linker:
+    """Places files from the unpacked wheel cache, falling back to the next link method after one fails."""
+    def __init__(self, mode: LinkMode) -> None:
+        if mode == LinkMode.auto:
+            self.modes = [LinkMode.reflink, LinkMode.hardlink, LinkMode.copy]
+        else:
+            self.modes = [mode]
+
+    def place(self, source: str, destination: str) -> None:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if os.path.lexists(destination):
+            # Never write through an existing file, which may itself be linked to the cache.
+            os.remove(destination)
+        while True:
+            modes = self.modes
+            try:
+                _LINK_FUNCTIONS[modes[0]](source, destination)
+                return
+            except OSError as e:
+                if len(modes) == 1:
+                    raise
+                logger.debug('Could not %s %s (%s), falling back to %s', modes[0].name, source, e, modes[1].name)
+                # Shared between threads, but a lost update just means retrying the failed mode once more.
+                self.modes = modes[1:]
+
+
+def default_unpacked_wheel_dir() -> Path:
+    return Path(user_cache_dir('dotlock')) / 'unpacked'
+
+
+def unpacked_wheel_path(unpacked_wheel_dir: Path, hash_alg: str, hash_val: str) -> Path:
+    return unpacked_wheel_dir / hash_alg / hash_val
+
+
+def is_unpacked(path: Path) -> bool:
+    return (path / 'manifest.json').exists()
+
+
+def unpack_wheel(wheel_path: str, path: Path) -> None:
+    """
+    Extracts the wheel at wheel_path into the unpacked wheel cache at path, unless it is already there.
+    The cache entry only appears once it is complete, along with a manifest of each file's RECORD hash and size.
+    """
+    if is_unpacked(path):
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = Path(tempfile.mkdtemp(prefix=path.name + '.', suffix='.part', dir=str(path.parent)))
+    try:
+        files_dir = str(partial_path / 'files')
+        manifest = []
+        with zipfile.ZipFile(wheel_path) as wheel:
+            for info in wheel.infolist():
+                if info.is_dir():
+                    continue
+                executable = _is_executable(info)
+                with wheel.open(info) as source:
+                    hash_val, size = _write_file(source, _destination(files_dir, info.filename), executable, None)
+                manifest.append([info.filename, hash_val, size, executable])
+        with (partial_path / 'manifest.json').open('w') as fp:
+            json.dump({'files': manifest}, fp)
+        try:
+            os.rename(str(partial_path), str(path))
+        except OSError:
+            if not is_unpacked(path):
+                raise
+            # Another process unpacked the same wheel first.
+    finally:
+        shutil.rmtree(str(partial_path), ignore_errors=True)
+
+
+def install_unpacked_wheel(path: Path, scheme: InstallScheme, linker: Linker) -> str:
+    """
+    Installs a wheel from the unpacked wheel cache, linking its files into place according to linker.
+    Returns the path of the installed .dist-info directory.
+    """
+    with (path / 'manifest.json').open() as fp:
+        manifest = {
+            file_path: (hash_val, size, executable)
+            for file_path, hash_val, size, executable in json.load(fp)['files']
+        }
+    files_dir = path / 'files'
+
+    def read(file_path: str) -> bytes:
+        return (files_dir / file_path).read_bytes()
+
+    def place(file_path: str, destination: str, executable: bool, shebang: Optional[bytes]) -> Tuple[str, int]:
+        source = str(files_dir / file_path)
+        if shebang is not None:
+            # Scripts may need their shebang rewritten, so get their own copy.
+            with open(source, 'rb') as fp:
+                return _write_file(fp, destination, executable, shebang)
+        linker.place(source, destination)
+        hash_val, size, _ = manifest[file_path]
+        return hash_val, size
+
+    return _install(
+        names=list(manifest),
+        executables={file_path for file_path, (_, _, executable) in manifest.items() if executable},
+        read=read,
+        place=place,
+        scheme=scheme,
+        description=path.name,
+    )
+
+
+def add_installed_file(dist_info_dir: str, filename: str, contents: bytes) -> None:
+    """Writes a file into an installed distribution's .dist-info directory, and adds it to RECORD."""
+    path = os.path.join(dist_info_dir, filename)
+    hash_val, size = _write_file(io.BytesIO(contents), path, False, None)
+    site_dir = os.path.dirname(dist_info_dir)
+    record_path = os.path.join(dist_info_dir, 'RECORD')
+    if not os.path.exists(record_path):
+        return
+    with open(record_path, newline='') as fp:
+        rows = [row for row in csv.reader(fp) if row and os.path.normpath(os.path.join(site_dir, row[0])) != path]
+    rows.append([os.path.relpath(path, site_dir).replace(os.sep, '/'), hash_val, str(size)])
+    with open(record_path, 'w', newline='') as fp:
+        csv.writer(fp, lineterminator='\n').writerows(rows)
@@ -0,0 +1,64 @@
+"""Builders for the candidates, install schemes and wheels that tests across the suite need."""
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import zipfile
+
+from packaging.version import Version
+
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType
+from dotlock.wheel_installer import InstallScheme
+from tests.unit.fake_index import FakeIndex
+
+
+def make_candidate(
+        name: str = 'fake',
+        filename: Optional[str] = None,
+        contents: bytes = b'',
+        package_type: PackageType = PackageType.sdist,
+        index: Optional[FakeIndex] = None,
+        **fields,
+) -> CandidateInfo:
+    """
+    Returns a candidate for version 1.0 of name, whose file (by default an sdist) has the sha256 hash of contents.
+    The file is at https://example.com/files/ unless index is given, in which case that FakeIndex serves it.
+    Any other CandidateInfo field can be overridden with a keyword argument.
+    """
+    filename = filename or f'{name}-1.0.tar.gz'
+    if index is not None:
+        source, location = index.source, str(index.server.make_url(f'/files/{filename}'))
+    else:
+        source, location = 'https://example.com/simple', f'https://example.com/files/{filename}'
+    candidate = CandidateInfo(
+        name=name, version=Version('1.0'), package_type=package_type, source=source, location=location,
+        hash_alg='sha256', hash_val=hashlib.sha256(contents).hexdigest(),
+    )
+    return candidate._replace(**fields)
+
+
+def make_scheme(name: str = 'venv') -> InstallScheme:
+    root = Path(name).absolute()
+    return InstallScheme(
+        purelib=str(root / 'purelib'),
+        platlib=str(root / 'platlib'),
+        scripts=str(root / 'bin'),
+        data=str(root),
+        headers=str(root / 'include'),
+        executable=str(root / 'bin' / 'python'),
+    )
+
+
+def make_wheel(version: str, files: Dict[str, str]) -> str:
+    """
+    Writes a wheel of the fake package to the working directory and returns its filename.
+    files maps member names, which may contain {data} and {dist_info}, to their contents.
+    """
+    filename = f'fake-{version}-cp36-cp36m-linux_x86_64.whl'
+    dist_info = f'fake-{version}.dist-info'
+    with zipfile.ZipFile(filename, 'w') as wheel:
+        wheel.writestr(f'{dist_info}/WHEEL', 'Wheel-Version: 1.0\nRoot-Is-Purelib: false\nTag: cp36-cp36m-linux_x86_64\n')
+        wheel.writestr(f'{dist_info}/METADATA', f'Metadata-Version: 2.1\nName: fake\nVersion: {version}\n')
+        wheel.writestr(f'{dist_info}/RECORD', '')
+        for name, contents in files.items():
+            wheel.writestr(name.format(data=f'fake-{version}.data', dist_info=dist_info), contents)
+    return filename
@@ -0,0 +1,180 @@
+"""A local stand-in for a package index, serving PEP 503/691 pages, the PyPI JSON API and distribution files."""
+import asyncio
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from dotlock.dist_info.simple_api import JSON_CONTENT_TYPE
+
+
+class FakeIndex:
+    """
+    Serves {name: [(filename, contents, requires_python)]} under /simple/ and /pypi/.
+
+    The package pages are served as PEP 691 JSON if the client asks for it, otherwise as PEP 503 HTML.
+    Set json_enabled = False to emulate an index that only supports HTML.
+    Files with an entry in metadata_files also have a PEP 658 METADATA file,
+    which the JSON API uses for requires_dist.
+    Files are served with support for Range requests unless ranges_enabled = False.
+    Set max_range_size to serve at most that many bytes of each range, as servers are allowed to.
+    Package pages are served after delay seconds, to emulate a slow index.
+    The next truncated_files file responses are cut off halfway, to emulate a flaky connection.
+    """
+    def __init__(
+            self,
+            packages: Dict[str, List[Tuple[str, bytes, str]]],
+            metadata_files: Optional[Dict[str, bytes]] = None,
+    ) -> None:
+        self.packages = packages
+        self.metadata_files = metadata_files or {}
+        self.json_enabled = True
+        self.ranges_enabled = True
+        self.max_range_size: Optional[int] = None
+        self.delay = 0.0
+        self.truncated_files = 0
+        self.bytes_served = 0
+        self.requests: List[web.Request] = []
+
+        app = web.Application()
+        app.router.add_get('/simple/{name}/', self.package_page)
+        app.router.add_get('/pypi/{name}/json', self.json_page)
+        app.router.add_get('/pypi/{name}/{version}/json', self.version_json_page)
+        app.router.add_get('/files/{filename}', self.file)
+        self.server = TestServer(app)
+
+    async def __aenter__(self) -> 'FakeIndex':
+        await self.server.start_server()
+        self.source = str(self.server.make_url('/simple'))
+        self.json_source = str(self.server.make_url('/pypi'))
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.server.close()
+
+    def _files(self, name):
+        for filename, contents, requires_python in self.packages[name]:
+            yield filename, hashlib.sha256(contents).hexdigest(), requires_python, self._metadata_digest(filename)
+
+    def _metadata_digest(self, filename):
+        if filename not in self.metadata_files:
+            return None
+        return hashlib.sha256(self.metadata_files[filename]).hexdigest()
+
+    async def package_page(self, request: web.Request) -> web.Response:
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        name = request.match_info['name']
+        if name not in self.packages:
+            raise web.HTTPNotFound()
+
+        if self.json_enabled and JSON_CONTENT_TYPE in request.headers.get('Accept', ''):
+            return web.json_response({
+                'meta': {'api-version': '1.0'},
+                'name': name,
+                'files': [
+                    {
+                        'filename': filename,
+                        'url': f'/files/{filename}',
+                        'hashes': {'sha256': digest},
+                        'requires-python': requires_python,
+                        'core-metadata': metadata_digest and {'sha256': metadata_digest},
+                    } for filename, digest, requires_python, metadata_digest in self._files(name)
+                ],
+            }, content_type=JSON_CONTENT_TYPE)
+
+        links = []
+        for filename, digest, requires_python, metadata_digest in self._files(name):
+            attrs = ''
+            if requires_python:
+                escaped = requires_python.replace('>', '&gt;').replace('<', '&lt;')
+                attrs += f' data-requires-python="{escaped}"'
+            if metadata_digest:
+                attrs += f' data-core-metadata="sha256={metadata_digest}"'
+            links.append(f'<a href="/files/{filename}#sha256={digest}"{attrs}>{filename}</a>')
+        body = '<!DOCTYPE html><html><body>' + '<br/>'.join(links) + '</body></html>'
+        return web.Response(text=body, content_type='text/html')
+
+    def _releases(self, name):
+        releases = {}
+        for filename, digest, requires_python, _ in self._files(name):
+            version = re.match(rf'{re.escape(name)}-([^-]+?)(-|\.tar\.gz$|\.zip$)', filename).group(1)
+            releases.setdefault(version, []).append({
+                'filename': filename,
+                'packagetype': 'bdist_wheel' if filename.endswith('.whl') else 'sdist',
+                'url': f'/files/{filename}',
+                'digests': {'sha256': digest},
+                'requires_python': requires_python,
+            })
+        return releases
+
+    def _requires_dist(self, files):
+        for file in files:
+            metadata = self.metadata_files.get(file['filename'])
+            if metadata is not None:
+                return [
+                    line[len('Requires-Dist:'):].strip() for line in metadata.decode().splitlines()
+                    if line.startswith('Requires-Dist:')
+                ]
+        return None
+
+    async def json_page(self, request: web.Request) -> web.Response:
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        name = request.match_info['name']
+        if name not in self.packages:
+            raise web.HTTPNotFound()
+        return web.json_response({'info': {'name': name, 'requires_dist': None}, 'releases': self._releases(name)})
+
+    async def version_json_page(self, request: web.Request) -> web.Response:
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        name = request.match_info['name']
+        version = request.match_info['version']
+        files = self._releases(name).get(version) if name in self.packages else None
+        if files is None:
+            raise web.HTTPNotFound()
+        return web.json_response({
+            'info': {'name': name, 'version': version, 'requires_dist': self._requires_dist(files)},
+            'urls': files,
+        })
+
+    async def file(self, request: web.Request) -> web.Response:
+        self.requests.append(request)
+        filename = request.match_info['filename']
+        if filename.endswith('.metadata') and filename[:-len('.metadata')] in self.metadata_files:
+            return web.Response(body=self.metadata_files[filename[:-len('.metadata')]])
+        for files in self.packages.values():
+            for candidate_filename, contents, _ in files:
+                if candidate_filename == filename:
+                    return await self._file_response(request, contents)
+        raise web.HTTPNotFound()
+
+    async def _file_response(self, request: web.Request, contents: bytes) -> web.StreamResponse:
+        if not self.ranges_enabled or 'Range' not in request.headers:
+            response = web.StreamResponse()
+            body = contents
+        else:
+            start, stop, _ = request.http_range.indices(len(contents))
+            if self.max_range_size is not None:
+                stop = min(stop, start + self.max_range_size)
+            body = contents[start:stop]
+            response = web.StreamResponse(status=206, headers={
+                'Content-Range': f'bytes {start}-{stop - 1}/{len(contents)}',
+            })
+
+        response.content_length = len(body)
+        await response.prepare(request)
+        if self.truncated_files:
+            self.truncated_files -= 1
+            body = body[:len(body) // 2]
+            self.bytes_served += len(body)
+            await response.write(body)
+            request.transport.close()
+            return response
+        self.bytes_served += len(body)
+        await response.write(body)
+        await response.write_eof()
+        return response
@@ -0,0 +1,126 @@
+from pathlib import Path
+import asyncio
+import os
+
+import aiohttp
+import pytest
+
+from dotlock import artifacts
+from dotlock.artifacts import download_file
+from tests.unit.builders import make_candidate
+from tests.unit.fake_index import FakeIndex
+
+
+CONTENTS = os.urandom(256 * 1024)
+FILENAME = 'fake-1.0.tar.gz'
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(artifacts, 'INITIAL_BACKOFF', 0.0)
+
+
+@pytest.mark.asyncio
+async def test_download_file_resumes(tempdir):
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        index.truncated_files = 1
+        await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert Path(FILENAME).read_bytes() == CONTENTS
+        assert not Path(FILENAME + '.part').exists()
+
+        # The second request only asked for the rest of the file.
+        assert len(index.requests) == 2
+        assert index.requests[1].headers['Range'] == f'bytes={len(CONTENTS) // 2}-'
+        assert index.bytes_served == len(CONTENTS)
+
+
+@pytest.mark.asyncio
+async def test_download_file_restarts_without_ranges(tempdir):
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        index.ranges_enabled = False
+        index.truncated_files = 1
+        await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert Path(FILENAME).read_bytes() == CONTENTS
+        assert index.bytes_served == len(CONTENTS) // 2 + len(CONTENTS)
+
+
+@pytest.mark.asyncio
+async def test_download_file_bad_partial_file(tempdir):
+    # Left over from an earlier download of something else.
+    Path(FILENAME + '.part').write_bytes(os.urandom(1000))
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert Path(FILENAME).read_bytes() == CONTENTS
+        assert len(index.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_download_file_complete_partial_file(tempdir):
+    # Left over from a run that was interrupted after receiving the whole file.
+    Path(FILENAME + '.part').write_bytes(CONTENTS)
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert Path(FILENAME).read_bytes() == CONTENTS
+        assert index.requests == []
+
+
+@pytest.mark.asyncio
+async def test_download_file_shared_partial_file(tempdir):
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        index.truncated_files = 2
+        candidate = make_candidate(filename=FILENAME, contents=CONTENTS, index=index)
+        partial_path = Path('staging') / 'fake.part'
+        await asyncio.gather(
+            download_file(session, candidate, Path('a') / FILENAME, partial_path),
+            download_file(session, candidate, Path('b') / FILENAME, partial_path),
+        )
+        assert (Path('a') / FILENAME).read_bytes() == CONTENTS
+        assert (Path('b') / FILENAME).read_bytes() == CONTENTS
+        # Neither the partial file nor its lock file is left behind.
+        assert list(Path('staging').iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_lock_removed_by_previous_holder(tempdir):
+    lock_path = Path('fake.part.lock')
+    first = await artifacts._lock(lock_path)
+    waiting = asyncio.ensure_future(artifacts._lock(lock_path))
+    await asyncio.sleep(artifacts.LOCK_POLL_INTERVAL)
+    lock_path.unlink()
+    os.close(first)
+
+    # A newcomer locks a new lock file, while the waiter holds the old one; only one of them may get the lock.
+    newcomer = asyncio.ensure_future(artifacts._lock(lock_path))
+    done, pending = await asyncio.wait([waiting, newcomer], return_when=asyncio.FIRST_COMPLETED)
+    holder, = done
+    other, = pending
+    await asyncio.sleep(3 * artifacts.LOCK_POLL_INTERVAL)
+    assert not other.done()
+
+    lock_path.unlink()
+    os.close(holder.result())
+    os.close(await asyncio.wait_for(other, timeout=5))
+
+
+@pytest.mark.asyncio
+async def test_download_file_gives_up(tempdir, monkeypatch):
+    monkeypatch.setattr(artifacts, 'MAX_ATTEMPTS', 3)
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index, aiohttp.ClientSession() as session:
+        index.truncated_files = 3
+        with pytest.raises(aiohttp.ClientError):
+            await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert len(index.requests) == 3
+        assert not Path(FILENAME).exists()
+        # The partial file is kept for next time.
+        assert Path(FILENAME + '.part').exists()
+
+        await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert Path(FILENAME).read_bytes() == CONTENTS
+
+
+@pytest.mark.asyncio
+async def test_download_file_not_found(tempdir):
+    async with FakeIndex({'fake': []}) as index, aiohttp.ClientSession() as session:
+        with pytest.raises(aiohttp.ClientResponseError):
+            await download_file(session, make_candidate(filename=FILENAME, contents=CONTENTS, index=index), Path(FILENAME))
+        assert len(index.requests) == 1
@@ -1,10 +1,20 @@
 from pathlib import Path
+import io
+import os
+import zipfile
 
+import aiohttp
+import pytest
 from packaging.specifiers import SpecifierSet
 
-from dotlock.dist_info.dist_info import RequirementInfo, SpecifierType
-from dotlock.dist_info.wheel_handling import get_wheel_file_requirements
+from dotlock.dist_info import simple_api
+from dotlock.dist_info.dist_info import PackageType, RequirementInfo, SpecifierType
+from dotlock.dist_info.wheel_handling import (
+    get_bdist_wheel_requirements, get_metadata_file_requirements, get_wheel_file_requirements,
+)
+from dotlock.exceptions import HashMismatchError
 from dotlock.markers import Marker
+from tests.unit.fake_index import FakeIndex
 
 
 def test_get_wheel_file_requirements():
@@ -34,3 +44,81 @@ def test_get_wheel_file_requirements():
         RequirementInfo(name='sphinx-rtd-theme', specifier_type=SpecifierType.version, specifier=SpecifierSet(''),
                         extras=tuple(), marker=Marker('extra == "docs"')),
     ]
+
+
+WHEEL_FILENAME = 'fake-1.0-py2.py3-none-any.whl'
+METADATA = b"""Metadata-Version: 2.1
+Name: fake
+Version: 1.0
+Requires-Dist: six (>=1.9.0)
+Requires-Dist: pytest ; extra == 'dev'
+
+Requires-Dist: not-a-requirement
+"""
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('json_enabled', [True, False])
+async def test_get_metadata_file_requirements(json_enabled):
+    index = FakeIndex({'fake': [(WHEEL_FILENAME, b'not a wheel', None)]}, {WHEEL_FILENAME: METADATA})
+    async with index, aiohttp.ClientSession() as session:
+        index.json_enabled = json_enabled
+        candidate_info, = await simple_api.get_candidate_infos([PackageType.bdist_wheel], index.source, session, 'fake')
+        assert candidate_info.metadata.startswith('sha256=')
+        requirements = await get_metadata_file_requirements(session, candidate_info)
+
+    assert requirements == [
+        RequirementInfo.from_specifier_str('six', '>=1.9.0'),
+        RequirementInfo(name='pytest', specifier_type=SpecifierType.version, specifier=SpecifierSet(''),
+                        extras=tuple(), marker=Marker('extra == "dev"')),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_metadata_file_requirements_hash_mismatch():
+    index = FakeIndex({'fake': [(WHEEL_FILENAME, b'not a wheel', None)]}, {WHEEL_FILENAME: METADATA})
+    async with index, aiohttp.ClientSession() as session:
+        candidate_info, = await simple_api.get_candidate_infos([PackageType.bdist_wheel], index.source, session, 'fake')
+        candidate_info = candidate_info._replace(metadata='sha256=0')
+        with pytest.raises(HashMismatchError):
+            await get_metadata_file_requirements(session, candidate_info)
+
+
+def make_wheel(filename, metadata, padding_size):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as wheel_zip:
+        # Incompressible data standing in for a large binary extension.
+        wheel_zip.writestr('fake/_ext.so', os.urandom(padding_size))
+        wheel_zip.writestr('fake-1.0.dist-info/METADATA', metadata)
+        wheel_zip.writestr('fake-1.0.dist-info/RECORD', b'')
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('ranges_enabled', [True, False])
+async def test_get_bdist_wheel_requirements(ranges_enabled):
+    wheel = make_wheel(WHEEL_FILENAME, METADATA, padding_size=1024 * 1024)
+    index = FakeIndex({'fake': [(WHEEL_FILENAME, wheel, None)]})
+    async with index, aiohttp.ClientSession() as session:
+        index.ranges_enabled = ranges_enabled
+        candidate_info, = await simple_api.get_candidate_infos([PackageType.bdist_wheel], index.source, session, 'fake')
+        requirements = await get_bdist_wheel_requirements(session, candidate_info)
+
+    assert [r.name for r in requirements] == ['six', 'pytest']
+    if ranges_enabled:
+        assert index.bytes_served < len(wheel) / 4
+    else:
+        assert index.bytes_served == len(wheel)
+
+
+@pytest.mark.asyncio
+async def test_get_bdist_wheel_requirements_short_ranges():
+    wheel = make_wheel(WHEEL_FILENAME, METADATA, padding_size=1024 * 1024)
+    index = FakeIndex({'fake': [(WHEEL_FILENAME, wheel, None)]})
+    async with index, aiohttp.ClientSession() as session:
+        # Less than the central directory and METADATA file, so the whole wheel has to be downloaded.
+        index.max_range_size = 16
+        candidate_info, = await simple_api.get_candidate_infos([PackageType.bdist_wheel], index.source, session, 'fake')
+        requirements = await get_bdist_wheel_requirements(session, candidate_info)
+
+    assert [r.name for r in requirements] == ['six', 'pytest']
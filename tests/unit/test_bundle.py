@@ -0,0 +1,24 @@
+from pathlib import Path
+import tarfile
+
+import pytest
+
+from dotlock.__main__ import bundle
+from tests.unit.builders import make_candidate
+from tests.unit.fake_index import FakeIndex
+
+
+CONTENTS = b'fake sdist'
+FILENAME = 'fake-1.0.tar.gz'
+
+
+@pytest.mark.asyncio
+async def test_bundle(tempdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(Path('cache').absolute()))
+    async with FakeIndex({'fake': [(FILENAME, CONTENTS, None)]}) as index:
+        await bundle([make_candidate(filename=FILENAME, contents=CONTENTS, index=index)])
+
+    assert Path('install.sh').exists()
+    assert not Path('bundle').exists()
+    with tarfile.open('bundle.tar.gz') as tar:
+        assert tar.extractfile(f'bundle/{FILENAME}').read() == CONTENTS
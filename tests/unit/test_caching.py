@@ -0,0 +1,84 @@
+from packaging.specifiers import SpecifierSet
+from packaging.version import Version
+
+from dotlock.dist_info.caching import (
+    get_cached_candidate_infos, get_cached_requirement_infos, set_cached_candidate_infos, set_cached_requirement_infos,
+)
+from dotlock.dist_info.dist_info import PackageType, RequirementInfo, SpecifierType
+from dotlock.markers import Marker
+from tests.unit.builders import make_candidate
+
+
+def test_requirement_infos_round_trip(cache_connection):
+    candidate = make_candidate('a', package_type=PackageType.bdist_wheel, hash_val='0')
+    requirement_infos = [
+        RequirementInfo.from_specifier_str('b', '*'),
+        RequirementInfo.from_specifier_str('c', '>=1.0,<2.0', extras=['security', 'tests']),
+        RequirementInfo.from_specifier_str('d', '==1.2', marker='extra == "dev"'),
+        RequirementInfo.from_specifier_str('e', 'git+git://github.com/python/e'),
+    ]
+    set_cached_candidate_infos(cache_connection, [candidate])
+    set_cached_requirement_infos(cache_connection, candidate, requirement_infos)
+
+    assert get_cached_requirement_infos(cache_connection, candidate) == requirement_infos
+
+
+def test_requirement_infos_parsed_once(cache_connection):
+    candidates = [make_candidate(name, package_type=PackageType.bdist_wheel, hash_val=name) for name in 'ab']
+    requirement_info = RequirementInfo(
+        name='c',
+        specifier_type=SpecifierType.version,
+        specifier=SpecifierSet('>=1.0'),
+        extras=tuple(),
+        marker=Marker('python_version < "3.7"'),
+    )
+    set_cached_candidate_infos(cache_connection, candidates)
+    for candidate in candidates:
+        set_cached_requirement_infos(cache_connection, candidate, [requirement_info])
+
+    # Only the text is stored, not the parsed objects.
+    stored = cache_connection.execute('SELECT specifier, marker FROM requirement_infos').fetchall()
+    assert stored == [('>=1.0', 'python_version < "3.7"')] * 2
+
+    first, = get_cached_requirement_infos(cache_connection, candidates[0])
+    second, = get_cached_requirement_infos(cache_connection, candidates[1])
+    assert first == second == requirement_info
+    # Repeated strings are parsed into the same shared objects.
+    assert first.specifier is second.specifier
+    assert first.marker is second.marker
+
+
+def test_candidate_infos_single_version(cache_connection):
+    candidate = make_candidate('a', package_type=PackageType.bdist_wheel, hash_val='0')
+    set_cached_candidate_infos(cache_connection, [candidate], complete=False)
+
+    # Candidates from a single version's lookup do not stand in for the full listing.
+    assert get_cached_candidate_infos(cache_connection, 'a') is None
+    assert get_cached_candidate_infos(cache_connection, 'a', Version('1.0.0')) == [candidate]
+    assert get_cached_candidate_infos(cache_connection, 'a', Version('2.0')) is None
+
+    set_cached_candidate_infos(cache_connection, [candidate])
+    assert get_cached_candidate_infos(cache_connection, 'a') == [candidate]
+
+
+def test_requirement_infos_shared_by_release(cache_connection):
+    wheel, other_wheel = [make_candidate('a', package_type=PackageType.bdist_wheel, hash_val=str(i)) for i in range(2)]
+    sdist = make_candidate('a', hash_val='2')
+    requirement_infos = [RequirementInfo.from_specifier_str('b', '>=1.0')]
+    set_cached_candidate_infos(cache_connection, [wheel, other_wheel, sdist])
+
+    set_cached_requirement_infos(cache_connection, wheel, requirement_infos, release=True)
+    assert get_cached_requirement_infos(cache_connection, other_wheel) == requirement_infos
+    # Sdists' requirements depend on running their setup, so they are not shared.
+    assert get_cached_requirement_infos(cache_connection, sdist) is None
+
+
+def test_requirement_infos_not_shared_by_distribution(cache_connection):
+    wheel, other_wheel = [make_candidate('a', package_type=PackageType.bdist_wheel, hash_val=str(i)) for i in range(2)]
+    requirement_infos = [RequirementInfo.from_specifier_str('b', '>=1.0')]
+    set_cached_candidate_infos(cache_connection, [wheel, other_wheel])
+
+    # Requirements read from one wheel's METADATA may differ from its siblings'.
+    set_cached_requirement_infos(cache_connection, wheel, requirement_infos)
+    assert get_cached_requirement_infos(cache_connection, wheel) == requirement_infos
+    assert get_cached_requirement_infos(cache_connection, other_wheel) is None
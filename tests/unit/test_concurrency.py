@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from dotlock.concurrency import ConcurrencyLimits, HostLimiter, limited_session, parse_retry_after
+
+
+def test_limits_parse():
+    assert ConcurrencyLimits.parse({}) == ConcurrencyLimits()
+    assert ConcurrencyLimits.parse({'metadata': 64}).metadata == 64
+    with pytest.raises(ValueError):
+        ConcurrencyLimits.parse({'uploads': 1})
+    with pytest.raises(ValueError):
+        ConcurrencyLimits.parse({'downloads': 0})
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after(None) == parse_retry_after('soon') > 0
+
+
+def test_additive_increase_multiplicative_decrease():
+    limiter = HostLimiter('example.com', maximum=6)
+    assert limiter.limit == 4
+
+    for _ in range(100):
+        limiter.record_response(0.1)
+    assert limiter.limit == 6
+
+    limiter.record_failure()
+    assert limiter.limit == 3
+    # Failures of requests that were already in flight only count once.
+    limiter.record_failure()
+    assert limiter.limit == 3
+
+    limiter.record_response(0.1)
+    assert 3 < limiter.limit < 4
+
+
+def test_latency_spike_decreases():
+    limiter = HostLimiter('example.com', maximum=6)
+    limiter.record_response(0.1)
+    limit = limiter.limit
+    limiter.record_response(1.0)
+    assert limiter.limit == limit / 2
+
+
+@pytest.mark.asyncio
+async def test_limited_session():
+    active = 0
+    max_active = 0
+    rate_limited = []
+
+    async def handler(request):
+        nonlocal active, max_active
+        if not rate_limited:
+            rate_limited.append(request)
+            return web.Response(status=429, headers={'Retry-After': '0.05'})
+        active += 1
+        max_active = max(max_active, active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            active -= 1
+        return web.Response(body=b'x' * 1024)
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    async with TestServer(app) as server, limited_session(2) as session:
+        async def get():
+            async with session.get(server.make_url('/')) as response:
+                return response.status
+
+        statuses = await asyncio.gather(*[get() for _ in range(20)])
+
+    assert statuses.count(429) == 1
+    assert statuses.count(200) == 19
+    # The rate-limited host drops to one request at a time and may only have grown back to two.
+    assert 1 <= max_active <= 2
@@ -1,6 +1,16 @@
+import asyncio
+
+import aiohttp
 import pytest
+from packaging.version import Version
 
-from dotlock.dist_info.dist_info import RequirementInfo, SpecifierSet, SpecifierType
+from dotlock.dist_info import simple_api, wheel_filename_parsing
+from dotlock.dist_info.caching import set_cached_candidate_infos
+from dotlock.dist_info.dist_info import (
+    CandidateInfo, PackageType, RequirementInfo, SpecifierSet, SpecifierType, best_candidate_infos,
+)
+from tests.unit.builders import make_candidate
+from tests.unit.fake_index import FakeIndex
 
 
 def test_from_specifier_str_wildcard():
@@ -44,3 +54,82 @@ def test_from_specifier_str_path(path):
         extras=tuple(),
         marker=None,
     )
+
+
+def test_from_specifier_str_canonicalizes_name():
+    assert RequirementInfo.from_specifier_str('Foo_Bar', '*').name == 'foo-bar'
+
+
+@pytest.mark.parametrize('specifier_str,pinned_version', [
+    ('==1.2', '1.2'),
+    ('==1.2.*', None),
+    ('>=1.2', None),
+    ('==1.2,!=1.3', None),
+    ('*', None),
+    ('git+git://github.com/python/e', None),
+])
+def test_pinned_version(specifier_str, pinned_version):
+    requirement_info = RequirementInfo.from_specifier_str('a', specifier_str)
+    assert requirement_info.pinned_version == (pinned_version and Version(pinned_version))
+
+
+def test_best_candidate_infos(monkeypatch):
+    monkeypatch.setattr(wheel_filename_parsing, 'pep425tags', {
+        'abi': 'cp37m',
+        'impl': 'cp',
+        'manylinux1': True,
+        'platform': 'linux_x86_64',
+        'version': '3.7'
+    })
+
+    universal_wheel = make_candidate('a', 'a-1.0-py2.py3-none-any.whl', b'universal', PackageType.bdist_wheel)
+    binary_wheel = make_candidate('a', 'a-1.0-cp37-cp37m-manylinux1_x86_64.whl', b'binary', PackageType.bdist_wheel)
+    sdist = make_candidate('a', 'a-1.0.tar.gz', b'sdist')
+    only_sdist = make_candidate('a', 'a-1.1.tar.gz', b'only sdist', version=Version('1.1'))
+    vcs = CandidateInfo(
+        name='a', version=None, package_type=PackageType.vcs, source=None,
+        location='git+git://github.com/a/a', hash_alg=None, hash_val=None,
+    )
+
+    assert best_candidate_infos([sdist, universal_wheel, binary_wheel, only_sdist, vcs]) == [
+        vcs, binary_wheel, only_sdist,
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('specifier_str', ['==2.*', '==2.0,!=1.0'])
+async def test_get_candidate_infos_refreshes_stale_listing(cache_connection, specifier_str):
+    index = FakeIndex({'a': [('a-1.0.tar.gz', b'1.0', None)]})
+    requirement_info = RequirementInfo.from_specifier_str('a', specifier_str)
+    async with index, aiohttp.ClientSession() as session:
+        await RequirementInfo.from_specifier_str('a', '*').get_candidate_infos(
+            [PackageType.sdist], [index.source], cache_connection, session, update=False,
+        )
+        index.packages['a'].append(('a-2.0.tar.gz', b'2.0', None))
+        candidate_infos = await requirement_info.get_candidate_infos(
+            [PackageType.sdist], [index.source], cache_connection, session, update=False,
+        )
+
+    assert [c.version for c in candidate_infos] == [Version('2.0')]
+
+
+@pytest.mark.asyncio
+async def test_get_requirement_infos_per_wheel_metadata(cache_connection):
+    wheels = ['a-1.0-py3-none-any.whl', 'a-1.0-py2-none-any.whl']
+    index = FakeIndex(
+        {'a': [(filename, filename.encode(), None) for filename in wheels]},
+        {
+            wheels[0]: b'Metadata-Version: 2.1\nName: a\nVersion: 1.0\nRequires-Dist: b\n',
+            wheels[1]: b'Metadata-Version: 2.1\nName: a\nVersion: 1.0\nRequires-Dist: c\n',
+        },
+    )
+    async with index, aiohttp.ClientSession() as session:
+        candidate_infos = await simple_api.get_candidate_infos(
+            [PackageType.bdist_wheel], index.source, session, 'a', supported_only=False,
+        )
+        set_cached_candidate_infos(cache_connection, candidate_infos)
+        for _ in range(2):  # Fetched, then cached.
+            requirement_infos = await asyncio.gather(*[
+                candidate_info.get_requirement_infos(cache_connection, session) for candidate_info in candidate_infos
+            ])
+            assert [[r.name for r in rs] for rs in requirement_infos] == [['b'], ['c']]
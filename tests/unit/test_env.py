@@ -34,6 +34,8 @@ def test_load_from_file(tempdir):
             "abi": "cp35m",
             "impl": "cp35",
             "manylinux1": True,
+            "glibc": "2.17",
+            "musl": None,
             "platform": "linux_i386",
             "version": "3.5"
         }
@@ -44,3 +46,14 @@ def test_load_from_file(tempdir):
     env.load()
     assert env.environment == new_env['environment']
     assert env.pep425tags == new_env['pep425tags']
+
+
+def test_upgrade_pep425tags():
+    old_pep425tags = {
+        "abi": "cp35m",
+        "impl": "cp35",
+        "manylinux1": True,
+        "platform": "linux_i386",
+        "version": "3.5"
+    }
+    assert env.upgrade_pep425tags(old_pep425tags) == {**old_pep425tags, 'glibc': '2.5', 'musl': None}
@@ -0,0 +1,165 @@
+from pathlib import Path
+import asyncio
+import os
+
+import aiohttp
+import pytest
+
+from dotlock import install as install_module
+from dotlock.artifacts import default_staging_dir, staging_path
+from dotlock.dist_info.dist_info import PackageType
+from dotlock.exceptions import HashMismatchError
+from dotlock.install import download, install
+from dotlock.wheel_installer import LinkMode
+from tests.unit.builders import make_candidate, make_scheme, make_wheel
+from tests.unit.fake_index import FakeIndex
+
+
+@pytest.fixture(autouse=True)
+def scheme(tempdir, monkeypatch):
+    # Keep the unpacked wheel cache out of the real cache directory.
+    monkeypatch.setenv('XDG_CACHE_HOME', str(Path('cache').absolute()))
+    scheme = make_scheme()
+
+    async def fake_get_install_scheme(python_path):
+        return scheme
+
+    monkeypatch.setattr(install_module, 'get_install_scheme', fake_get_install_scheme)
+    return scheme
+
+
+@pytest.mark.asyncio
+async def test_install_pipelined(tempdir, monkeypatch):
+    candidates = [make_candidate('a'), make_candidate('b'), make_candidate('c')]
+    events = []
+    release_c = asyncio.Event()
+
+    async def fake_download(session, candidate):
+        if candidate.name == 'c':
+            await release_c.wait()
+        events.append(('downloaded', candidate.name))
+
+    async def fake_pip_install(python_path, install_dir, candidate):
+        events.append(('installed', candidate.name))
+        if candidate.name == 'b':
+            release_c.set()
+
+    monkeypatch.setattr(install_module, 'download', fake_download)
+    monkeypatch.setattr(install_module, 'pip_install', fake_pip_install)
+    await install(candidates, no_venv=True)
+
+    # a and b are installed while c is still downloading, and everything is installed in order.
+    assert events.index(('installed', 'b')) < events.index(('downloaded', 'c'))
+    assert [name for event, name in events if event == 'installed'] == ['a', 'b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_install_cancels_downloads_on_failure(tempdir, monkeypatch):
+    candidates = [make_candidate('a'), make_candidate('b')]
+    cancelled = []
+
+    async def fake_download(session, candidate):
+        if candidate.name == 'a':
+            raise RuntimeError('Download failed')
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(candidate.name)
+            raise
+
+    monkeypatch.setattr(install_module, 'download', fake_download)
+    with pytest.raises(RuntimeError):
+        await install(candidates, no_venv=True)
+    assert cancelled == ['b']
+
+
+@pytest.mark.asyncio
+async def test_install_independent_candidates_in_parallel(tempdir, monkeypatch):
+    candidates = [make_candidate('a'), make_candidate('b'), make_candidate('c')]
+    dependencies = {'a': (), 'b': (), 'c': ('a', 'b')}
+    running = set()
+    both_running = asyncio.Event()
+    events = []
+
+    async def fake_download(session, candidate):
+        pass
+
+    async def fake_pip_install(python_path, install_dir, candidate):
+        running.add(candidate.name)
+        if running >= {'a', 'b'}:
+            both_running.set()
+        if candidate.name in ('a', 'b'):
+            # Each of a and b only finishes once the other has started.
+            await asyncio.wait_for(both_running.wait(), timeout=5)
+        events.append(candidate.name)
+        running.remove(candidate.name)
+
+    monkeypatch.setattr(install_module, 'download', fake_download)
+    monkeypatch.setattr(install_module, 'pip_install', fake_pip_install)
+    await install(candidates, no_venv=True, dependencies=dependencies, workers=2)
+    assert events[-1] == 'c'
+
+
+@pytest.mark.asyncio
+async def test_install_workers_limit(tempdir, monkeypatch):
+    candidates = [make_candidate(name) for name in 'abcd']
+    dependencies = {name: () for name in 'abcd'}
+    running = []
+    max_running = 0
+
+    async def fake_download(session, candidate):
+        pass
+
+    async def fake_pip_install(python_path, install_dir, candidate):
+        nonlocal max_running
+        running.append(candidate.name)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.01)
+        running.remove(candidate.name)
+
+    monkeypatch.setattr(install_module, 'download', fake_download)
+    monkeypatch.setattr(install_module, 'pip_install', fake_pip_install)
+    await install(candidates, no_venv=True, dependencies=dependencies, workers=2)
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_download(tempdir):
+    # Larger than a block, so it is hashed and written in pieces.
+    contents = os.urandom(3 * 1024 * 1024 + 1)
+    async with FakeIndex({'big': [('big-1.0.tar.gz', contents, None)]}) as index, aiohttp.ClientSession() as session:
+        candidate = make_candidate('big', contents=contents, index=index)
+        await download(session, candidate)
+        assert Path('big-1.0.tar.gz').read_bytes() == contents
+
+        os.remove('big-1.0.tar.gz')
+        bad_candidate = candidate._replace(hash_val='0' * 64)
+        with pytest.raises(HashMismatchError):
+            await download(session, bad_candidate)
+        assert not Path('big-1.0.tar.gz').exists()
+        assert not staging_path(default_staging_dir(), bad_candidate).exists()
+
+
+@pytest.mark.asyncio
+async def test_install_from_unpacked_wheel_cache(scheme, monkeypatch):
+    wheel = make_wheel('1.0', {'fake/__init__.py': ''})
+    contents = Path(wheel).read_bytes()
+    os.remove(wheel)
+    async with FakeIndex({'fake': [(wheel, contents, None)]}) as index:
+        candidate = make_candidate(filename=wheel, contents=contents, package_type=PackageType.bdist_wheel, index=index)
+        await install([candidate], no_venv=True, link_mode=LinkMode.hardlink)
+        assert len(index.requests) == 1
+
+        # A second environment is installed straight from the cache.
+        other_scheme = make_scheme('other-venv')
+
+        async def fake_get_install_scheme(python_path):
+            return other_scheme
+
+        monkeypatch.setattr(install_module, 'get_install_scheme', fake_get_install_scheme)
+        await install([candidate], no_venv=True, link_mode=LinkMode.hardlink)
+        assert len(index.requests) == 1
+        assert os.path.samefile(
+            os.path.join(scheme.platlib, 'fake', '__init__.py'),
+            os.path.join(other_scheme.platlib, 'fake', '__init__.py'),
+        )
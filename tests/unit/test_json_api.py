@@ -0,0 +1,91 @@
+import json
+
+import aiohttp
+import pytest
+from packaging.version import Version
+
+from dotlock.dist_info.dist_info import PackageType
+from dotlock.dist_info.json_api import get_candidate_infos, iter_release_files
+from dotlock.dist_info.json_stream import StreamingJSONReader
+from tests.unit.fake_index import FakeIndex
+
+
+class ChunkedStream:
+    """Emulates aiohttp's StreamReader, returning the data in small chunks."""
+    def __init__(self, data: bytes, chunk_size: int) -> None:
+        self.data = data
+        self.chunk_size = chunk_size
+
+    async def readany(self) -> bytes:
+        chunk, self.data = self.data[:self.chunk_size], self.data[self.chunk_size:]
+        return chunk
+
+
+RELEASE_LISTING = {
+    'info': {'name': 'fake', 'summary': 'Ünïcode summary', 'requires_dist': None},
+    'last_serial': 12345,
+    'releases': {
+        '1.0': [
+            {
+                'filename': 'fake-1.0.tar.gz',
+                'packagetype': 'sdist',
+                'url': 'https://files.example.com/fake-1.0.tar.gz',
+                'digests': {'md5': 'abc', 'sha256': 'def'},
+                'comment_text': '',
+                'size': 1000,
+            },
+        ],
+        '1.1': [],
+        '1.2': [
+            {
+                'filename': 'fake-1.2-py3-none-any.whl',
+                'packagetype': 'bdist_wheel',
+                'url': 'https://files.example.com/fake-1.2-py3-none-any.whl',
+                'digests': {'sha256': 'ghi'},
+            },
+        ],
+    },
+    'urls': [],
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024 * 1024])
+async def test_iter_release_files(chunk_size):
+    stream = ChunkedStream(json.dumps(RELEASE_LISTING, ensure_ascii=False).encode('utf-8'), chunk_size)
+    release_files = [
+        (version, distribution['filename'], distribution['digests'])
+        async for version, distribution in iter_release_files(stream)
+    ]
+
+    assert release_files == [
+        ('1.0', 'fake-1.0.tar.gz', {'md5': 'abc', 'sha256': 'def'}),
+        ('1.2', 'fake-1.2-py3-none-any.whl', {'sha256': 'ghi'}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_streaming_reader_numbers_split_across_chunks():
+    reader = StreamingJSONReader(ChunkedStream(b'[12345, 6]', chunk_size=3))
+    values = []
+    async for _ in reader.array_items():
+        values.append(await reader.value())
+
+    assert values == [12345, 6]
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_requires_python():
+    index = FakeIndex({
+        'fake': [
+            ('fake-1.0.tar.gz', b'sdist 1.0', '>=2.7'),
+            ('fake-1.1-py2.py3-none-any.whl', b'wheel 1.1', None),
+            ('fake-1.2-py2.py3-none-any.whl', b'wheel 1.2', '<3'),
+        ],
+    })
+    async with index, aiohttp.ClientSession() as session:
+        candidate_infos = await get_candidate_infos(
+            [PackageType.bdist_wheel, PackageType.sdist], index.json_source, session, 'fake',
+        )
+
+    assert [c.version for c in candidate_infos] == [Version('1.0'), Version('1.1')]
@@ -1,7 +1,53 @@
-from dotlock.dist_info.sdist_handling import get_local_package_requirements
+from pathlib import Path
+import shutil
+
+from dotlock.dist_info import sdist_handling
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType
+from dotlock.dist_info.sdist_handling import (
+    get_local_package_requirements,
+    get_local_requirement_infos,
+    local_package_fingerprint,
+)
 from tests import test_path
 
 
 def test_local():
     requirements = get_local_package_requirements('fakepkg', str(test_path / 'fakepkg'))
     assert [r.name for r in requirements] == ['aiohttp']
+
+
+def test_local_package_fingerprint(tempdir):
+    shutil.copytree(str(test_path / 'fakepkg'), 'fakepkg')
+    fingerprint = local_package_fingerprint('fakepkg')
+    assert fingerprint.startswith('sha256:')
+
+    Path('fakepkg', 'src', 'module.py').write_text('x = 1\n')
+    assert local_package_fingerprint('fakepkg') == fingerprint
+
+    Path('fakepkg', 'requirements.txt').write_text('requests\n')
+    assert local_package_fingerprint('fakepkg') != fingerprint
+
+
+def test_get_local_requirement_infos_cached(tempdir, cache_connection, monkeypatch):
+    shutil.copytree(str(test_path / 'fakepkg'), 'fakepkg')
+    candidate_info = CandidateInfo(
+        name='fakepkg', version=None, package_type=PackageType.local, source=None,
+        location='fakepkg', hash_alg=None, hash_val=None,
+    )
+    requirement_infos = get_local_requirement_infos(cache_connection, candidate_info)
+    assert [r.name for r in requirement_infos] == ['aiohttp']
+
+    calls = []
+
+    def counting_get_local_package_requirements(name, package_dir):
+        calls.append(name)
+        return get_local_package_requirements(name, package_dir)
+
+    monkeypatch.setattr(sdist_handling, 'get_local_package_requirements', counting_get_local_package_requirements)
+    assert get_local_requirement_infos(cache_connection, candidate_info) == requirement_infos
+    assert calls == []
+
+    setup_py = Path('fakepkg', 'setup.py')
+    setup_py.write_text(setup_py.read_text().replace("'aiohttp',", "'aiohttp',\n        'idna',"))
+    assert [r.name for r in get_local_requirement_infos(cache_connection, candidate_info)] == ['aiohttp', 'idna']
+    assert calls == ['fakepkg']
@@ -0,0 +1,102 @@
+import aiohttp
+import pytest
+from packaging.version import Version
+
+from dotlock.dist_info import json_api
+from dotlock.dist_info.dist_info import PackageType
+from dotlock.dist_info.package_indices import get_candidate_infos, get_requirment_infos
+from dotlock.exceptions import NotFound, PackageIndexError
+from tests.unit.fake_index import FakeIndex
+
+
+PACKAGE_TYPES = [PackageType.bdist_wheel, PackageType.sdist]
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_source_priority():
+    private_index = FakeIndex({'private': [('private-1.0.tar.gz', b'private', None)]})
+    public_index = FakeIndex({
+        'private': [('private-2.0.tar.gz', b'impostor', None)],
+        'public': [('public-1.0.tar.gz', b'public', None)],
+    })
+    # The private index answering slowly must not let the public index take priority.
+    private_index.delay = 0.1
+    async with private_index, public_index, aiohttp.ClientSession() as session:
+        sources = [private_index.source, public_index.source]
+        private, = await get_candidate_infos(PACKAGE_TYPES, sources, session, 'private')
+        public, = await get_candidate_infos(PACKAGE_TYPES, sources, session, 'public')
+        with pytest.raises(NotFound):
+            await get_candidate_infos(PACKAGE_TYPES, sources, session, 'missing')
+
+    assert private.source == private_index.source
+    assert public.source == public_index.source
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_cancels_lower_priority_sources():
+    first_index = FakeIndex({'a': [('a-1.0.tar.gz', b'first', None)]})
+    second_index = FakeIndex({'a': [('a-1.0.tar.gz', b'second', None)]})
+    second_index.delay = 10
+    async with first_index, second_index, aiohttp.ClientSession() as session:
+        sources = [first_index.source, second_index.source]
+        candidate_info, = await get_candidate_infos(PACKAGE_TYPES, sources, session, 'a')
+
+    assert candidate_info.source == first_index.source
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_timeout():
+    slow_index = FakeIndex({'a': [('a-1.0.tar.gz', b'slow', None)]})
+    fast_index = FakeIndex({'a': [('a-1.0.tar.gz', b'fast', None)]})
+    slow_index.delay = 10
+    async with slow_index, fast_index, aiohttp.ClientSession() as session:
+        sources = [slow_index.source, fast_index.source]
+        with pytest.raises(PackageIndexError):
+            await get_candidate_infos(PACKAGE_TYPES, sources, session, 'a', {slow_index.source: 0.1})
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_pinned_version():
+    index = FakeIndex(
+        {'a': [
+            ('a-1.0.tar.gz', b'1.0', None),
+            ('a-1.0-py2.py3-none-any.whl', b'1.0 wheel', None),
+            ('a-2.0.tar.gz', b'2.0', None),
+        ]},
+        {'a-1.0-py2.py3-none-any.whl': b'Requires-Dist: b (>=1.0)\n'},
+    )
+    async with index, aiohttp.ClientSession() as session:
+        simple_infos = await get_candidate_infos(PACKAGE_TYPES, [index.source], session, 'a', version=Version('1.0'))
+        json_infos = await get_candidate_infos(
+            PACKAGE_TYPES, [index.json_source], session, 'a', version=Version('1.0'),
+        )
+        wheel_info, = [c for c in json_infos if c.package_type == PackageType.bdist_wheel]
+        requirement_info, = await get_requirment_infos(session, wheel_info)
+        # The index knows the release as 2.0, so this falls back to the full listing.
+        fallback_infos = await get_candidate_infos(
+            PACKAGE_TYPES, [index.json_source], session, 'a', version=Version('2.0.0'),
+        )
+        json_paths = [request.path for request in index.requests if request.path.startswith('/pypi/')]
+
+    assert sorted(c.location for c in simple_infos) == sorted(c.location for c in json_infos)
+    assert {c.version for c in simple_infos + json_infos} == {Version('1.0')}
+    assert len(json_infos) == 2
+    assert requirement_info.name == 'b'
+    assert [c.version for c in fallback_infos] == [Version('2.0')]
+    # The requirements came from the response listing the pinned version's files.
+    assert json_paths == ['/pypi/a/1.0/json', '/pypi/a/2.0.0/json', '/pypi/a/json']
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_pinned_version_cache_size(monkeypatch):
+    monkeypatch.setattr(json_api, 'REQUIRES_DIST_CACHE_SIZE', 2)
+    monkeypatch.setattr(json_api, '_requires_dist', json_api.OrderedDict())
+    index = FakeIndex({'a': [(f'a-{version}.tar.gz', version.encode(), None) for version in ('1.0', '2.0', '3.0')]})
+    async with index, aiohttp.ClientSession() as session:
+        for version in ('1.0', '2.0', '1.0', '3.0'):
+            await get_candidate_infos(PACKAGE_TYPES, [index.json_source], session, 'a', version=Version(version))
+
+    # 2.0 was the least recently used, so it was forgotten to make room for 3.0.
+    assert list(json_api._requires_dist) == [
+        (index.json_source, 'a', Version('1.0')), (index.json_source, 'a', Version('3.0')),
+    ]
@@ -1,3 +1,4 @@
+from dotlock.concurrency import ConcurrencyLimits
 from dotlock.dist_info.dist_info import RequirementInfo
 from dotlock.package_json import PackageJSON
 
@@ -35,3 +36,26 @@ def test_parse():
         marker="sys.platform == 'win32'",
     )
     assert len(parsed.extras['tests']) == 1
+
+
+def test_parse_sources():
+    parsed = PackageJSON.parse({
+        'sources': [
+            'https://pypi.example.com/simple',
+            {'url': 'https://pypi.org/pypi', 'timeout': 5},
+        ],
+        'default': {},
+        'extras': {},
+    })
+    assert parsed.sources == ['https://pypi.example.com/simple', 'https://pypi.org/pypi']
+    assert parsed.source_timeouts == {'https://pypi.org/pypi': 5.0}
+
+
+def test_parse_concurrency():
+    parsed = PackageJSON.parse({
+        'sources': ['https://pypi.org/pypi'],
+        'concurrency': {'downloads': 2},
+        'default': {},
+        'extras': {},
+    })
+    assert parsed.concurrency == ConcurrencyLimits(metadata=ConcurrencyLimits().metadata, downloads=2)
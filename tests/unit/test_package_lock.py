@@ -0,0 +1,41 @@
+from dotlock.package_lock import get_locked_candidates, get_locked_dependencies
+
+
+def locked_candidate(name, dependencies=None):
+    data = {
+        'name': name,
+        'version': '1.0',
+        'package_type': 'bdist_wheel',
+        'source': 'https://pypi.org/pypi',
+        'location': f'https://files.example.com/{name}-1.0-py3-none-any.whl',
+        'hash_alg': 'sha256',
+        'hash_val': name,
+    }
+    if dependencies is not None:
+        data['dependencies'] = dependencies
+    return data
+
+
+def test_get_locked_dependencies():
+    lock_data = {
+        'default': [locked_candidate('b', []), locked_candidate('a', ['b'])],
+        'extras': {
+            'tests': [
+                locked_candidate('b', []),
+                locked_candidate('c', []),
+                locked_candidate('a', ['b', 'c']),
+                locked_candidate('pytest', ['a']),
+            ],
+        },
+    }
+    candidates = get_locked_candidates(lock_data, [], None)
+    assert get_locked_dependencies(lock_data, [], candidates) == {'a': ('b',), 'b': ()}
+
+    candidates = get_locked_candidates(lock_data, ['tests'], ['a', 'c', 'pytest'])
+    assert get_locked_dependencies(lock_data, ['tests'], candidates) == {'a': ('c',), 'c': (), 'pytest': ('a',)}
+
+
+def test_get_locked_dependencies_old_lock():
+    lock_data = {'default': [locked_candidate('a')], 'extras': {}}
+    candidates = get_locked_candidates(lock_data, [], None)
+    assert get_locked_dependencies(lock_data, [], candidates) is None
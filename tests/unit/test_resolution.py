@@ -7,7 +7,7 @@ from dotlock.dist_info.caching import set_cached_candidate_infos, set_cached_req
 from dotlock.dist_info.dist_info import PackageType, RequirementInfo, CandidateInfo
 from dotlock.exceptions import CircularDependencyError, RequirementConflictError
 from dotlock.package_json import parse_requirements
-from dotlock.resolve import _resolve_requirement_list, candidate_topo_sort
+from dotlock.resolve import _resolve_requirement_list, candidate_dependencies, candidate_topo_sort
 
 
 def make_index_cache(cache_connection, index_state: dict) -> Dict[CandidateInfo, List[RequirementInfo]]:
@@ -108,6 +108,7 @@ async def test_resolve_depth_2_dependencies(cache_connection):
 
     # The candidates in topo order should be the reverse of the dependency order.
     assert candidate_infos == list(candidates_with_requirements)[::-1]
+    assert [candidate_dependencies(c) for c in candidates] == [(), ('c',), ('b',)]
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,109 @@
+from pathlib import Path
+import hashlib
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+from dotlock.dist_info import json_api, simple_api
+from dotlock.dist_info.dist_info import PackageType
+from dotlock.serve import IndexServer
+from tests.unit.fake_index import FakeIndex
+
+
+WHEEL_FILENAME = 'fake-1.0-py2.py3-none-any.whl'
+METADATA = b"""Metadata-Version: 2.1
+Name: fake
+Version: 1.0
+Requires-Dist: six (>=1.9.0)
+Requires-Dist: pytest ; extra == 'dev'
+"""
+PACKAGE_TYPES = [PackageType.bdist_wheel, PackageType.sdist]
+
+
+@pytest.mark.asyncio
+async def test_serve(tempdir, cache_connection):
+    upstream = FakeIndex(
+        {'fake': [('fake-1.0.tar.gz', b'sdist', None), (WHEEL_FILENAME, b'wheel', None)]},
+        {WHEEL_FILENAME: METADATA},
+    )
+    index_server = IndexServer([], cache_connection, Path('artifacts').resolve(), ttl=600)
+    server = TestServer(index_server.make_app())
+    async with upstream, server, aiohttp.ClientSession() as session:
+        index_server.sources = [upstream.source]
+        simple_source = str(server.make_url('/simple'))
+        json_source = str(server.make_url('/pypi'))
+        files_url = str(server.make_url('/files'))
+
+        simple_candidate_infos = await simple_api.get_candidate_infos(PACKAGE_TYPES, simple_source, session, 'fake')
+        json_candidate_infos = await json_api.get_candidate_infos(PACKAGE_TYPES, json_source, session, 'fake')
+        version_metadata = await json_api.get_json_metadata(
+            json_source, session, 'fake', json_candidate_infos[0].version,
+        )
+        assert await json_api.get_candidate_infos(PACKAGE_TYPES, json_source, session, 'missing') is None
+
+        # Downloads from the server are only fetched from upstream once.
+        contents = []
+        for _ in range(2):
+            async with session.get(simple_candidate_infos[1].location) as response:
+                response.raise_for_status()
+                contents.append(await response.read())
+        upstream_file_requests = [r for r in upstream.requests if r.path == f'/files/{WHEEL_FILENAME}']
+        upstream_page_requests = [r for r in upstream.requests if r.path == '/simple/fake/']
+
+    assert [(c.version, c.package_type) for c in simple_candidate_infos] == \
+        [(c.version, c.package_type) for c in json_candidate_infos] == [
+            (json_candidate_infos[0].version, PackageType.sdist),
+            (json_candidate_infos[0].version, PackageType.bdist_wheel),
+        ]
+    assert [c.hash_val for c in simple_candidate_infos] == [c.hash_val for c in json_candidate_infos]
+    assert all(c.location.startswith(files_url) for c in simple_candidate_infos)
+    assert version_metadata['info']['requires_dist'] == ['six>=1.9.0', 'pytest; extra == "dev"']
+    assert contents == [b'wheel', b'wheel']
+    assert len(upstream_file_requests) == 1
+    # Within the TTL, the file list is only fetched from upstream once.
+    assert len(upstream_page_requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_serve_lists_all_files(tempdir, cache_connection):
+    windows_wheel = 'fake-1.0-cp27-cp27m-win32.whl'
+    upstream = FakeIndex(
+        {'fake': [
+            ('fake-1.0.tar.gz', b'sdist', '<3'),
+            (WHEEL_FILENAME, b'wheel', '>=3.4'),
+            (windows_wheel, b'windows wheel', None),
+        ]},
+        {WHEEL_FILENAME: METADATA},
+    )
+    index_server = IndexServer([], cache_connection, Path('artifacts').resolve(), ttl=600)
+    server = TestServer(index_server.make_app())
+    async with upstream, server, aiohttp.ClientSession() as session:
+        index_server.sources = [upstream.source]
+        headers = {'Accept': simple_api.JSON_CONTENT_TYPE}
+        async with session.get(server.make_url('/simple/fake/'), headers=headers) as response:
+            files = (await response.json(content_type=None))['files']
+        async with session.get(server.make_url('/simple/fake/')) as response:
+            html_page = await response.text()
+        wheel_file, = [f for f in files if f['filename'] == WHEEL_FILENAME]
+        async with session.get(server.make_url(wheel_file['url'] + '.metadata')) as response:
+            metadata = await response.read()
+
+        # Once a file is removed upstream, it is no longer served.
+        upstream.packages['fake'].pop()
+        index_server.refreshed.clear()
+        async with session.get(server.make_url('/simple/fake/'), headers=headers) as response:
+            refreshed_files = (await response.json(content_type=None))['files']
+        windows_file, = [f for f in files if f['filename'] == windows_wheel]
+        async with session.get(server.make_url(windows_file['url'])) as response:
+            removed_status = response.status
+
+    assert [(f['filename'], f['requires-python'], f['core-metadata']) for f in files] == [
+        ('fake-1.0.tar.gz', '<3', False),
+        (WHEEL_FILENAME, '>=3.4', {'sha256': hashlib.sha256(METADATA).hexdigest()}),
+        (windows_wheel, None, False),
+    ]
+    assert 'data-requires-python="&gt;=3.4"' in html_page
+    assert metadata == METADATA
+    assert [f['filename'] for f in refreshed_files] == ['fake-1.0.tar.gz', WHEEL_FILENAME]
+    assert removed_status == 404
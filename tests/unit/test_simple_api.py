@@ -0,0 +1,90 @@
+import aiohttp
+import pytest
+from packaging.version import Version
+
+from dotlock.dist_info import simple_api
+from dotlock.dist_info.dist_info import PackageType
+from tests.unit.fake_index import FakeIndex
+
+
+PACKAGES = {
+    'fake': [
+        ('fake-1.0.tar.gz', b'sdist 1.0', None),
+        ('fake-1.1-py2.py3-none-any.whl', b'wheel 1.1', None),
+        ('fake-1.2-py2.py3-none-any.whl', b'wheel 1.2', '<3'),
+        ('fake-1.3-cp27-cp27m-win32.whl', b'wheel 1.3', None),
+    ],
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('json_enabled', [True, False])
+async def test_get_candidate_infos(json_enabled):
+    async with FakeIndex(PACKAGES) as index:
+        index.json_enabled = json_enabled
+        files_url = str(index.server.make_url('/files'))
+        async with aiohttp.ClientSession() as session:
+            candidate_infos = await simple_api.get_candidate_infos(
+                [PackageType.bdist_wheel, PackageType.sdist], index.source, session, 'fake',
+            )
+
+    assert [(c.version, c.package_type) for c in candidate_infos] == [
+        (Version('1.0'), PackageType.sdist),
+        (Version('1.1'), PackageType.bdist_wheel),
+    ]
+    assert candidate_infos[1].location == files_url + '/fake-1.1-py2.py3-none-any.whl'
+    assert candidate_infos[1].hash_alg == 'sha256'
+
+
+@pytest.mark.asyncio
+async def test_get_candidate_infos_not_found():
+    async with FakeIndex(PACKAGES) as index:
+        async with aiohttp.ClientSession() as session:
+            candidate_infos = await simple_api.get_candidate_infos(
+                [PackageType.bdist_wheel, PackageType.sdist], index.source, session, 'missing',
+            )
+
+    assert candidate_infos is None
+
+
+def test_parse_json_page():
+    links = simple_api.parse_json_page('fake', {
+        'meta': {'api-version': '1.0'},
+        'name': 'fake',
+        'files': [
+            {'filename': 'fake-1.0.tar.gz', 'url': 'https://x/fake-1.0.tar.gz', 'hashes': {'sha256': 'abc'}},
+            {'filename': 'fake-1.1.tar.gz', 'url': 'https://x/fake-1.1.tar.gz', 'hashes': {}, 'requires-python': '<3'},
+        ],
+    }, [PackageType.sdist])
+    assert links == [
+        ('https://x/fake-1.0.tar.gz', 'fake-1.0.tar.gz', PackageType.sdist, {'sha256': 'abc'}, None, None),
+    ]
+
+
+def test_parse_html_page():
+    content = """<!DOCTYPE html>
+<html><body>
+<h1>Links for fake</h1>
+<a href="../../files/fake-1.0.tar.gz#sha256=abc" data-requires-python="&gt;=3.4">fake-1.0.tar.gz</a><br/>
+<A HREF='https://x/fake-1.1-py3-none-any.whl#sha256=def' data-requires-python=">=3.4" data-core-metadata="true">
+fake-1.1-py3-none-any.whl</A><br/>
+<a href="https://x/fake-1.2-py3-none-any.whl#sha256=ghi" data-requires-python="&lt;3">fake-1.2-py3-none-any.whl</a>
+<a href="https://x/fake-1.3-cp27-cp27m-win32.whl#sha256=jkl">fake-1.3-cp27-cp27m-win32.whl</a>
+<a href="https://x/fake%2Bextra-1.4.zip#md5=mno">fake+extra-1.4.zip</a>
+</body></html>"""
+    links = simple_api.parse_html_page('fake', content, [PackageType.bdist_wheel, PackageType.sdist])
+    assert links == [
+        ('../../files/fake-1.0.tar.gz', 'fake-1.0.tar.gz', PackageType.sdist, {'sha256': 'abc'}, None, '>=3.4'),
+        ('https://x/fake-1.1-py3-none-any.whl', 'fake-1.1-py3-none-any.whl', PackageType.bdist_wheel,
+         {'sha256': 'def'}, 'true', '>=3.4'),
+        ('https://x/fake%2Bextra-1.4.zip', 'fake+extra-1.4.zip', PackageType.sdist, {'md5': 'mno'}, None, None),
+    ]
+
+    wheel_links = simple_api.parse_html_page('fake', content, [PackageType.bdist_wheel])
+    assert [link[1] for link in wheel_links] == ['fake-1.1-py3-none-any.whl']
+
+    # The index server lists every file.
+    all_links = simple_api.parse_html_page('fake', content, [PackageType.bdist_wheel], supported_only=False)
+    assert [link[1] for link in all_links] == [
+        'fake-1.1-py3-none-any.whl', 'fake-1.2-py3-none-any.whl', 'fake-1.3-cp27-cp27m-win32.whl',
+    ]
@@ -0,0 +1,114 @@
+import asyncio
+import gc
+
+import pytest
+
+from dotlock.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_coalesced():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    single_flight = SingleFlight()
+    results = await asyncio.gather(
+        single_flight.run('a', fetch, 'a'),
+        single_flight.run('a', fetch, 'a'),
+        single_flight.run('b', fetch, 'b'),
+    )
+
+    assert results == ['A', 'A', 'B']
+    assert calls == ['a', 'b']
+
+    # Once finished, the call runs again.
+    assert await single_flight.run('a', fetch, 'a') == 'A'
+    assert calls == ['a', 'b', 'a']
+
+
+@pytest.mark.asyncio
+async def test_exceptions_shared():
+    calls = []
+
+    async def fail():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        raise ValueError()
+
+    single_flight = SingleFlight()
+    results = await asyncio.gather(
+        single_flight.run('a', fail),
+        single_flight.run('a', fail),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    single_flight = SingleFlight()
+    first = asyncio.ensure_future(single_flight.run('a', fetch))
+    second = asyncio.ensure_future(single_flight.run('a', fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 'result'
+
+
+@pytest.mark.asyncio
+async def test_call_cancelled_with_last_caller():
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(None)
+            raise
+
+    single_flight = SingleFlight()
+    first = asyncio.ensure_future(single_flight.run('a', fetch))
+    second = asyncio.ensure_future(single_flight.run('a', fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    assert cancelled == []
+
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled == [None]
+
+
+@pytest.mark.asyncio
+async def test_abandoned_call_exception_retrieved():
+    loop = asyncio.get_event_loop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context))
+
+    async def fail():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            raise ValueError()
+
+    single_flight = SingleFlight()
+    caller = asyncio.ensure_future(single_flight.run('a', fail))
+    await asyncio.sleep(0)
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+    await asyncio.sleep(0)
+    del caller
+    gc.collect()
+
+    assert errors == []
@@ -0,0 +1,63 @@
+from pathlib import Path
+import os
+
+import pytest
+from packaging.version import Version
+
+from dotlock import install as install_module
+from dotlock.dist_info.dist_info import PackageType
+from dotlock.install import install
+from dotlock.sync import installed_distributions, is_satisfied, plan_sync, record_lock_entry
+from dotlock.wheel_installer import install_wheel
+from tests.unit.builders import make_candidate, make_scheme, make_wheel
+from tests.unit.fake_index import FakeIndex
+
+
+def test_plan_sync(tempdir):
+    scheme = make_scheme()
+    wheel = make_wheel('1.0', {'fake/__init__.py': ''})
+    candidate = make_candidate(filename=wheel, contents=Path(wheel).read_bytes(), package_type=PackageType.bdist_wheel)
+    dist_info = install_wheel(wheel, scheme)
+
+    # Not installed by dotlock, so there is no hash to compare.
+    assert not is_satisfied(candidate, installed_distributions(scheme)['fake'])
+
+    record_lock_entry(dist_info, candidate)
+    installed = installed_distributions(scheme)
+    assert installed['fake'].version == Version('1.0')
+    assert is_satisfied(candidate, installed['fake'])
+    assert not is_satisfied(candidate._replace(hash_val='0' * 64), installed['fake'])
+    assert not is_satisfied(candidate._replace(version=Version('2.0')), installed['fake'])
+    assert 'fake-1.0.dist-info/DOTLOCK' in Path(dist_info, 'RECORD').read_text()
+
+    other = candidate._replace(name='other')
+    assert plan_sync([candidate, other], installed) == ([other], [])
+    assert plan_sync([other], installed) == ([other], [installed['fake']])
+    # Older locks may not have canonical names.
+    assert plan_sync([candidate._replace(name='Fake')], installed) == ([], [])
+
+
+@pytest.mark.asyncio
+async def test_install_sync(tempdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(Path('cache').absolute()))
+    scheme = make_scheme()
+
+    async def fake_get_install_scheme(python_path):
+        return scheme
+
+    monkeypatch.setattr(install_module, 'get_install_scheme', fake_get_install_scheme)
+    wheel = make_wheel('1.0', {'fake/__init__.py': ''})
+    contents = Path(wheel).read_bytes()
+    os.remove(wheel)
+    async with FakeIndex({'fake': [(wheel, contents, None)]}) as index:
+        candidate = make_candidate(filename=wheel, contents=contents, package_type=PackageType.bdist_wheel, index=index)
+        await install([candidate], no_venv=True, sync=True)
+        assert Path(scheme.platlib, 'fake', '__init__.py').exists()
+        assert len(index.requests) == 1
+
+        # Already installed as locked, so nothing is downloaded.
+        await install([candidate], no_venv=True, sync=True)
+        assert len(index.requests) == 1
+
+        await install([], no_venv=True, clean=True)
+        assert installed_distributions(scheme) == {}
@@ -0,0 +1,82 @@
+from pathlib import Path
+import shutil
+import subprocess
+
+import pytest
+
+from dotlock.dist_info import vcs
+from dotlock.dist_info.dist_info import CandidateInfo, PackageType
+from dotlock.dist_info.vcs import checkout, get_vcs_requirement_infos, parse_vcs_url, pin_vcs_url
+from tests import test_path
+
+
+def git(*args, cwd):
+    return subprocess.run(
+        ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+        cwd=str(cwd), check=True, stdout=subprocess.PIPE,
+    ).stdout.decode().strip()
+
+
+@pytest.fixture(name='repo')
+def repo_fixture(tempdir, monkeypatch):
+    # Keep mirrors out of the real cache directory.
+    monkeypatch.setenv('XDG_CACHE_HOME', str(Path('cache').absolute()))
+    monkeypatch.setattr(vcs, '_fetched_mirrors', set())
+    repo = Path('fakepkg').absolute()
+    shutil.copytree(str(test_path / 'fakepkg'), str(repo))
+    git('init', '--quiet', cwd=repo)
+    git('add', '.', cwd=repo)
+    git('commit', '--quiet', '-m', 'Initial commit', cwd=repo)
+    git('tag', 'v1', cwd=repo)
+    return repo
+
+
+def test_parse_vcs_url():
+    assert parse_vcs_url('git+https://github.com/pypa/pip.git@10.0.1') == (
+        'git', 'https://github.com/pypa/pip.git', '10.0.1',
+    )
+    assert parse_vcs_url('git+ssh://git@github.com/pypa/pip.git') == ('git', 'ssh://git@github.com/pypa/pip.git', None)
+
+
+@pytest.mark.asyncio
+async def test_pin_vcs_url(repo):
+    url = repo.as_uri()
+    first_commit = git('rev-parse', 'HEAD', cwd=repo)
+    assert await pin_vcs_url(f'git+{url}', update=True) == f'git+{url}@{first_commit}'
+
+    (repo / 'README').write_text('Hello')
+    git('add', 'README', cwd=repo)
+    git('commit', '--quiet', '-m', 'Add README', cwd=repo)
+    second_commit = git('rev-parse', 'HEAD', cwd=repo)
+
+    # Without updating, the mirror's existing refs are used.
+    vcs._fetched_mirrors.clear()
+    assert await pin_vcs_url(f'git+{url}', update=False) == f'git+{url}@{first_commit}'
+    assert await pin_vcs_url(f'git+{url}', update=True) == f'git+{url}@{second_commit}'
+    assert await pin_vcs_url(f'git+{url}@v1', update=False) == f'git+{url}@{first_commit}'
+
+
+@pytest.mark.asyncio
+async def test_checkout(repo):
+    url = repo.as_uri()
+    commit = git('rev-parse', 'HEAD', cwd=repo)
+    await checkout(f'git+{url}@{commit}', 'checkout')
+    assert Path('checkout', 'setup.py').exists()
+    assert git('rev-parse', 'HEAD', cwd='checkout') == commit
+    # Only the one commit is fetched.
+    assert git('rev-list', '--count', 'HEAD', cwd='checkout') == '1'
+
+
+@pytest.mark.asyncio
+async def test_get_vcs_requirement_infos_cached(repo, cache_connection):
+    vcs_url = await pin_vcs_url(f'git+{repo.as_uri()}', update=True)
+    candidate_info = CandidateInfo(
+        name='fakepkg', version=None, package_type=PackageType.vcs, source=None,
+        location=vcs_url, hash_alg=None, hash_val=None,
+    )
+    requirement_infos = await get_vcs_requirement_infos(cache_connection, candidate_info)
+    assert [r.name for r in requirement_infos] == ['aiohttp']
+
+    # The commit's requirements are served from the cache, without checking it out again.
+    shutil.rmtree(str(vcs.mirror_path(repo.as_uri())))
+    assert await get_vcs_requirement_infos(cache_connection, candidate_info) == requirement_infos
@@ -14,6 +14,9 @@ from dotlock.dist_info import wheel_filename_parsing
         ('matplotlib-3.0.2-py3-none-any.whl', True),
         ('matplotlib-3.0.2-py2-none-any.whl', False),
         ('matplotlib-3.0.2-py2.py3-none-any.whl', True),
+        ('matplotlib-3.0.2-cp36.cp37-cp36m.cp37m-manylinux1_x86_64.whl', True),
+        ('matplotlib-3.0.2-cp37-cp37m-manylinux1_i686.manylinux1_x86_64.whl', True),
+        ('matplotlib-3.0.2-cp36.cp38-cp36m.cp38-manylinux1_x86_64.whl', False),
     ]
 )
 def test_is_supported_cp37_manylinux1_x86_64(monkeypatch, wheel, supported):
@@ -26,3 +29,79 @@ def test_is_supported_cp37_manylinux1_x86_64(monkeypatch, wheel, supported):
     })
 
     assert wheel_filename_parsing.is_supported(wheel) is supported
+
+
+@pytest.mark.parametrize(
+    ('requires_python', 'supported'), [
+        (None, True),
+        ('', True),
+        ('>=3.6', True),
+        ('>=2.7, !=3.0.*, !=3.1.*', True),
+        ('<3', False),
+        ('>=3.8', False),
+        ('>=3.6.*', True),  # Invalid, so ignored.
+    ]
+)
+def test_python_version_supported(monkeypatch, requires_python, supported):
+    monkeypatch.setattr(wheel_filename_parsing, 'pep425tags', {'version': '3.7'})
+
+    assert wheel_filename_parsing.python_version_supported(requires_python) is supported
+
+
+def test_get_tag_priority(monkeypatch):
+    monkeypatch.setattr(wheel_filename_parsing, 'pep425tags', {
+        'abi': 'cp37m',
+        'impl': 'cp',
+        'manylinux1': True,
+        'platform': 'linux_x86_64',
+        'version': '3.7'
+    })
+
+    priorities = [
+        wheel_filename_parsing.get_tag_priority(wheel) for wheel in [
+            'matplotlib-3.0.2-cp37-cp37m-manylinux1_x86_64.whl',
+            'matplotlib-3.0.2-cp37-cp37m-linux_x86_64.whl',
+            'matplotlib-3.0.2-py3-none-any.whl',
+        ]
+    ]
+    assert priorities == sorted(priorities)
+    assert wheel_filename_parsing.get_tag_priority('matplotlib-3.0.2-py2.py3-none-any.whl') == priorities[-1]
+    assert wheel_filename_parsing.get_tag_priority('matplotlib-3.0.2-cp37-cp37m-win32.whl') is None
+
+
+def test_get_linux_platforms():
+    assert wheel_filename_parsing.get_linux_platforms('linux_x86_64', '2.17', None)[:5] == [
+        'manylinux_2_17_x86_64', 'manylinux2014_x86_64', 'manylinux_2_16_x86_64',
+        'manylinux_2_15_x86_64', 'manylinux_2_14_x86_64',
+    ]
+    assert wheel_filename_parsing.get_linux_platforms('linux_x86_64', '2.17', None)[-3:] == [
+        'manylinux_2_5_x86_64', 'manylinux1_x86_64', 'linux_x86_64',
+    ]
+    assert wheel_filename_parsing.get_linux_platforms('linux_aarch64', '2.18', None) == [
+        'manylinux_2_18_aarch64', 'manylinux_2_17_aarch64', 'manylinux2014_aarch64', 'linux_aarch64',
+    ]
+    assert wheel_filename_parsing.get_linux_platforms('linux_x86_64', None, '1.2') == [
+        'musllinux_1_2_x86_64', 'musllinux_1_1_x86_64', 'musllinux_1_0_x86_64', 'linux_x86_64',
+    ]
+
+
+@pytest.mark.parametrize(
+    ('wheel', 'supported'), [
+        ('numpy-1.26.0-cp37-cp37m-manylinux_2_17_x86_64.manylinux2014_x86_64.whl', True),
+        ('numpy-1.26.0-cp37-cp37m-manylinux2010_x86_64.whl', True),
+        ('numpy-1.26.0-cp37-cp37m-manylinux_2_28_x86_64.whl', False),
+        ('numpy-1.26.0-cp37-cp37m-musllinux_1_1_x86_64.whl', False),
+    ]
+)
+def test_is_supported_glibc_2_17(monkeypatch, wheel, supported):
+    monkeypatch.setattr(wheel_filename_parsing, 'pep425tags', {
+        'abi': 'cp37m',
+        'impl': 'cp',
+        'manylinux1': True,
+        'glibc': '2.17',
+        'musl': None,
+        'platform': 'linux_x86_64',
+        'version': '3.7'
+    })
+
+    assert wheel_filename_parsing.is_supported(wheel) is supported
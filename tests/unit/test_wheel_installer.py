@@ -0,0 +1,133 @@
+from pathlib import Path
+import csv
+import os
+import sys
+
+import pytest
+
+from dotlock import wheel_installer
+from dotlock.exceptions import InstallError
+from dotlock.wheel_installer import (
+    LinkMode,
+    Linker,
+    get_install_scheme,
+    install_unpacked_wheel,
+    install_wheel,
+    is_unpacked,
+    unpack_wheel,
+)
+from tests import test_path
+from tests.unit.builders import make_scheme, make_wheel
+
+
+def test_install_wheel(tempdir):
+    scheme = make_scheme()
+    wheel = make_wheel('1.0', {
+        'fake/__init__.py': 'VERSION = 1\n',
+        '{dist_info}/entry_points.txt': '[console_scripts]\nfake-cli = fake.cli:main [extra]\n',
+        '{data}/scripts/fake-tool': '#!python\nprint("tool")\n',
+        '{data}/data/share/fake.txt': 'data',
+        '{data}/headers/fake.h': '',
+    })
+    install_wheel(wheel, scheme)
+
+    platlib = Path(scheme.platlib)
+    assert (platlib / 'fake' / '__init__.py').read_text() == 'VERSION = 1\n'
+    assert not Path(scheme.purelib).exists()
+    assert Path('venv', 'share', 'fake.txt').read_text() == 'data'
+    assert Path('venv', 'include', 'fake', 'fake.h').exists()
+
+    tool = Path(scheme.scripts, 'fake-tool')
+    assert tool.read_text() == f'#!{scheme.executable}\nprint("tool")\n'
+    assert os.access(str(tool), os.X_OK)
+    cli = Path(scheme.scripts, 'fake-cli').read_text()
+    assert cli.startswith(f'#!{scheme.executable}\n')
+    assert 'from fake.cli import main' in cli
+
+    dist_info = platlib / 'fake-1.0.dist-info'
+    assert (dist_info / 'INSTALLER').read_text() == 'dotlock\n'
+    with (dist_info / 'RECORD').open(newline='') as fp:
+        records = {row[0]: row for row in csv.reader(fp)}
+    assert records['fake/__init__.py'][2] == str(len('VERSION = 1\n'))
+    assert records['fake-1.0.dist-info/RECORD'] == ['fake-1.0.dist-info/RECORD', '', '']
+    assert '../bin/fake-cli' in records
+    for path, hash_val, size in records.values():
+        assert (platlib / path).exists()
+
+
+def test_install_wheel_replaces_installed_version(tempdir):
+    scheme = make_scheme()
+    install_wheel(make_wheel('1.0', {'fake/__init__.py': '', 'fake/old.py': ''}), scheme)
+    install_wheel(make_wheel('2.0', {'fake/__init__.py': ''}), scheme)
+
+    platlib = Path(scheme.platlib)
+    assert not (platlib / 'fake' / 'old.py').exists()
+    assert not (platlib / 'fake-1.0.dist-info').exists()
+    assert (platlib / 'fake-2.0.dist-info' / 'RECORD').exists()
+
+
+def test_install_wheel_outside_scheme(tempdir):
+    wheel = make_wheel('1.0', {'../evil.py': ''})
+    with pytest.raises(InstallError):
+        install_wheel(wheel, make_scheme())
+
+
+def test_install_purelib_wheel(tempdir):
+    scheme = make_scheme()
+    install_wheel(str(test_path / 'unit' / 'acme-0.24.0-py2.py3-none-any.whl'), scheme)
+    assert Path(scheme.purelib, 'acme', '__init__.py').exists()
+    assert Path(scheme.purelib, 'acme-0.24.0.dist-info', 'RECORD').exists()
+
+
+@pytest.mark.asyncio
+async def test_get_install_scheme():
+    scheme = await get_install_scheme(sys.executable)
+    assert scheme.executable == sys.executable
+    assert any(path.startswith(scheme.purelib) for path in sys.path)
+
+
+def test_install_unpacked_wheel(tempdir):
+    wheel = make_wheel('1.0', {
+        'fake/__init__.py': 'VERSION = 1\n',
+        '{data}/scripts/fake-tool': '#!python\nprint("tool")\n',
+    })
+    unpacked = Path('unpacked').absolute()
+    unpack_wheel(wheel, unpacked)
+    assert is_unpacked(unpacked)
+    cached_file = unpacked / 'files' / 'fake' / '__init__.py'
+
+    linker = Linker(LinkMode.hardlink)
+    for venv in ('venv1', 'venv2'):
+        scheme = make_scheme(venv)
+        dist_info = install_unpacked_wheel(unpacked, scheme, linker)
+        installed_file = Path(scheme.platlib, 'fake', '__init__.py')
+        assert os.path.samefile(str(installed_file), str(cached_file))
+        assert Path(scheme.scripts, 'fake-tool').read_text() == f'#!{scheme.executable}\nprint("tool")\n'
+        assert 'fake/__init__.py,sha256=' in Path(dist_info, 'RECORD').read_text()
+
+    # Installing over linked files replaces them, rather than writing through to the cache.
+    install_wheel(make_wheel('2.0', {'fake/__init__.py': 'VERSION = 2\n'}), make_scheme('venv1'))
+    assert cached_file.read_text() == 'VERSION = 1\n'
+
+
+def test_install_unpacked_wheel_copy(tempdir):
+    wheel = make_wheel('1.0', {'fake/__init__.py': 'VERSION = 1\n'})
+    unpacked = Path('unpacked').absolute()
+    unpack_wheel(wheel, unpacked)
+    scheme = make_scheme()
+    install_unpacked_wheel(unpacked, scheme, Linker(LinkMode.copy))
+    installed_file = Path(scheme.platlib, 'fake', '__init__.py')
+    assert installed_file.read_text() == 'VERSION = 1\n'
+    assert not os.path.samefile(str(installed_file), str(unpacked / 'files' / 'fake' / '__init__.py'))
+
+
+def test_linker_falls_back(tempdir, monkeypatch):
+    def failing_reflink(source, destination):
+        raise OSError('Not supported')
+
+    monkeypatch.setitem(wheel_installer._LINK_FUNCTIONS, LinkMode.reflink, failing_reflink)
+    Path('source').write_text('contents')
+    linker = Linker(LinkMode.auto)
+    linker.place(str(Path('source').absolute()), str(Path('destination').absolute()))
+    assert Path('destination').read_text() == 'contents'
+    assert linker.modes[0] != LinkMode.reflink